@@ -8,19 +8,87 @@ from datetime import datetime # Needed for timestamps
 from openai import OpenAI, APIError
 # Import all necessary functions from database
 # Removed get_distinct_seasons, get_chefs_by_season from this import as they are deprecated
-from topchef_agent.database import load_database, update_chef, get_chefs_by_season, add_chef # Ensure only valid functions are imported
+from topchef_agent.analytics import completeness_report, season_summary_report
+from topchef_agent.search import search_chefs, SEARCH_MAX_LIMIT
+from topchef_agent.geo import get_geo_index, NEARBY_DEFAULT_RADIUS_KM, NEARBY_MAX_RADIUS_KM, NEARBY_MAX_LIMIT
+from topchef_agent.database import load_database, update_chef, get_chefs_by_season, add_chef, DuplicateChefError, upsert_chefs, update_chef_fields, find_data_gaps, add_custom_field, remove_custom_field, GAP_FIELDS # Ensure only valid functions are imported
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 from topchef_agent.config import OPENROUTER_API_KEY, PERPLEXITY_API_KEY, YOUR_SITE_URL, YOUR_SITE_NAME, LLM_MODELS_TO_TRY
+from topchef_agent.config import LOG_SHIP_FLUSH_INTERVAL, LOG_SHIP_MAX_BUFFER, LOG_SHIP_BATCH_SIZE, LOG_SHIP_OVERFLOW_POLICY
+from topchef_agent.log_shipper import create_log_shipper
 
 # --- Logging & Signaling Helpers ---
 FLASK_BASE_URL = os.environ.get("FLASK_BASE_URL", "http://127.0.0.1:5000")
 LOGGING_ENDPOINT = f"{FLASK_BASE_URL}/log_message"
+BULK_LOGGING_ENDPOINT = f"{FLASK_BASE_URL}/log_messages" # Batched endpoint used by the log shipper
 DB_UPDATE_SIGNAL_ENDPOINT = f"{FLASK_BASE_URL}/signal_db_update" # New endpoint URL
 AGENT_NAME = "StephAI Botenberg" # Define the agent's name
 
+# --- Event Transports ---
+# log_to_ui and signal_database_update hand events to the active transport.
+# The separate scheduler process ships them over HTTP; when the web app runs in the
+# same interpreter (interactive agent), main.py installs an in-process transport instead.
+
+class HttpEventTransport:
+    """Ships events to the Flask app over HTTP, logs via a batching background shipper."""
+
+    name = "http"
+
+    def __init__(self):
+        self.log_shipper = create_log_shipper(
+            BULK_LOGGING_ENDPOINT,
+            flush_interval=LOG_SHIP_FLUSH_INTERVAL,
+            max_buffer=LOG_SHIP_MAX_BUFFER,
+            batch_size=LOG_SHIP_BATCH_SIZE,
+            overflow_policy=LOG_SHIP_OVERFLOW_POLICY,
+        )
+
+    def send_log(self, payload: dict):
+        if not self.log_shipper.enqueue(payload):
+            print(f"Warning: UI log buffer full, dropped {payload['type']} ({self.log_shipper.dropped} dropped so far).", flush=True)
+
+    def signal_db_update(self, chef_ids=None):
+        try:
+            print(f"Signaling database update to {DB_UPDATE_SIGNAL_ENDPOINT} (chef_ids: {chef_ids})", flush=True)
+            self.log_shipper.session.post(DB_UPDATE_SIGNAL_ENDPOINT, json={"chef_ids": chef_ids}, timeout=3)
+        except requests.exceptions.RequestException as e:
+            print(f"Warning: Failed to send database update signal to {DB_UPDATE_SIGNAL_ENDPOINT}: {e}", flush=True)
+
+
+class InProcessEventTransport:
+    """Hands events directly to the web app's brokers, skipping the HTTP loopback."""
+
+    name = "in_process"
+
+    def __init__(self, publish_log, publish_db_update):
+        self.publish_log = publish_log
+        self.publish_db_update = publish_db_update
+
+    def send_log(self, payload: dict):
+        self.publish_log(payload)
+
+    def signal_db_update(self, chef_ids=None):
+        self.publish_db_update(chef_ids)
+
+
+_event_transport = None
+
+def set_event_transport(transport):
+    """Installs the transport used by log_to_ui and signal_database_update."""
+    global _event_transport
+    print(f"Agent event transport set to '{transport.name}'.", flush=True)
+    _event_transport = transport
+
+def get_event_transport():
+    """Returns the active transport, defaulting to HTTP when the web app is not loaded in this process."""
+    global _event_transport
+    if _event_transport is None:
+        _event_transport = HttpEventTransport()
+    return _event_transport
+
 def log_to_ui(message_type: str, data: dict or str, role: str = "system"):
-    """Sends a log message to the Flask UI backend, including role."""
+    """Queues a log message for the Flask UI backend, including role. Never blocks on HTTP."""
     # Add role to the payload, default to system if not specified
     payload = {"type": message_type, "data": data, "timestamp": time.time(), "role": role}
     # Add agent name specifically for LLM responses
@@ -29,19 +97,13 @@ def log_to_ui(message_type: str, data: dict or str, role: str = "system"):
     elif message_type.startswith("tool_"):
          payload["role"] = "tool_executor" # Role for tool execution logs
 
-    try:
-        print(f"Logging to UI ({payload['role']}): {message_type}", flush=True)
-        requests.post(LOGGING_ENDPOINT, json=payload, timeout=5)
-    except requests.exceptions.RequestException as e:
-        print(f"Warning: Failed to send log to UI endpoint {LOGGING_ENDPOINT}: {e}", flush=True)
+    print(f"Logging to UI ({payload['role']}): {message_type}", flush=True)
+    get_event_transport().send_log(payload)
 
-def signal_database_update():
-    """Sends a signal to the Flask backend that the database has been updated."""
-    try:
-        print(f"Signaling database update to {DB_UPDATE_SIGNAL_ENDPOINT}", flush=True)
-        requests.post(DB_UPDATE_SIGNAL_ENDPOINT, timeout=3) # Simple POST, no payload needed
-    except requests.exceptions.RequestException as e:
-        print(f"Warning: Failed to send database update signal to {DB_UPDATE_SIGNAL_ENDPOINT}: {e}", flush=True)
+def signal_database_update(chef_ids=None):
+    """Signals the Flask backend that the database has been updated.
+    Pass the affected chef IDs so clients can patch just those rows; omit them for a full refresh."""
+    get_event_transport().signal_db_update(chef_ids)
 
 
 # --- Tool Execution Functions ---
@@ -138,6 +200,26 @@ def execute_search_web_perplexity(query: str):
         log_to_ui("tool_error", {"name": "search_web_perplexity", "error": str(e)})
         return error_msg
 
+# --- Chef Field Validation (shared by the record update tools) ---
+# Define allowed fields (including new ones)
+ALLOWED_UPDATE_FIELDS = ["bio", "image_url", "status", "restaurant_address", "latitude", "longitude", "current_restaurant", "season_number", "signature_dish", "cool_anecdote"]
+
+def validate_chef_field(field_name: str, new_value):
+    """Checks one field/value pair for the update tools. Returns (normalized_value, error_message or None)."""
+    # Allow custom fields if needed, but validate known ones strictly
+    if field_name not in ALLOWED_UPDATE_FIELDS and not field_name.startswith("custom_"): # Example prefix
+        return new_value, f"Invalid or disallowed field name '{field_name}' provided for update. Allowed: {ALLOWED_UPDATE_FIELDS} or custom_*"
+    if field_name == "restaurant_address" and (new_value is None or str(new_value).strip() == ""):
+        return new_value, "Critical error: restaurant_address cannot be empty or None."
+    if field_name in ["latitude", "longitude"] and not isinstance(new_value, (int, float)) and new_value is not None:
+        try:
+            # Attempt conversion if it looks like a number string, otherwise error
+            new_value = float(new_value)
+            print(f"  Converted new_value for {field_name} to float: {new_value}", flush=True)
+        except (ValueError, TypeError):
+            return new_value, f"Invalid value type for {field_name}, must be a number (or convertible string), got: {type(new_value)}."
+    return new_value, None
+
 # Updated to accept Any type for new_value and perform basic validation
 def execute_update_chef_record(chef_id: int, field_name: str, new_value: any):
     """Executes an update operation on a specific chef record."""
@@ -157,33 +239,14 @@ def execute_update_chef_record(chef_id: int, field_name: str, new_value: any):
     print(f"--- Tool: Executing Database Update ---", flush=True)
     print(f"  Chef ID: {chef_id}, Field: {field_name}, New Value: {new_value}", flush=True)
 
-    # --- Field Name Validation ---
-    # Define allowed fields (including new ones)
-    allowed_fields = ["bio", "image_url", "status", "restaurant_address", "latitude", "longitude", "current_restaurant", "season_number", "signature_dish"]
-    # Allow custom fields if needed, but validate known ones strictly
-    if field_name not in allowed_fields and not field_name.startswith("custom_"): # Example prefix
-        error_msg = json.dumps({"error": f"Invalid or disallowed field name '{field_name}' provided for update. Allowed: {allowed_fields} or custom_*"})
-        print(f"  Error: Invalid field name '{field_name}'.", flush=True)
-        log_to_ui("tool_error", {"name": "update_chef_record", "input": tool_input_data, "error": f"Invalid field name: {field_name}"})
+    # --- Field & Value Validation ---
+    new_value, validation_error = validate_chef_field(field_name, new_value)
+    if validation_error:
+        error_msg = json.dumps({"error": validation_error})
+        print(f"  Error: {validation_error}", flush=True)
+        log_to_ui("tool_error", {"name": "update_chef_record", "input": tool_input_data, "error": validation_error})
         return error_msg
 
-    # --- Value Validation (Basic) ---
-    if field_name == "restaurant_address" and (new_value is None or str(new_value).strip() == ""):
-        error_msg = json.dumps({"error": "Critical error: restaurant_address cannot be empty or None."})
-        print(f"  Error: Empty or None restaurant_address.", flush=True)
-        log_to_ui("tool_error", {"name": "update_chef_record", "input": tool_input_data, "error": "Empty restaurant_address."})
-        return error_msg
-    if field_name in ["latitude", "longitude"] and not isinstance(new_value, (int, float)) and new_value is not None:
-         try:
-             # Attempt conversion if it looks like a number string, otherwise error
-             new_value = float(new_value)
-             print(f"  Converted new_value for {field_name} to float: {new_value}", flush=True)
-         except (ValueError, TypeError):
-             error_msg = json.dumps({"error": f"Invalid value type for {field_name}, must be a number (or convertible string), got: {type(new_value)}."})
-             print(f"  Error: Invalid value type for {field_name}.", flush=True)
-             log_to_ui("tool_error", {"name": "update_chef_record", "input": tool_input_data, "error": f"Invalid value type for {field_name}."})
-             return error_msg
-
     # --- Database Update ---
     update_data = {field_name: new_value}
     try:
@@ -193,7 +256,7 @@ def execute_update_chef_record(chef_id: int, field_name: str, new_value: any):
             result_msg = json.dumps({"status": "OK", "message": f"Successfully updated {field_name} for chef ID {chef_id}."})
             print("  Database update successful.", flush=True)
             log_to_ui("tool_result", {"name": "update_chef_record", "input": tool_input_data, "result": "OK"})
-            signal_database_update() # Signal the UI about the change
+            signal_database_update([chef_id]) # Signal the UI about the change
             return result_msg
         else:
              error_msg = json.dumps({"status": "Failed", "error": f"Failed to update {field_name} for chef ID {chef_id}. Chef not found or no change needed."})
@@ -206,6 +269,66 @@ def execute_update_chef_record(chef_id: int, field_name: str, new_value: any):
         log_to_ui("tool_error", {"name": "update_chef_record", "input": tool_input_data, "error": str(e)})
         return error_msg
 
+def execute_patch_chef_record(chef_id: int, fields: dict, expected_revision: int = None):
+    """Updates SEVERAL fields of one chef atomically in a single statement (e.g. bio, restaurant_address, current_restaurant, signature_dish together). Only fields whose value differs are written. Optional expected_revision makes the write fail with 'conflict' if the chef changed since you read it. Returns the changed fields as {field: [old, new]}."""
+    tool_input_data = {"chef_id": chef_id, "fields": fields, "expected_revision": expected_revision}
+    log_to_ui("tool_start", {"name": "patch_chef_record", "input": tool_input_data})
+    print(f"--- Tool: Executing Patch Chef Record ---", flush=True)
+    print(f"  Chef ID: {chef_id}, Fields: {list(fields) if isinstance(fields, dict) else fields}", flush=True)
+
+    # --- Input Validation ---
+    if not isinstance(chef_id, int):
+        error_msg = json.dumps({"error": "Invalid type for chef_id, must be an integer."})
+        log_to_ui("tool_error", {"name": "patch_chef_record", "input": tool_input_data, "error": "Invalid chef_id type."})
+        return error_msg
+    if not isinstance(fields, dict) or not fields:
+        error_msg = json.dumps({"error": "'fields' must be a non-empty object of field_name: new_value."})
+        log_to_ui("tool_error", {"name": "patch_chef_record", "input": tool_input_data, "error": "Invalid fields."})
+        return error_msg
+    if expected_revision is not None and not isinstance(expected_revision, int):
+        error_msg = json.dumps({"error": "expected_revision must be an integer if given."})
+        log_to_ui("tool_error", {"name": "patch_chef_record", "input": tool_input_data, "error": "Invalid expected_revision."})
+        return error_msg
+    # All fields are validated up front so the patch is applied completely or not at all
+    normalized, errors = {}, {}
+    for field_name, new_value in fields.items():
+        normalized[field_name], validation_error = validate_chef_field(field_name, new_value)
+        if validation_error:
+            errors[field_name] = validation_error
+    if errors:
+        error_msg = json.dumps({"error": "Invalid fields, nothing was written.", "fields": errors})
+        print(f"  Error: Invalid fields {list(errors)}.", flush=True)
+        log_to_ui("tool_error", {"name": "patch_chef_record", "input": tool_input_data, "error": errors})
+        return error_msg
+
+    # --- Database Update ---
+    try:
+        result = update_chef_fields(chef_id, normalized, expected_revision=expected_revision)
+    except ValueError as e: # e.g. a malformed custom_* field name
+        error_msg = json.dumps({"status": "Failed", "error": str(e)})
+        log_to_ui("tool_error", {"name": "patch_chef_record", "input": tool_input_data, "error": str(e)})
+        return error_msg
+    except Exception as e:
+        error_msg = json.dumps({"status": "Error", "error": f"Exception during database update: {e}"})
+        print(f"  Error during database update call: {e}", flush=True)
+        log_to_ui("tool_error", {"name": "patch_chef_record", "input": tool_input_data, "error": str(e)})
+        return error_msg
+
+    status = result["status"]
+    if status in ("not_found", "conflict"):
+        message = (f"Chef ID {chef_id} not found." if status == "not_found" else
+                   f"Chef ID {chef_id} changed since revision {expected_revision} (now {result['revision']}); re-read it and retry.")
+        log_to_ui("tool_error", {"name": "patch_chef_record", "input": tool_input_data, "error": message})
+        return json.dumps({"status": status, "error": message, "chef_id": chef_id, "revision": result["revision"]})
+
+    # Compact diff: {field: [old, new]}
+    diff = {name: [change["old"], change["new"]] for name, change in result["changed"].items()}
+    if status == "updated":
+        signal_database_update([chef_id]) # Signal the UI about the change
+    log_to_ui("tool_result", {"name": "patch_chef_record", "input": tool_input_data, "result": {"status": status, "changed": list(diff)}})
+    print(f"  Patch result: {status}, changed: {list(diff)}", flush=True)
+    return json.dumps({"status": status, "chef_id": chef_id, "revision": result["revision"], "changed": diff}, ensure_ascii=False)
+
 # --- NEW TOOL EXECUTION FUNCTION for geocoding and updating ---
 def execute_geocode_address_and_update(chef_id: int, address: str):
     """
@@ -237,7 +360,7 @@ def execute_geocode_address_and_update(chef_id: int, address: str):
                 result_msg = json.dumps({"status": "OK", "message": f"Successfully updated lat/lon for chef ID {chef_id}.", "coordinates": coordinates})
                 print(f"  Geocoding and DB update successful: Lat={location.latitude}, Lon={location.longitude}", flush=True)
                 log_to_ui("tool_result", {"name": "geocode_address_and_update", "input": tool_input_data, "result": coordinates})
-                signal_database_update()
+                signal_database_update([chef_id])
                 return result_msg
             else:
                 error_msg = json.dumps({"status": "Failed", "error": f"Failed to update coordinates for chef ID {chef_id}. Chef not found or no change needed."})
@@ -311,15 +434,18 @@ def execute_geocode_address(address: str):
         return error_msg
 
 # --- NEW TOOL EXECUTION FUNCTION for adding a chef ---
-def execute_add_chef(name: str, season: int, bio: str = None, image_url: str = None, status: str = None, restaurant_address: str = None):
-    """Adds a new chef to the database. Requires name and season. Other fields like bio, image_url, status, and restaurant_address are optional."""
+def execute_add_chef(name: str, season: int, bio: str = None, image_url: str = None, status: str = None, restaurant_address: str = None, confirm_new: bool = False):
+    """Adds a new chef to the database. Requires name and season. Other fields like bio, image_url, status, and restaurant_address are optional.
+    A chef already in the season is not added again: its existing ID is returned instead. Near misses
+    (similar names in the season) are returned as candidates unless confirm_new is true."""
     tool_input_data = {
         "name": name,
         "season": season,
         "bio": bio,
         "image_url": image_url,
         "status": status,
-        "restaurant_address": restaurant_address
+        "restaurant_address": restaurant_address,
+        "confirm_new": confirm_new
     }
     log_to_ui("tool_start", {"name": "add_chef", "input": tool_input_data})
     print(f"--- Tool: Executing Add Chef --- ", flush=True)
@@ -346,6 +472,7 @@ def execute_add_chef(name: str, season: int, bio: str = None, image_url: str = N
             image_url=image_url,
             status=status,
             restaurant_address=restaurant_address,
+            allow_similar=bool(confirm_new),
             # Note: Lat/Lon/Perplexity data are omitted here, handled by other tools/updates
         )
 
@@ -353,13 +480,26 @@ def execute_add_chef(name: str, season: int, bio: str = None, image_url: str = N
             result_msg = json.dumps({"status": "OK", "message": f"Successfully added chef '{name}' (Season {season}) with new ID {new_chef_id}.", "chef_id": new_chef_id})
             print(f"  Successfully added chef '{name}' with ID {new_chef_id}.", flush=True)
             log_to_ui("tool_result", {"name": "add_chef", "input": tool_input_data, "result": f"OK, new ID: {new_chef_id}"})
-            signal_database_update() # Signal UI about the change
+            signal_database_update([new_chef_id]) # Signal UI about the change
             return result_msg
         else:
             error_msg = json.dumps({"status": "Failed", "error": f"Failed to add chef '{name}' to the database. Check logs for details.", "name": name, "season": season})
             print(f"  Database function failed to add chef '{name}'.", flush=True)
             log_to_ui("tool_error", {"name": "add_chef", "input": tool_input_data, "error": "Database add function returned None"})
             return error_msg
+    except DuplicateChefError as e:
+        # Not an error for the agent: it learns the existing ID (or the candidates) without listing the season
+        if e.existing_id is not None:
+            result = {"status": "Exists", "message": f"{e} Nothing was added; use this chef_id to update the record.",
+                      "chef_id": e.existing_id, "similar": e.similar}
+            ui_result = f"Already exists, ID: {e.existing_id}"
+        else:
+            result = {"status": "Similar", "message": f"{e} If one of them is this chef, update it instead; if this really is a different person, call add_chef again with confirm_new=true.",
+                      "similar": e.similar}
+            ui_result = f"Not added, {len(e.similar)} similar name(s)"
+        print(f"  {result['message']}", flush=True)
+        log_to_ui("tool_result", {"name": "add_chef", "input": tool_input_data, "result": ui_result})
+        return json.dumps(result)
     except Exception as e:
         error_msg = json.dumps({"status": "Error", "error": f"An unexpected error occurred while adding chef '{name}': {e}", "name": name, "season": season})
         print(f"  Exception during add_chef execution: {e}", flush=True)
@@ -369,6 +509,106 @@ def execute_add_chef(name: str, season: int, bio: str = None, image_url: str = N
         log_to_ui("tool_error", {"name": "add_chef", "input": tool_input_data, "error": str(e)})
         return error_msg
 
+# --- Bulk Upsert Tool ---
+UPSERT_ALLOWED_FIELDS = ["id", "name", "season", "bio", "image_url", "status", "restaurant_address", "latitude", "longitude",
+                         "current_restaurant", "season_number", "signature_dish", "cool_anecdote"]
+
+def execute_upsert_chefs(chefs: list):
+    """Adds or updates many chefs in one call (e.g. a whole season). Each item is matched by 'id', or else by 'name' within 'season'; new chefs need name, season and restaurant_address. Returns the outcome of every item."""
+    tool_input_data = {"count": len(chefs) if isinstance(chefs, list) else None}
+    log_to_ui("tool_start", {"name": "upsert_chefs", "input": tool_input_data})
+    print(f"--- Tool: Executing Upsert Chefs ---", flush=True)
+
+    if not isinstance(chefs, list) or not chefs:
+        error_msg = json.dumps({"error": "'chefs' must be a non-empty list of chef objects."})
+        log_to_ui("tool_error", {"name": "upsert_chefs", "input": tool_input_data, "error": "Invalid chefs list."})
+        return error_msg
+
+    # Same per-field rules as update_chef_record; bad items are reported, the rest still go through
+    rows, rejected = [], {}
+    for index, chef in enumerate(chefs):
+        if not isinstance(chef, dict):
+            rejected[index] = "Item must be an object."
+            continue
+        chef = dict(chef) # Normalised copy; the caller's objects are left as they were
+        disallowed = [key for key in chef if key not in UPSERT_ALLOWED_FIELDS and not key.startswith("custom_")]
+        if disallowed:
+            rejected[index] = f"Disallowed fields {disallowed}. Allowed: {UPSERT_ALLOWED_FIELDS} or custom_*"
+            continue
+        if "restaurant_address" in chef and (chef["restaurant_address"] is None or str(chef["restaurant_address"]).strip() == ""):
+            rejected[index] = "restaurant_address cannot be empty or None."
+            continue
+        try:
+            for coordinate in ("latitude", "longitude"):
+                if chef.get(coordinate) is not None:
+                    chef[coordinate] = float(chef[coordinate])
+        except (ValueError, TypeError):
+            rejected[index] = "latitude/longitude must be numbers."
+            continue
+        rows.append((index, chef))
+
+    try:
+        outcome = upsert_chefs([chef for _, chef in rows]) if rows else {"results": []}
+    except Exception as e:
+        error_msg = json.dumps({"status": "Error", "error": f"Bulk upsert failed, nothing was written: {e}"})
+        print(f"  Error during bulk upsert: {e}", flush=True)
+        log_to_ui("tool_error", {"name": "upsert_chefs", "input": tool_input_data, "error": str(e)})
+        return error_msg
+
+    # Report results against the caller's original item positions
+    results = [{"index": index, "status": "invalid", "error": error} for index, error in rejected.items()]
+    for (index, _), result in zip(rows, outcome["results"]):
+        results.append(dict(result, index=index))
+    results.sort(key=lambda result: result["index"])
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+
+    changed_ids = [result["chef_id"] for result in results if result["status"] in ("inserted", "updated")]
+    if changed_ids:
+        signal_database_update(changed_ids) # Signal the UI about the change
+    print(f"  Upsert summary: {summary}", flush=True)
+    log_to_ui("tool_result", {"name": "upsert_chefs", "input": tool_input_data, "result": summary})
+    return json.dumps({"status": "OK", "summary": summary, "results": results}, ensure_ascii=False)
+
+# --- Custom Field Tools ---
+def execute_add_db_column(column_name: str):
+    """Declares a custom_* enrichment field and indexes it. No schema change: values live in each chef's attributes."""
+    tool_input_data = {"column_name": column_name}
+    log_to_ui("tool_start", {"name": "add_db_column", "input": tool_input_data})
+    print(f"--- Tool: Executing Add Custom Field ---", flush=True)
+    print(f"  Field: {column_name}", flush=True)
+    try:
+        if not add_custom_field(column_name):
+            raise RuntimeError("the index could not be created, check the logs")
+        result_msg = json.dumps({"status": "OK", "message": f"Custom field '{column_name}' is ready. Set it with update_chef_record or patch_chef_record; find chefs lacking it with find_data_gaps."})
+        log_to_ui("tool_result", {"name": "add_db_column", "input": tool_input_data, "result": "OK"})
+        return result_msg
+    except Exception as e: # ValueError for names not of the form custom_<name>
+        error_msg = json.dumps({"status": "Error", "error": f"Failed to add custom field '{column_name}': {e}"})
+        log_to_ui("tool_error", {"name": "add_db_column", "input": tool_input_data, "error": str(e)})
+        print(f"  Error adding custom field: {e}", flush=True)
+        return error_msg
+
+def execute_remove_db_column(column_name: str):
+    """Removes a custom_* enrichment field from every chef, and its index. Built-in columns cannot be removed."""
+    tool_input_data = {"column_name": column_name}
+    log_to_ui("tool_start", {"name": "remove_db_column", "input": tool_input_data})
+    print(f"--- Tool: Executing Remove Custom Field ---", flush=True)
+    print(f"  Field: {column_name}", flush=True)
+    try:
+        if not remove_custom_field(column_name):
+            raise RuntimeError("the field could not be removed, check the logs")
+        result_msg = json.dumps({"status": "OK", "message": f"Custom field '{column_name}' removed from all chefs."})
+        log_to_ui("tool_result", {"name": "remove_db_column", "input": tool_input_data, "result": "OK"})
+        signal_database_update() # Any chef may have lost the field
+        return result_msg
+    except Exception as e:
+        error_msg = json.dumps({"status": "Error", "error": f"Failed to remove custom field '{column_name}': {e}"})
+        log_to_ui("tool_error", {"name": "remove_db_column", "input": tool_input_data, "error": str(e)})
+        print(f"  Error removing custom field: {e}", flush=True)
+        return error_msg
+
 # --- Journaling Tool Functions ---
 JOURNAL_FILE = "topchef_agent/stephai_botenberg_journal.json"
 
@@ -505,7 +745,7 @@ tools_list = [
         "type": "function",
         "function": {
             "name": "update_chef_record",
-            "description": "Updates **one specific field** for a specific chef in the PostgreSQL database. Use this ONLY after obtaining verified information (e.g., from search_web_perplexity or geocoding). Call this tool multiple times if you need to update multiple fields. Allowed fields are 'bio', 'image_url', 'status', 'restaurant_address', 'latitude', 'longitude', 'current_restaurant', 'season_number', 'signature_dish', or potentially custom fields.",
+            "description": "Updates **one specific field** for a specific chef in the PostgreSQL database. Use this ONLY after obtaining verified information (e.g., from search_web_perplexity or geocoding). Call this tool multiple times if you need to update multiple fields. Allowed fields are 'bio', 'image_url', 'status', 'restaurant_address', 'latitude', 'longitude', 'current_restaurant', 'season_number', 'signature_dish', 'cool_anecdote', or any custom enrichment field named 'custom_<name>' (lowercase letters, digits, underscores; stored in the chef's attributes, no schema change needed; a null value removes it).",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -515,7 +755,7 @@ tools_list = [
                     },
                     "field_name": {
                         "type": "string",
-                        "description": "The exact name of the database field to update (e.g., 'bio', 'status', 'restaurant_address', 'latitude', 'longitude', 'current_restaurant', 'season_number', 'signature_dish')."
+                        "description": "The exact name of the database field to update (e.g., 'bio', 'status', 'restaurant_address', 'latitude', 'longitude', 'current_restaurant', 'season_number', 'signature_dish', 'cool_anecdote')."
                     },
                     "new_value": {
                         "type": ["string", "number", "null"], # Allow numbers for lat/lon, null might be needed
@@ -526,6 +766,32 @@ tools_list = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "patch_chef_record",
+            "description": "Updates SEVERAL fields of one chef at once, atomically, in a single call. Prefer this over repeated update_chef_record calls when you have verified values for more than one field. Same allowed fields as update_chef_record. Returns only the fields that actually changed, as {field: [old, new]}.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "chef_id": {
+                        "type": "integer",
+                        "description": "The unique ID of the chef to update."
+                    },
+                    "fields": {
+                        "type": "object",
+                        "description": "Map of field name to new value, e.g. {\"bio\": \"...\", \"current_restaurant\": \"...\", \"signature_dish\": \"...\"}. Numbers for latitude/longitude.",
+                        "additionalProperties": {"type": ["string", "number", "null"]}
+                    },
+                    "expected_revision": {
+                        "type": ["integer", "null"],
+                        "description": "Optional: the chef's 'revision' as you last read it. The update is rejected with status 'conflict' if the chef changed in the meantime."
+                    }
+                },
+                "required": ["chef_id", "fields"]
+            }
+        }
+    },
     # --- NEW TOOL DEFINITION for getting chefs by season ---
     {
         "type": "function",
@@ -544,6 +810,132 @@ tools_list = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_data_gaps",
+            "description": "Finds chefs with MISSING data (empty or null fields) using a fast indexed database query, and returns only their IDs and the names of the fields they lack. Use this instead of get_all_chefs to decide which chefs need work; fetch the full record of a chef only when you are about to fix it.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "fields": {
+                        "type": ["array", "null"],
+                        "items": {"type": "string"},
+                        "description": f"Optional: the fields to check. Defaults to {list(GAP_FIELDS)}."
+                    },
+                    "season": {
+                        "type": ["integer", "null"],
+                        "description": "Optional: only check chefs of this season."
+                    },
+                    "limit": {
+                        "type": ["integer", "null"],
+                        "description": "Optional: maximum number of chefs to return (default 50). 'has_more' tells whether others remain."
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_completeness_report",
+            "description": "Returns completeness statistics for the whole database in one small report: % complete per field and per season, candidate count of every season against the expected 14 ('shortfall'), seasons with no chefs at all ('absent_seasons'), and IDs of chefs whose coordinates are outside France or invalid. Use it to check season integrity instead of reading every chef.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "season": {
+                        "type": ["integer", "null"],
+                        "description": "Optional: report on this season only."
+                    },
+                    "expected_seasons": {
+                        "type": ["integer", "null"],
+                        "description": "Optional: number of seasons aired so far; seasons 1 to this number without chefs are listed in 'absent_seasons', including the latest ones."
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_season_summary",
+            "description": "Returns one small row per season: number of candidates (with 'shortfall' against the expected 14), the winner, and how many chefs of the season miss each key field. Also lists 'absent_seasons' (no chef at all) and 'understaffed_seasons'. The cheapest way to check season integrity.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "season": {
+                        "type": ["integer", "null"],
+                        "description": "Optional: summary of this season only."
+                    },
+                    "expected_seasons": {
+                        "type": ["integer", "null"],
+                        "description": "Optional: number of seasons aired so far; seasons 1 to this number without chefs are listed in 'absent_seasons', including the latest ones."
+                    }
+                }
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_chefs_near",
+            "description": "Finds the chefs whose restaurants are closest to a point, nearest first, with their distance in km. To search around a place or address, first get its coordinates with geocode_address.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "latitude": {"type": "number", "description": "Latitude of the point."},
+                    "longitude": {"type": "number", "description": "Longitude of the point."},
+                    "radius_km": {"type": ["number", "null"], "description": f"Optional: search radius in km (default {NEARBY_DEFAULT_RADIUS_KM:g}, max {NEARBY_MAX_RADIUS_KM:g})."},
+                    "limit": {"type": ["integer", "null"], "description": f"Optional: maximum number of chefs (default 10, max {NEARBY_MAX_LIMIT})."}
+                },
+                "required": ["latitude", "longitude"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_chefs",
+            "description": "Searches chefs by words in their name, bio, current restaurant, signature dish or anecdote (accents and case ignored, every word must match, the last word may be a prefix). Returns IDs, names, seasons and which fields matched, best match first. Use it to find e.g. 'the chef known for duck à l'orange' without loading all chefs.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Words to search for, e.g. 'canard orange' or 'pâtisserie Lyon'."},
+                    "limit": {"type": ["integer", "null"], "description": f"Optional: maximum number of results (default 10, max {SEARCH_MAX_LIMIT})."},
+                    "season": {"type": ["integer", "null"], "description": "Optional: only search chefs of this season."}
+                },
+                "required": ["query"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "add_db_column",
+            "description": "Declares a new enrichment field for all chefs, named 'custom_<name>' (e.g. 'custom_michelin_stars'). It is stored in each chef's attributes, so no schema change or restart is involved; declaring it indexes it so find_data_gaps and lookups on it stay fast. Writing a custom_* field with update_chef_record also works without declaring it first.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "column_name": {"type": "string", "description": "The field name: 'custom_' followed by lowercase letters, digits or underscores."}
+                },
+                "required": ["column_name"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "remove_db_column",
+            "description": "Removes a 'custom_<name>' enrichment field (and its values) from every chef. Built-in columns cannot be removed.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "column_name": {"type": "string", "description": "The custom field to remove, e.g. 'custom_michelin_stars'."}
+                },
+                "required": ["column_name"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -631,7 +1023,7 @@ tools_list = [
         "type": "function",
         "function": {
             "name": "add_chef",
-            "description": "Adds a new chef to the database. Requires name and season. Other fields like bio, image_url, status, and restaurant_address are optional.",
+            "description": "Adds a new chef to the database. Requires name and season. Other fields like bio, image_url, status, and restaurant_address are optional. No need to list the season first: if the chef is already there (same name, ignoring case, accents and word order) nothing is added and the existing chef_id is returned (status 'Exists'); if the season has similar names (sound-alike or close spelling) they are returned as candidates (status 'Similar') and nothing is added unless confirm_new is true.",
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -658,11 +1050,53 @@ tools_list = [
                     "restaurant_address": {
                         "type": ["string", "null"],
                         "description": "Optional: The restaurant address of the chef."
+                    },
+                    "confirm_new": {
+                        "type": ["boolean", "null"],
+                        "description": "Optional: set to true, after checking the candidates of a 'Similar' answer, to add the chef anyway."
                     }
                 },
                 "required": ["name", "season"]
             }
         }
+    },
+    # --- NEW TOOL DEFINITION for bulk add/update ---
+    {
+        "type": "function",
+        "function": {
+            "name": "upsert_chefs",
+            "description": "Adds or updates MANY chefs in a single call and a single database transaction (e.g. all candidates of a season). Each item is matched to an existing chef by 'id', or else by 'name' within 'season'; only fields that differ are written. Custom enrichment fields named 'custom_<name>' may be included too (stored in the chef's attributes; a null value removes one). New chefs require 'name', 'season' and 'restaurant_address'. Returns the outcome of every item (inserted, updated, unchanged, not_found, invalid).",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "chefs": {
+                        "type": "array",
+                        "description": "The chef records to add or update.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "id": {"type": "integer", "description": "Optional: ID of an existing chef to update."},
+                                "name": {"type": "string"},
+                                "season": {"type": "integer"},
+                                "bio": {"type": ["string", "null"]},
+                                "image_url": {"type": ["string", "null"]},
+                                "status": {"type": ["string", "null"]},
+                                "restaurant_address": {"type": "string"},
+                                "latitude": {"type": ["number", "null"]},
+                                "longitude": {"type": ["number", "null"]},
+                                "current_restaurant": {"type": ["string", "null"]},
+                                "season_number": {"type": ["integer", "null"]},
+                                "signature_dish": {"type": ["string", "null"]},
+                                "cool_anecdote": {"type": ["string", "null"]}
+                            },
+                            "patternProperties": {"^custom_[a-z0-9_]+$": {}},
+                            "additionalProperties": False
+                        }
+                    }
+                },
+                "required": ["chefs"]
+            }
+        }
     }
 ]
 
@@ -683,16 +1117,133 @@ def execute_get_chefs_for_season(season_number: int):
         print(f"  Error getting chefs for season {season_number}: {e}", flush=True)
         return error_msg
 
+def execute_find_data_gaps(fields: list = None, season: int = None, limit: int = 50):
+    """Lists the chefs missing data (IDs and missing field names only), via an indexed query."""
+    tool_input_data = {"fields": fields, "season": season, "limit": limit}
+    log_to_ui("tool_start", {"name": "find_data_gaps", "input": tool_input_data})
+    print(f"--- Tool: Executing Find Data Gaps ---", flush=True)
+    print(f"  Fields: {fields}, Season: {season}, Limit: {limit}", flush=True)
+    try:
+        gaps = find_data_gaps(fields, season=season, limit=limit if limit is not None else 50)
+        result_msg = json.dumps(gaps)
+        log_to_ui("tool_result", {"name": "find_data_gaps", "input": tool_input_data, "result": f"{len(gaps['gaps'])} chefs with gaps{' (more remain)' if gaps['has_more'] else ''}."})
+        print(f"  Chefs with gaps: {len(gaps['gaps'])} (more remain: {gaps['has_more']})", flush=True)
+        return result_msg
+    except Exception as e:
+        error_msg = json.dumps({"error": f"Failed to find data gaps: {e}"})
+        log_to_ui("tool_error", {"name": "find_data_gaps", "input": tool_input_data, "error": str(e)})
+        print(f"  Error finding data gaps: {e}", flush=True)
+        return error_msg
+
+def execute_get_completeness_report(season: int = None, expected_seasons: int = None):
+    """Summarises how complete the roster is: per field, per season (candidates vs 14), absent seasons, bad coordinates."""
+    tool_input_data = {"season": season, "expected_seasons": expected_seasons}
+    log_to_ui("tool_start", {"name": "get_completeness_report", "input": tool_input_data})
+    print(f"--- Tool: Executing Get Completeness Report ---", flush=True)
+    print(f"  Season: {season}", flush=True)
+    try:
+        report = completeness_report(season, expected_seasons=expected_seasons)
+        result_msg = json.dumps(report)
+        summary = f"{report.get('complete_pct')}% complete" + (f", {len(report['understaffed_seasons'])} understaffed seasons" if season is None else "")
+        log_to_ui("tool_result", {"name": "get_completeness_report", "input": tool_input_data, "result": summary})
+        print(f"  Completeness: {summary}", flush=True)
+        return result_msg
+    except Exception as e:
+        error_msg = json.dumps({"error": f"Failed to compute completeness report: {e}"})
+        log_to_ui("tool_error", {"name": "get_completeness_report", "input": tool_input_data, "error": str(e)})
+        print(f"  Error computing completeness report: {e}", flush=True)
+        return error_msg
+
+def execute_get_season_summary(season: int = None, expected_seasons: int = None):
+    """Per-season candidate counts, winner and missing-field tallies, read from the season_summary table."""
+    tool_input_data = {"season": season, "expected_seasons": expected_seasons}
+    log_to_ui("tool_start", {"name": "get_season_summary", "input": tool_input_data})
+    print(f"--- Tool: Executing Get Season Summary ---", flush=True)
+    print(f"  Season: {season}", flush=True)
+    try:
+        report = season_summary_report(season, expected_seasons=expected_seasons)
+        result_msg = json.dumps(report)
+        log_to_ui("tool_result", {"name": "get_season_summary", "input": tool_input_data, "result": f"{len(report['seasons'])} seasons, {len(report['understaffed_seasons'])} understaffed."})
+        print(f"  Seasons: {len(report['seasons'])}, understaffed: {report['understaffed_seasons']}", flush=True)
+        return result_msg
+    except Exception as e:
+        error_msg = json.dumps({"error": f"Failed to get season summary: {e}"})
+        log_to_ui("tool_error", {"name": "get_season_summary", "input": tool_input_data, "error": str(e)})
+        print(f"  Error getting season summary: {e}", flush=True)
+        return error_msg
+
+# What find_chefs_near returns per chef: enough to answer "who cooks near X" without the long texts
+NEARBY_TOOL_FIELDS = ("id", "name", "season", "status", "current_restaurant", "restaurant_address", "latitude", "longitude")
+
+def execute_find_chefs_near(latitude: float, longitude: float, radius_km: float = NEARBY_DEFAULT_RADIUS_KM, limit: int = 10):
+    """Finds the chefs closest to a point (nearest first, with distance in km) using the spatial grid index."""
+    tool_input_data = {"latitude": latitude, "longitude": longitude, "radius_km": radius_km, "limit": limit}
+    log_to_ui("tool_start", {"name": "find_chefs_near", "input": tool_input_data})
+    print(f"--- Tool: Executing Find Chefs Near ---", flush=True)
+    print(f"  Point: ({latitude}, {longitude}), Radius: {radius_km} km, Limit: {limit}", flush=True)
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+        radius_km = float(radius_km) if radius_km is not None else NEARBY_DEFAULT_RADIUS_KM
+        limit = int(limit) if limit is not None else 10
+    except (TypeError, ValueError):
+        log_to_ui("tool_error", {"name": "find_chefs_near", "input": tool_input_data, "error": "Invalid coordinates, radius or limit."})
+        return json.dumps({"error": "latitude, longitude, radius_km and limit must be numbers."})
+    if not (-90.0 <= latitude <= 90.0 and -180.0 <= longitude <= 180.0):
+        log_to_ui("tool_error", {"name": "find_chefs_near", "input": tool_input_data, "error": "Coordinates out of range."})
+        return json.dumps({"error": "Coordinates out of range."})
+    radius_km = min(max(radius_km, 0.001), NEARBY_MAX_RADIUS_KM)
+    limit = min(max(limit, 1), NEARBY_MAX_LIMIT)
+    try:
+        ranked = get_geo_index().nearby(latitude, longitude, radius_km, limit)
+        chefs = [{**{name: chef.get(name) for name in NEARBY_TOOL_FIELDS}, "distance_km": round(distance, 2)} for distance, chef in ranked]
+        result_msg = json.dumps({"chefs": chefs, "radius_km": radius_km})
+        log_to_ui("tool_result", {"name": "find_chefs_near", "input": tool_input_data, "result": f"{len(chefs)} chefs within {radius_km:g} km."})
+        print(f"  Found {len(chefs)} chefs within {radius_km:g} km.", flush=True)
+        return result_msg
+    except Exception as e:
+        error_msg = json.dumps({"error": f"Failed to find chefs near ({latitude}, {longitude}): {e}"})
+        log_to_ui("tool_error", {"name": "find_chefs_near", "input": tool_input_data, "error": str(e)})
+        print(f"  Error finding nearby chefs: {e}", flush=True)
+        return error_msg
+
+def execute_search_chefs(query: str, limit: int = 10, season: int = None):
+    """Full-text, accent-insensitive search over chef names, bios, restaurants, signature dishes and anecdotes."""
+    tool_input_data = {"query": query, "limit": limit, "season": season}
+    log_to_ui("tool_start", {"name": "search_chefs", "input": tool_input_data})
+    print(f"--- Tool: Executing Search Chefs ---", flush=True)
+    print(f"  Query: {query}, Limit: {limit}, Season: {season}", flush=True)
+    try:
+        limit = min(max(int(limit), 1), SEARCH_MAX_LIMIT) if limit is not None else 10
+        results = search_chefs(query, limit=limit, season=season)
+        result_msg = json.dumps(results)
+        log_to_ui("tool_result", {"name": "search_chefs", "input": tool_input_data, "result": f"{len(results['results'])} chefs found."})
+        print(f"  Found {len(results['results'])} chefs ({results['backend']} search).", flush=True)
+        return result_msg
+    except Exception as e:
+        error_msg = json.dumps({"error": f"Failed to search chefs: {e}"})
+        log_to_ui("tool_error", {"name": "search_chefs", "input": tool_input_data, "error": str(e)})
+        print(f"  Error searching chefs: {e}", flush=True)
+        return error_msg
+
 # Map tool names to their execution functions
 available_functions = {
     # "get_distinct_seasons": execute_get_distinct_seasons, # Removed
     "get_all_chefs": execute_get_all_chefs, # Renamed from get_chefs_by_season
     "get_chefs_for_season": execute_get_chefs_for_season, # Re-added for specific season lookup
+    "find_data_gaps": execute_find_data_gaps, # Indexed missing-data lookup
+    "get_completeness_report": execute_get_completeness_report, # Roster-wide completeness statistics
+    "get_season_summary": execute_get_season_summary, # One row per season from the season_summary table
+    "find_chefs_near": execute_find_chefs_near, # Spatial grid lookup, nearest first
+    "search_chefs": execute_search_chefs, # Full-text search over names and texts
     "add_chef": execute_add_chef, # NEW TOOL
+    "upsert_chefs": execute_upsert_chefs, # Bulk add/update in one transaction
     "update_chef_record": execute_update_chef_record,
+    "patch_chef_record": execute_patch_chef_record, # Multi-field atomic update
     "search_web_perplexity": execute_search_web_perplexity,
     "geocode_address": execute_geocode_address,
     "geocode_address_and_update": execute_geocode_address_and_update, # New combined tool
+    "add_db_column": execute_add_db_column, # custom_* field in the attributes document, no ALTER TABLE
+    "remove_db_column": execute_remove_db_column,
     "read_journal": execute_read_journal,
     "append_journal_entry": execute_append_journal_entry
 }
@@ -740,12 +1291,21 @@ def run_llm_driven_agent_cycle(task_prompt: str, max_iterations=15):
 
     **Outils Disponibles (Votre Équipement de Cuisine) :**
     - `get_all_chefs` : Obtenir tous les enregistrements de chefs depuis la base. (Remplace les anciens outils par saison).
+    - `find_data_gaps` : Trouver les chefs dont des champs sont vides (bio, image_url, restaurant_address, latitude, longitude...), via une requête indexée. Ne renvoie que les IDs et les champs manquants : à utiliser pour repérer le travail à faire au lieu de parcourir `get_all_chefs`.
+    - `get_season_summary` : Obtenir une ligne par saison (nombre de candidats face aux 14 attendus, gagnant, champs manquants) ainsi que les saisons absentes ou incomplètes (passez `expected_seasons` pour détecter aussi les dernières saisons manquantes). Le moyen le plus économique de vérifier l'intégrité des saisons.
+    - `get_completeness_report` : Obtenir en un petit rapport l'état de la base : % de complétude par champ et par saison, nombre de candidats par saison face aux 14 attendus, saisons absentes, chefs aux coordonnées hors de France.
     - `search_web_perplexity` : Rechercher des infos spécifiques sur un chef sur le web.
-    - `update_chef_record` : Mettre à jour un enregistrement chef. Champs autorisés : 'bio', 'image_url', 'status', 'restaurant_address', 'latitude', 'longitude', 'current_restaurant', 'season_number', 'signature_dish'. **À utiliser UNIQUEMENT après vérification/géocodage.**
+    - `update_chef_record` : Mettre à jour un enregistrement chef. Champs autorisés : 'bio', 'image_url', 'status', 'restaurant_address', 'latitude', 'longitude', 'current_restaurant', 'season_number', 'signature_dish', 'cool_anecdote'. **À utiliser UNIQUEMENT après vérification/géocodage.**
+    - `patch_chef_record` : Mettre à jour PLUSIEURS champs d'un même chef en un seul appel atomique (mêmes champs autorisés). À préférer à plusieurs appels `update_chef_record` dès que vous avez plusieurs valeurs vérifiées pour un chef.
+    - `search_chefs` : Rechercher des chefs par mots-clés dans leur nom, bio, restaurant, plat signature ou anecdote (sans tenir compte des accents). Renvoie les IDs et les champs correspondants : à utiliser au lieu de charger tous les chefs pour retrouver quelqu'un.
+    - `find_chefs_near` : Trouver les chefs dont le restaurant est le plus proche d'un point (latitude/longitude), du plus proche au plus lointain, avec la distance en km. Pour une adresse ou une ville, géocodez-la d'abord avec `geocode_address`.
     - `geocode_address` : Obtenir latitude/longitude à partir d'une adresse (à utiliser si l'adresse existe mais pas les coordonnées). Biaisé vers la France.
+    - `add_db_column` / `remove_db_column` : Déclarer (et indexer) ou supprimer un champ d'enrichissement `custom_<nom>`. Ces champs sont stockés dans les attributs du chef, sans modification du schéma ni redémarrage ; on les écrit avec `update_chef_record` ou `patch_chef_record`.
     - `read_journal` : Lire tout votre journal persistant pour se souvenir des événements passés.
     - `append_journal_entry` : Ajouter une entrée à votre journal persistant. Types : "Observation", "Action", "Erreur", "Insight", "Correction".
     - `geocode_address_and_update` : Géocoder une adresse et mettre à jour atomiquement latitude et longitude pour un chef.
+    - `add_chef` : Ajouter un chef. Inutile de lister la saison avant : si le chef y figure déjà (même nom, sans tenir compte des accents ni de l'ordre), rien n'est ajouté et son ID est renvoyé ; si des noms proches existent, ils sont proposés et rien n'est ajouté sans `confirm_new`.
+    - `upsert_chefs` : Ajouter ou mettre à jour PLUSIEURS chefs en un seul appel (ex : tous les candidats d'une saison). Préférez-le à des appels répétés quand vous avez plusieurs fiches à écrire.
 
     **Votre Workflow & Journalisation :**
     1. Accusez réception de la tâche.
@@ -757,12 +1317,12 @@ def run_llm_driven_agent_cycle(task_prompt: str, max_iterations=15):
         - Trouvez une information intéressante et non triviale (ex : une actu récente, un détail sur le restaurant, un fait unique dans la bio).
         - Présentez-la de façon engageante (ex : "Le saviez-vous ?", "Incroyable ! Il semble que le chef X...").
         - Concluez le tour après avoir partagé le fait. Si rien d'intéressant n'est trouvé, dites-le et concluez.
-    3. **Si la tâche est Brainstorming :** Réfléchissez à quelles nouvelles infos pourraient intéresser les fans de Top Chef (ex : plat signature, victoires marquantes, lien réseaux sociaux) ou si certaines colonnes existantes sont redondantes/inutiles. Proposez d'ajouter une colonne avec `add_db_column` ou d'en retirer une avec `remove_db_column`. Consignez le plan et le résultat.
+    3. **Si la tâche est Brainstorming :** Réfléchissez à quelles nouvelles infos pourraient intéresser les fans de Top Chef (ex : plat signature, victoires marquantes, lien réseaux sociaux) ou si certaines colonnes existantes sont redondantes/inutiles. Proposez d'ajouter un champ `custom_<nom>` avec `add_db_column` ou d'en retirer un avec `remove_db_column` (les colonnes de base ne peuvent pas être retirées). Consignez le plan et le résultat.
     4. **Si la tâche est Routine Check :** Annoncez que vous effectuez une vérification de routine de la base.
-    5. Récupérez TOUS les chefs via `get_all_chefs`.
+    5. Repérez les données manquantes via `find_data_gaps` (IDs + champs manquants), sans charger toute la base. Vérifiez les effectifs par saison (14 candidats attendus) et les saisons absentes via `get_season_summary`. N'utilisez `get_all_chefs` ou `get_chefs_for_season` que pour lire la fiche d'un chef à corriger.
     6. **Analyse Critique des Données (Routine Check) :**
-        - Sélectionnez un sous-ensemble de chefs (ex : les 5-10 premiers ou un échantillon aléatoire) à analyser lors de ce cycle pour ne pas surcharger le contexte. Indiquez lesquels sont vérifiés.
-        - Examinez chaque fiche pour champs manquants (surtout `restaurant_address`, `latitude`, `longitude`), incohérences et plausibilité.
+        - Sélectionnez un sous-ensemble des chefs renvoyés par `find_data_gaps` (ex : 5-10) à traiter lors de ce cycle pour ne pas surcharger le contexte. Indiquez lesquels sont traités.
+        - Partez des champs manquants signalés (surtout `restaurant_address`, `latitude`, `longitude`) et vérifiez incohérences et plausibilité.
         - **Priorité 1 : Adresse manquante** : Si `restaurant_address` est manquante ou vide, c'est critique. Prévoyez d'utiliser `search_web_perplexity` pour la trouver.
         - **Priorité 2 : Coordonnées manquantes** : Si l'adresse existe mais pas les coordonnées, prévoyez `geocode_address`.
         - **Priorité 3 : Autres infos manquantes** : Vérifiez `bio`, `status`, etc. et prévoyez `search_web_perplexity` si besoin.
@@ -779,7 +1339,7 @@ def run_llm_driven_agent_cycle(task_prompt: str, max_iterations=15):
         - **Planifiez la Suite si Besoin** : Si le géocodage a réussi, la prochaine étape immédiate DOIT être de planifier et exécuter `update_chef_record` pour latitude/longitude avec le résultat. Si une adresse a été trouvée, prévoyez de la mettre à jour puis de la géocoder au prochain cycle.
     11. **Évaluez la Suite & Consignez l'Insight (Routine Check/Brainstorming) :**
         - Selon le résultat, décidez de la suite (ex : planifier une mise à jour, tenter une autre recherche, passer au chef suivant).
-        - **Consignez Insight** : Si vous apprenez quelque chose (ex : "Recherche Perplexity inefficace pour les images", "Ajouter/retirer une colonne nécessite un redémarrage ORM"), consignez-le avec `append_journal_entry` (type "Insight"). Consultez le journal pour voir si cela affine des insights précédents.
+        - **Consignez Insight** : Si vous apprenez quelque chose (ex : "Recherche Perplexity inefficace pour les images", "Le géocodage échoue sur les adresses sans code postal"), consignez-le avec `append_journal_entry` (type "Insight"). Consultez le journal pour voir si cela affine des insights précédents.
     12. **Gérez Plusieurs Problèmes (Routine Check) :** Priorisez dans le sous-ensemble. Utilisez le journal pour suivre les problèmes secondaires ou ceux des chefs non vérifiés pour les cycles suivants.
     13. **Corrections :** Si vous réalisez qu'une entrée du journal doit être corrigée, consignez une "Correction", en référant l'`correction_target_entry_id`. Expliquez-le comme une clarification à l'antenne.
     14. **Concluez le Tour :** Résumez vos actions et découvertes pour les téléspectateurs. "Quelle vérification ! Nous avons examiné les chefs X, Y, Z, trouvé A, consigné B, et la base est C. À bientôt pour la suite !". Dites clairement si la vérification du sous-ensemble est terminée ou si des problèmes restent suivis dans le journal. Si vous venez de partager un Fun Fact, signez avec panache.
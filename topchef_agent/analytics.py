@@ -0,0 +1,191 @@
+"""
+Completeness Analytics for the TopChef roster.
+Loads the roster once into a columnar form, one integer bitmask per field
+(bit i set = chef i lacks that value), and derives the missing-field matrix,
+per-field and per-season completeness, candidate counts against the expected
+cast size and coordinates outside France with bitwise operations.
+Reports are cached per data version, so page views and agent calls reuse them.
+"""
+import threading
+
+from topchef_agent.database import Chef, load_database, get_cached_data_version, get_season_summaries
+
+# Candidates expected in every Top Chef France season
+EXPECTED_CANDIDATES_PER_SEASON = 14
+# (min_lat, max_lat, min_lon, max_lon) accepted for map markers: metropolitan France and Corsica
+FRANCE_BOUNDS = (41.0, 51.5, -5.5, 10.0)
+# Bookkeeping columns that say nothing about how complete a chef's record is (custom_* attributes are optional extras)
+NON_CONTENT_FIELDS = ("id", "revision", "last_updated", "attributes")
+
+
+def _is_missing(value) -> bool:
+    """Same rule as the database's data-gap indexes: NULL, or an empty string."""
+    return value is None or value == ""
+
+
+def _absent_seasons(present, expected_seasons: int = None) -> list:
+    """Seasons from 1 up to expected_seasons (or the highest season present, whichever is larger)
+    that have no chefs. Without expected_seasons, missing trailing seasons cannot be detected."""
+    present = {season for season in present if isinstance(season, int)}
+    last = max(max(present, default=0), expected_seasons or 0)
+    return sorted(set(range(1, last + 1)) - present)
+
+
+def _pct(filled: int, total: int):
+    return round(100.0 * filled / total, 1) if total else None
+
+
+class RosterColumns:
+    """The roster as columns of bitmasks. Bit i of every mask refers to self.ids[i]."""
+
+    def __init__(self, chefs: list, fields: tuple):
+        self.fields = fields
+        self.ids = [chef.get("id") for chef in chefs]
+        self.size = len(chefs)
+        self.all = (1 << self.size) - 1
+        self.missing = dict.fromkeys(fields, 0)
+        self.by_season = {} # season -> mask of its chefs
+        self.out_of_france = 0 # Both coordinates present but outside FRANCE_BOUNDS
+        self.invalid_coordinates = 0 # Present but not numbers
+        min_lat, max_lat, min_lon, max_lon = FRANCE_BOUNDS
+        for i, chef in enumerate(chefs): # The only per-chef pass; everything else works on whole columns
+            bit = 1 << i
+            for field in fields:
+                if _is_missing(chef.get(field)):
+                    self.missing[field] |= bit
+            season = chef.get("season")
+            self.by_season[season] = self.by_season.get(season, 0) | bit
+            lat, lon = chef.get("latitude"), chef.get("longitude")
+            if lat is None or lon is None:
+                continue
+            try:
+                lat, lon = float(lat), float(lon)
+            except (TypeError, ValueError):
+                self.invalid_coordinates |= bit
+                continue
+            if not (min_lat < lat < max_lat and min_lon < lon < max_lon):
+                self.out_of_france |= bit
+
+    @property
+    def mappable(self) -> int:
+        """Chefs with both coordinates, numeric and inside France."""
+        has_coordinates = self.all & ~(self.missing.get("latitude", 0) | self.missing.get("longitude", 0))
+        return has_coordinates & ~self.out_of_france & ~self.invalid_coordinates
+
+    def ids_in(self, mask: int) -> list:
+        """Chef IDs whose bits are set in mask."""
+        ids = []
+        while mask:
+            low = mask & -mask
+            ids.append(self.ids[low.bit_length() - 1])
+            mask ^= low
+        return ids
+
+    def missing_matrix(self) -> list:
+        """[[chef_id, missing_bits], ...] where bit j of missing_bits is set if self.fields[j] is missing."""
+        rows = [0] * self.size
+        for j, field in enumerate(self.fields):
+            mask, bit = self.missing[field], 1 << j
+            while mask:
+                low = mask & -mask
+                rows[low.bit_length() - 1] |= bit
+                mask ^= low
+        return [[chef_id, bits] for chef_id, bits in zip(self.ids, rows)]
+
+    def report(self, expected_per_season: int = EXPECTED_CANDIDATES_PER_SEASON, expected_seasons: int = None) -> dict:
+        """Completeness summary of the whole roster, per field and per season. expected_seasons (the
+        number of seasons aired so far) lets absent_seasons include missing trailing seasons."""
+        cells = len(self.fields)
+        total_missing = sum(mask.bit_count() for mask in self.missing.values())
+        fields = {
+            field: {"missing": mask.bit_count(), "complete_pct": _pct(self.size - mask.bit_count(), self.size)}
+            for field, mask in self.missing.items()
+        }
+        seasons = {}
+        for season in sorted(self.by_season, key=lambda s: (s is None, s)):
+            season_mask = self.by_season[season]
+            candidates = season_mask.bit_count()
+            missing = {field: (mask & season_mask).bit_count() for field, mask in self.missing.items()}
+            missing_cells = sum(missing.values())
+            seasons["unknown" if season is None else str(season)] = {
+                "candidates": candidates,
+                "expected": expected_per_season,
+                "shortfall": max(0, expected_per_season - candidates),
+                "complete_pct": _pct(candidates * cells - missing_cells, candidates * cells),
+                "missing": {field: count for field, count in missing.items() if count},
+            }
+        return {
+            "total_chefs": self.size,
+            "fields_checked": list(self.fields),
+            "complete_pct": _pct(self.size * cells - total_missing, self.size * cells),
+            "fields": fields,
+            "seasons": seasons,
+            "expected_seasons": expected_seasons,
+            "absent_seasons": _absent_seasons(self.by_season, expected_seasons),
+            "understaffed_seasons": [key for key, s in seasons.items() if key != "unknown" and s["shortfall"]],
+            "out_of_france": self.ids_in(self.out_of_france),
+            "invalid_coordinates": self.ids_in(self.invalid_coordinates),
+            "mappable": self.mappable.bit_count(),
+        }
+
+
+def completeness_fields() -> tuple:
+    """Chef columns that count towards completeness."""
+    return tuple(c.name for c in Chef.__table__.columns if c.name not in NON_CONTENT_FIELDS)
+
+
+_lock = threading.Lock()
+_cached = (None, None) # (data version, RosterColumns)
+
+def get_roster_columns() -> RosterColumns:
+    """Columnar roster for the current data version, rebuilt only after the data changes."""
+    global _cached
+    version = get_cached_data_version()
+    with _lock:
+        cached_version, columns = _cached
+        if columns is not None and cached_version == version:
+            return columns
+    columns = RosterColumns(load_database(), completeness_fields())
+    if columns.out_of_france or columns.invalid_coordinates:
+        print(f"Warning: chefs with unusable coordinates (kept off the map): "
+              f"outside France {columns.ids_in(columns.out_of_france)}, invalid {columns.ids_in(columns.invalid_coordinates)}", flush=True)
+    with _lock:
+        _cached = (version, columns)
+    return columns
+
+
+def completeness_report(season: int = None, include_matrix: bool = False, expected_seasons: int = None) -> dict:
+    """Completeness report for the current roster, optionally narrowed to one season's entry.
+    include_matrix adds the per-chef missing-field bitmasks as {"fields", "rows": [[id, bits], ...]}.
+    expected_seasons counts seasons 1..N without chefs as absent, including trailing ones."""
+    columns = get_roster_columns()
+    report = columns.report(expected_seasons=expected_seasons)
+    if season is not None:
+        report = {"season": season, **report["seasons"].get(str(season), {"candidates": 0, "expected": EXPECTED_CANDIDATES_PER_SEASON,
+                                                                             "shortfall": EXPECTED_CANDIDATES_PER_SEASON,
+                                                                             "complete_pct": None, "missing": {}})}
+    if include_matrix:
+        rows = columns.missing_matrix()
+        if season is not None:
+            season_ids = set(columns.ids_in(columns.by_season.get(season, 0)))
+            rows = [row for row in rows if row[0] in season_ids]
+        report["missing_matrix"] = {"fields": list(columns.fields), "rows": rows}
+    return report
+
+
+def season_summary_report(season: int = None, expected_per_season: int = EXPECTED_CANDIDATES_PER_SEASON,
+                          expected_seasons: int = None) -> dict:
+    """Season integrity from the maintained season_summary table (one row per season, no roster read):
+    every season's counts with its shortfall against the expected cast, plus absent and understaffed seasons.
+    expected_seasons counts seasons 1..N without chefs as absent, including trailing ones."""
+    summaries = get_season_summaries(season)
+    for summary in summaries:
+        summary["expected"] = expected_per_season
+        summary["shortfall"] = max(0, expected_per_season - summary["candidates"])
+    seasons = [summary["season"] for summary in summaries]
+    report = {"seasons": summaries,
+              "understaffed_seasons": [summary["season"] for summary in summaries if summary["shortfall"]]}
+    if season is None:
+        report["expected_seasons"] = expected_seasons
+        report["absent_seasons"] = _absent_seasons(seasons, expected_seasons)
+    return report
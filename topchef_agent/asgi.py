@@ -0,0 +1,137 @@
+"""
+ASGI entry point for the TopChef web app.
+Serves the SSE endpoints (/stream_logs, /stream_db_updates) natively on asyncio,
+so an idle dashboard costs a suspended coroutine instead of a worker thread, and
+forwards every other request to the existing Flask app.
+
+Run with:  uvicorn topchef_agent.asgi:app --host 0.0.0.0 --port 5000
+Requires the optional 'asgiref' and 'uvicorn' packages.
+"""
+import asyncio
+import queue
+
+try:
+    from asgiref.wsgi import WsgiToAsgi
+except ImportError as e:
+    raise ImportError("The async serving mode requires 'asgiref' (pip install asgiref uvicorn).") from e
+
+from topchef_agent.main import app as flask_app, log_broker, db_update_broker, resolve_log_session
+from topchef_agent.broker import SlowConsumerError, format_sse, parse_last_event_id
+from topchef_agent.compression import negotiate_encoding, StreamCompressor
+from topchef_agent.config import COMPRESS_SSE
+
+KEEPALIVE_SECONDS = 60
+
+SSE_HEADERS = [
+    (b"content-type", b"text/event-stream"),
+    (b"cache-control", b"no-cache"),
+    (b"x-accel-buffering", b"no"), # Stop reverse proxies from buffering the stream
+]
+
+flask_asgi = WsgiToAsgi(flask_app)
+
+
+def _header(scope, header_name: bytes) -> str:
+    for name, value in scope.get("headers", []):
+        if name == header_name:
+            return value.decode("latin-1")
+    return None
+
+
+async def _log_stream_events(last_event_id: int, resume_session_id: str):
+    """Async counterpart of main.generate_log_stream."""
+    session_id = resolve_log_session(last_event_id, resume_session_id)
+    subscription = log_broker.subscribe(session_id=session_id, last_event_id=last_event_id)
+    subscription.attach_loop(asyncio.get_running_loop())
+    try:
+        yield format_sse({"type": "session_init", "session_id": session_id})
+        while True:
+            try:
+                event_id, log_entry = await subscription.get_async(timeout=KEEPALIVE_SECONDS)
+                yield format_sse(log_entry, f"{event_id}:{session_id}")
+            except queue.Empty:
+                yield ": keepalive\n\n"
+    except SlowConsumerError as e:
+        print(f"[SSE {session_id}] {e}")
+    finally:
+        subscription.close()
+        print(f"Async SSE stream finished for session: {session_id}")
+
+
+async def _db_update_stream_events(last_event_id: int, _resume_session_id: str = None):
+    """Async counterpart of main.generate_db_update_stream."""
+    subscription = db_update_broker.subscribe(last_event_id=last_event_id)
+    subscription.attach_loop(asyncio.get_running_loop())
+    try:
+        while True:
+            try:
+                event_id, update_signal = await subscription.get_async(timeout=KEEPALIVE_SECONDS)
+                yield format_sse(update_signal, event_id)
+            except queue.Empty:
+                yield ": keepalive-db\n\n"
+    except SlowConsumerError as e:
+        print(f"DB Update SSE client disconnected as slow consumer: {e}")
+    finally:
+        subscription.close()
+        print("Async DB Update SSE stream finished.")
+
+
+STREAM_ROUTES = {
+    "/stream_logs": _log_stream_events,
+    "/stream_db_updates": _db_update_stream_events,
+}
+
+
+async def _serve_stream(scope, receive, send, make_events):
+    """Streams SSE frames until the client disconnects."""
+    last_event_id, resume_session_id = parse_last_event_id(_header(scope, b"last-event-id"))
+    encoding = negotiate_encoding(_header(scope, b"accept-encoding")) if COMPRESS_SSE else None
+    compressor = StreamCompressor(encoding) if encoding else None
+    headers = SSE_HEADERS + [(b"content-encoding", encoding.encode("latin-1"))] if encoding else SSE_HEADERS
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+
+    async def pump():
+        events = make_events(last_event_id, resume_session_id)
+        try:
+            async for frame in events:
+                body = frame.encode("utf-8")
+                if compressor is not None:
+                    body = compressor.compress(body) # Flushed per frame so events are never held back
+                await send({"type": "http.response.body", "body": body, "more_body": True})
+        finally:
+            await events.aclose()
+
+    async def wait_for_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    pump_task = asyncio.ensure_future(pump())
+    disconnect_task = asyncio.ensure_future(wait_for_disconnect())
+    done, pending = await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    if pump_task in done and disconnect_task not in done:
+        # The stream ended on its own (e.g. slow consumer); close the response so the browser reconnects
+        await send({"type": "http.response.body", "body": compressor.finish() if compressor else b"", "more_body": False})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application: async SSE endpoints, everything else handled by Flask."""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] == "http" and scope["method"] == "GET" and scope["path"] in STREAM_ROUTES:
+        await _serve_stream(scope, receive, send, STREAM_ROUTES[scope["path"]])
+        return
+    await flask_asgi(scope, receive, send)
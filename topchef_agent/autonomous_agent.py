@@ -11,7 +11,7 @@ import schedule
 from datetime import datetime
 
 # Import the necessary functions from our agent module
-from topchef_agent.agent import run_llm_driven_agent_cycle, log_to_ui, signal_database_update
+from topchef_agent.agent import run_llm_driven_agent_cycle, log_to_ui
 from topchef_agent.config import OPENROUTER_API_KEY
 
 # --- Global Counter ---
@@ -48,8 +48,8 @@ def job():
         # Pass the selected initial prompt to the agent cycle
         run_llm_driven_agent_cycle(initial_prompt)
         
-        # Signal that the database was updated
-        signal_database_update()
+        # No end-of-cycle signal: each write tool already signals the chef IDs it changed,
+        # and a payload-free signal would force every client into a full roster refresh.
         
         log_to_ui("autonomous_job_complete", {
             "job_id": job_counter,
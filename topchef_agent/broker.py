@@ -0,0 +1,260 @@
+"""
+Event Broker for the TopChef web app.
+Fans out every published event to all connected SSE subscribers, each with its
+own bounded ring buffer, so one slow or idle browser never steals events from
+another and memory stays capped no matter how many events are produced.
+Every event gets a monotonically increasing ID and recent events are kept in a
+short replay ring so reconnecting clients can resume from Last-Event-ID.
+"""
+import os
+import json
+import time
+import queue
+import asyncio
+import threading
+from collections import deque
+
+# --- Configuration ---
+# Maximum number of undelivered events kept per subscriber before dropping the oldest
+SUBSCRIBER_BUFFER_SIZE = int(os.environ.get("SSE_SUBSCRIBER_BUFFER_SIZE", 500))
+# A subscriber that has dropped this many events in a row is considered dead and disconnected
+SLOW_CONSUMER_MAX_DROPS = int(os.environ.get("SSE_SLOW_CONSUMER_MAX_DROPS", 2000))
+# Recent events kept for Last-Event-ID replay: bounded by count and by age (seconds)
+REPLAY_BUFFER_SIZE = int(os.environ.get("SSE_REPLAY_BUFFER_SIZE", 1000))
+REPLAY_MAX_AGE = float(os.environ.get("SSE_REPLAY_MAX_AGE", 300))
+
+# Event types that belong to a single interactive chat session and must not be broadcast
+SESSION_EVENT_TYPES = ("interactive_response", "interactive_error")
+
+
+class SlowConsumerError(Exception):
+    """Raised to a subscriber that fell so far behind it was disconnected."""
+
+
+class Subscription:
+    """A single SSE client's view of a broker: a bounded ring buffer plus a wake-up condition."""
+
+    def __init__(self, broker, session_id: str = None, maxsize: int = SUBSCRIBER_BUFFER_SIZE):
+        self.broker = broker
+        self.session_id = session_id
+        self.buffer = deque(maxlen=maxsize)
+        self.condition = threading.Condition()
+        self.dropped = 0 # Total events dropped for this subscriber
+        self.consecutive_drops = 0 # Drops since the subscriber last read anything
+        self.closed = False
+        # Set by async consumers: publisher threads wake the event loop instead of a blocked thread
+        self._loop = None
+        self._ready = None
+
+    def attach_loop(self, loop: asyncio.AbstractEventLoop):
+        """Switches this subscription to asyncio wake-ups on the given event loop (see get_async)."""
+        self._loop = loop
+        self._ready = asyncio.Event()
+        if self.buffer:
+            self._ready.set()
+
+    def _wake(self):
+        """Wakes whoever is waiting on this subscription. Caller holds self.condition."""
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._ready.set)
+            except RuntimeError: # The consumer's event loop is closed: nobody will ever read this subscription
+                print(f"[Broker] Dropping subscriber (session {self.session_id}) whose event loop has closed.", flush=True)
+                self._loop = None
+                self.closed = True
+                self.buffer.clear()
+        else:
+            self.condition.notify()
+
+    def wants(self, event: dict) -> bool:
+        """Returns True if this subscriber should receive the event."""
+        if event.get("type") in SESSION_EVENT_TYPES:
+            return event.get("session_id") == self.session_id
+        return True
+
+    def deliver(self, event_id: int, event: dict):
+        """Appends an event to the ring buffer, dropping the oldest one if the buffer is full."""
+        with self.condition:
+            if self.closed:
+                return
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+                self.consecutive_drops += 1
+                if self.consecutive_drops >= SLOW_CONSUMER_MAX_DROPS:
+                    print(f"[Broker] Disconnecting slow consumer (session {self.session_id}) after {self.consecutive_drops} dropped events.", flush=True)
+                    self.closed = True
+                    self.condition.notify_all()
+                    self._wake()
+                    return
+            self.buffer.append((event_id, event))
+            self._wake()
+
+    def get(self, timeout: float = None) -> tuple:
+        """Waits for the next (event_id, event) pair. Raises queue.Empty on timeout, SlowConsumerError if disconnected."""
+        with self.condition:
+            if not self.buffer and not self.closed:
+                self.condition.wait(timeout)
+            if self.buffer:
+                self.consecutive_drops = 0
+                return self.buffer.popleft()
+            if self.closed:
+                raise SlowConsumerError(f"Subscriber dropped {self.dropped} events and was disconnected.")
+            raise queue.Empty
+
+    async def get_async(self, timeout: float = None) -> tuple:
+        """Async counterpart of get() for subscriptions attached to an event loop.
+        Waiting costs a suspended coroutine rather than a blocked thread."""
+        while True:
+            with self.condition:
+                if self.buffer:
+                    self.consecutive_drops = 0
+                    return self.buffer.popleft()
+                if self.closed:
+                    raise SlowConsumerError(f"Subscriber dropped {self.dropped} events and was disconnected.")
+                self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                raise queue.Empty
+
+    def close(self):
+        """Unregisters the subscription from its broker."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+            if self._loop is not None:
+                self._wake()
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """Thread-safe publish/subscribe broker fanning events out to every subscriber."""
+
+    def __init__(self, name: str, replay_size: int = REPLAY_BUFFER_SIZE, replay_max_age: float = REPLAY_MAX_AGE):
+        self.name = name
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        # Seed IDs from the clock so they keep increasing across process restarts
+        self._last_id = int(time.time() * 1000)
+        self._recent = deque(maxlen=replay_size) # (event_id, published_at, event)
+        self.replay_max_age = replay_max_age
+
+    def subscribe(self, session_id: str = None, maxsize: int = SUBSCRIBER_BUFFER_SIZE, last_event_id: int = None) -> Subscription:
+        """Registers a new subscriber. session_id routes session-scoped events to this subscriber only.
+        If last_event_id is given, recent events published after it are replayed first."""
+        subscription = Subscription(self, session_id=session_id, maxsize=maxsize)
+        with self._lock:
+            if last_event_id is not None:
+                self._prune_recent()
+                for event_id, _, event in self._recent:
+                    if event_id > last_event_id and subscription.wants(event):
+                        subscription.deliver(event_id, event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _prune_recent(self):
+        """Drops replay entries older than replay_max_age. Caller holds the lock."""
+        cutoff = time.time() - self.replay_max_age
+        while self._recent and self._recent[0][1] < cutoff:
+            self._recent.popleft()
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event: dict, event_id: int = None) -> int:
+        """Delivers an event to every interested subscriber and records it for replay.
+        event_id is assigned by a shared backend when events come from other processes; otherwise
+        the broker numbers the event itself. Returns the event ID.
+        Nothing is queued beyond the bounded replay ring when nobody is connected."""
+        with self._lock:
+            self.published += 1
+            if event_id is None:
+                self._last_id += 1
+                event_id = self._last_id
+            else:
+                self._last_id = max(self._last_id, event_id)
+            self._recent.append((event_id, time.time(), event))
+            # Deliver under the lock so replaying subscribers never see gaps, duplicates or reordering
+            dead = []
+            for subscription in self._subscribers:
+                if subscription.wants(event):
+                    subscription.deliver(event_id, event)
+                if subscription.closed:
+                    dead.append(subscription)
+            self._subscribers.difference_update(dead)
+        return event_id
+
+    def stats(self) -> dict:
+        """Returns a snapshot of broker counters for monitoring."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "name": self.name,
+            "published": self.published,
+            "subscribers": len(subscribers),
+            "dropped": sum(s.dropped for s in subscribers),
+            "last_event_id": self._last_id,
+            "replay_buffered": len(self._recent),
+        }
+
+
+class UpdateCoalescer:
+    """Debounces bursts of database update signals into one notification per window.
+    Collects the affected chef IDs; a signal without IDs marks the whole window as a full refresh."""
+
+    def __init__(self, window: float, flush):
+        self.window = window
+        self._flush_callback = flush
+        self._lock = threading.Lock()
+        self._chef_ids = set()
+        self._full = False
+        self._timer = None
+        self.signals = 0
+        self.flushes = 0
+
+    def add(self, chef_ids=None):
+        """Records a signal; the first one in a window arms a timer that flushes the batch.
+        chef_ids must be an iterable of ints (or None/empty for a full refresh); raises ValueError otherwise."""
+        if chef_ids is not None:
+            if isinstance(chef_ids, (str, bytes)) or not hasattr(chef_ids, "__iter__"):
+                raise ValueError("chef_ids must be a list of integers.")
+            chef_ids = list(chef_ids)
+            if any(isinstance(chef_id, bool) or not isinstance(chef_id, int) for chef_id in chef_ids):
+                raise ValueError("chef_ids must be a list of integers.")
+        with self._lock:
+            self.signals += 1
+            if chef_ids:
+                self._chef_ids.update(chef_ids)
+            else:
+                self._full = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            chef_ids, full = sorted(self._chef_ids), self._full
+            self._chef_ids, self._full, self._timer = set(), False, None
+            self.flushes += 1
+        self._flush_callback(chef_ids, full)
+
+
+def format_sse(event: dict, event_id=None) -> str:
+    """Formats an event dict as a Server-Sent Events frame, with an 'id:' line when event_id is given."""
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}data: {json.dumps(event)}\n\n"
+
+
+def parse_last_event_id(header_value: str):
+    """Splits a Last-Event-ID header of the form '<id>' or '<id>:<session_id>'.
+    Returns (event_id, session_id); event_id is None if the header is missing or malformed."""
+    if not header_value:
+        return None, None
+    raw_id, _, session_id = header_value.strip().partition(":")
+    try:
+        return int(raw_id), (session_id or None)
+    except ValueError:
+        return None, None
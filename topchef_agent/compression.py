@@ -0,0 +1,127 @@
+"""
+Response Compression for the TopChef web app.
+Negotiates gzip (or Brotli, when the optional 'brotli' package is installed)
+from Accept-Encoding and compresses JSON/HTML bodies and SSE streams.
+SSE frames are flushed one by one so compression never delays an event.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+from topchef_agent.config import COMPRESSION_MIN_SIZE, COMPRESSION_LEVEL
+
+# Content types worth compressing when sent as a whole body
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/html", "text/css", "text/plain", "application/javascript")
+
+
+def supported_encodings() -> tuple:
+    """Encodings this process can produce, in order of preference."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str):
+    """Picks the best supported encoding from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in supported_encodings():
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_body(data: bytes, encoding: str, level: int = COMPRESSION_LEVEL) -> bytes:
+    """Compresses a complete response body."""
+    if encoding == "br":
+        return brotli.compress(data, quality=min(level, 11))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # 16+ selects the gzip container
+    return compressor.compress(data) + compressor.flush()
+
+
+class StreamCompressor:
+    """Incremental compressor that flushes after every chunk, so each SSE frame reaches the browser at once."""
+
+    def __init__(self, encoding: str, level: int = COMPRESSION_LEVEL):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=min(level, 11))
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def compress_stream(frames, encoding: str):
+    """Wraps a generator of str/bytes frames, yielding each frame compressed and flushed,
+    then the end-of-stream trailer once the inner generator is exhausted."""
+    compressor = StreamCompressor(encoding)
+    try:
+        for frame in frames:
+            yield compressor.compress(frame.encode("utf-8") if isinstance(frame, str) else frame)
+        yield compressor.finish()
+    finally:
+        frames.close() # Propagate GeneratorExit so the inner stream releases its subscription
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Strong ETag of the encoded representation: encodings must not share a strong validator."""
+    return f"{etag}-{encoding}"
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """True if an If-None-Match header (werkzeug ETags) matches etag or one of its encoded variants."""
+    if if_none_match.star_tag:
+        return True
+    candidates = {etag} | {encoded_etag(etag, encoding) for encoding in ("gzip", "br")}
+    return any(if_none_match.contains_weak(candidate) for candidate in candidates)
+
+
+def init_compression(app, min_size: int = COMPRESSION_MIN_SIZE):
+    """Registers an after_request hook compressing buffered responses for clients that accept it.
+    Streaming responses (SSE) are compressed by their routes with compress_stream()."""
+
+    @app.after_request
+    def compress_response(response):
+        response.vary.add("Accept-Encoding")
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code not in (200, 201)
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+        data = response.get_data()
+        if encoding is None or len(data) < min_size:
+            return response
+        response.set_data(compress_body(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(encoded_etag(etag, encoding))
+        return response
+
+    return app
@@ -35,6 +35,40 @@ LLM_MODELS_TO_TRY = [
 # DATABASE_FILE = os.getenv("DATABASE_FILE", "chefs.json") # No longer using JSON file
 DATABASE_URL = os.getenv("DATABASE_URL") # Load PostgreSQL URL from environment
 
+# --- UI Log Shipping ---
+# log_to_ui events are buffered and POSTed in batches by a background thread
+LOG_SHIP_FLUSH_INTERVAL = float(os.getenv("LOG_SHIP_FLUSH_INTERVAL", 0.5)) # Seconds between batch flushes
+LOG_SHIP_MAX_BUFFER = int(os.getenv("LOG_SHIP_MAX_BUFFER", 1000)) # Max events held in memory
+LOG_SHIP_BATCH_SIZE = int(os.getenv("LOG_SHIP_BATCH_SIZE", 100)) # Max events per POST
+LOG_SHIP_OVERFLOW_POLICY = os.getenv("LOG_SHIP_OVERFLOW_POLICY", "drop_oldest") # "drop_oldest" or "drop_newest"
+
+# --- Shared Event & State Backend ---
+# memory:// (single process), sqlite:////path/to/state.db (multi-process on one host) or redis://host:6379/0
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "memory://")
+SHARED_STATE_POLL_INTERVAL = float(os.getenv("SHARED_STATE_POLL_INTERVAL", 0.1)) # Seconds between SQLite event polls
+SHARED_STATE_EVENT_RETENTION = float(os.getenv("SHARED_STATE_EVENT_RETENTION", 600)) # Seconds SQLite keeps delivered events
+
+# --- Database Update Notifications ---
+DB_UPDATE_DEBOUNCE_SECONDS = float(os.getenv("DB_UPDATE_DEBOUNCE_SECONDS", 1.0)) # Bursts of DB update signals within this window become one event
+
+# --- Roster Cache ---
+ROSTER_CACHE_CHECK_INTERVAL = float(os.getenv("ROSTER_CACHE_CHECK_INTERVAL", 2.0)) # Seconds a cached roster is served before re-checking the data version
+
+# --- Response Compression ---
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024)) # Bodies smaller than this (bytes) are sent uncompressed
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", 6)) # gzip level 1-9 (Brotli quality is capped at 11)
+COMPRESS_SSE = os.getenv("COMPRESS_SSE", "true").lower() in ("1", "true", "yes") # Compress SSE streams for clients that accept it
+
+# --- Map Viewport Queries ---
+GEO_GRID_CELL_DEGREES = float(os.getenv("GEO_GRID_CELL_DEGREES", 0.25)) # Cell size of the in-process spatial grid (about 28 km of latitude)
+GEO_CLUSTER_MAX_ZOOM = int(os.getenv("GEO_CLUSTER_MAX_ZOOM", 11)) # From this map zoom level on, chefs are sent individually instead of clustered
+GEO_CLUSTER_CELLS_PER_TILE = int(os.getenv("GEO_CLUSTER_CELLS_PER_TILE", 4)) # Cluster cells across one 256px map tile (4 = one cluster per ~64px)
+
+# --- Text Search ---
+# "auto" uses a Postgres full-text (tsvector) index when the database supports it, else the in-process index;
+# "memory" always uses the in-process inverted index
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto").lower()
+
 # --- Validation ---
 # Add validation for OPENROUTER_API_KEY again
 if not OPENROUTER_API_KEY:
@@ -1,12 +1,20 @@
 import os
+import re
 import time # Import time for sleep
 import datetime # Import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Text, Float, text # Removed JSON
+import threading
+import zlib
+import json
+import base64
+import difflib
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Text, Float, Sequence, Index, text, select, update, bindparam, func, or_, tuple_, union_all, case, delete, exists, literal, literal_column, true, cast, JSON
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.exc import SQLAlchemyError, OperationalError # Import OperationalError for retry
 from contextlib import contextmanager
 
-from topchef_agent.config import DATABASE_URL
+from topchef_agent.config import DATABASE_URL, ROSTER_CACHE_CHECK_INTERVAL
+from topchef_agent.text_utils import name_key, phonetic_key
 
 if not DATABASE_URL:
     raise ValueError("CRITICAL: DATABASE_URL is not set. Cannot initialize database module.")
@@ -21,6 +29,17 @@ except Exception as e:
     # Depending on the app structure, might want to exit or handle differently
     raise
 
+# --- Revision Counter ---
+# Every insert, update and delete stamps the row (or its tombstone) with the next value of this
+# sequence, so "what changed since revision N" is a simple indexed range query.
+chef_revision_seq = Sequence("chef_revision_seq", metadata=Base.metadata)
+# Key of the Postgres advisory lock every revision-stamping transaction holds until it commits.
+# nextval() hands out numbers when a statement runs, not when its transaction commits; without the
+# lock, revision 11 could become visible before revision 10 and a client syncing in between would
+# skip 10 for good. Holding it makes commit order equal revision order, so the high-water mark only
+# covers committed writes. Writers take it after any name key locks and before touching chef rows.
+REVISION_LOCK_KEY = 0x5245
+
 # --- Define the Chef Table Model ---
 class Chef(Base):
     __tablename__ = "chefs"
@@ -34,11 +53,16 @@ class Chef(Base):
     restaurant_address = Column(Text, nullable=False) # Changed to nullable=False
     latitude = Column(Float, nullable=True) # NEW coordinate field
     longitude = Column(Float, nullable=True) # NEW coordinate field
-    season = Column(Integer, nullable=True)  # Ensure season column exists
+    season = Column(Integer, index=True, nullable=True)  # Ensure season column exists
     current_restaurant = Column(Text, nullable=True) # NEW column
     season_number = Column(Integer, nullable=True) # NEW column
     signature_dish = Column(Text, nullable=True) # NEW column
     cool_anecdote = Column(Text, nullable=True) # NEW column
+    revision = Column(BigInteger, index=True, nullable=True) # Bumped on every write, see chef_revision_seq
+    attributes = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True) # custom_* fields, see Custom Attributes
+
+    # Keyset pagination walks the roster in (name, id) order
+    __table_args__ = (Index("ix_chefs_name_id", "name", "id"),)
 
     def to_dict(self):
         """Converts the Chef object to a dictionary, handling potential missing columns."""
@@ -57,6 +81,252 @@ class Chef(Base):
                 data[c.name] = None # Or some other default value
         return data
 
+# --- Data Gap Indexes ---
+# Fields the agent routinely backfills. Each gets a partial index over just the rows where it is
+# missing, so find_data_gaps reads a handful of index entries instead of the whole table.
+GAP_FIELDS = ("bio", "image_url", "restaurant_address", "latitude", "longitude", "current_restaurant", "signature_dish")
+
+def _missing_condition(column):
+    """SQL condition for 'no value': NULL, or an empty string for text columns."""
+    if isinstance(column.type, Text):
+        return or_(column.is_(None), column == "")
+    return column.is_(None)
+
+GAP_INDEXES = [
+    Index(f"ix_chefs_missing_{name}", Chef.season, Chef.id,
+          postgresql_where=_missing_condition(Chef.__table__.c[name]),
+          sqlite_where=_missing_condition(Chef.__table__.c[name]))
+    for name in GAP_FIELDS
+]
+
+# --- Custom Attributes ---
+# Enrichment fields the agent invents at runtime (custom_*) live as keys of the chef's attributes
+# JSON document (JSONB on Postgres) rather than as columns: adding or dropping one takes no
+# ALTER TABLE lock and needs no restart. Keys that get queried can be given an expression index.
+CUSTOM_FIELD_PREFIX = "custom_"
+_CUSTOM_FIELD_RE = re.compile(r"^custom_[a-z0-9_]{1,48}$")
+
+def is_custom_field(name) -> bool:
+    """True for names stored in the attributes document rather than in a column."""
+    return isinstance(name, str) and name.startswith(CUSTOM_FIELD_PREFIX)
+
+def _check_custom_field(name: str):
+    if not _CUSTOM_FIELD_RE.match(name):
+        raise ValueError(f"Invalid custom field name '{name}': use 'custom_' followed by lowercase letters, digits or underscores.")
+
+def _attribute_value(name: str):
+    """SQL expression for one custom field's value (NULL when absent). The key is inlined (it is
+    validated), so the expression matches the one its index was built on."""
+    _check_custom_field(name)
+    if engine.dialect.name == "postgresql":
+        return Chef.attributes.op("->>")(literal_column(f"'{name}'"))
+    return func.json_extract(Chef.attributes, literal_column(f"'$.{name}'"))
+
+def _merged_attributes(values: dict, removed=()):
+    """SQL expression for the chef's attributes with some keys set and others removed, evaluated by
+    the UPDATE itself against the row as it is then: keys written concurrently by someone else are
+    kept, with no read-merge-write (SQLite has no SELECT ... FOR UPDATE). values maps custom field
+    names to SQL expressions (e.g. bind parameters) holding the new values as JSON text."""
+    for name in (*values, *removed):
+        _check_custom_field(name)
+    if engine.dialect.name == "postgresql":
+        merged = func.coalesce(Chef.attributes, literal_column("'{}'::jsonb"))
+        for name in removed:
+            merged = merged.op("-")(literal_column(f"'{name}'"))
+        if values:
+            merged = merged.op("||")(func.jsonb_build_object(*(part for name, value in values.items()
+                                                                for part in (literal_column(f"'{name}'"), cast(value, JSONB)))))
+        return merged
+    merged = func.coalesce(Chef.attributes, literal_column("'{}'"))
+    if removed:
+        merged = func.json_remove(merged, *(literal_column(f"'$.{name}'") for name in removed))
+    if values:
+        merged = func.json_set(merged, *(part for name, value in values.items()
+                                          for part in (literal_column(f"'$.{name}'"), func.json(value))))
+    return merged
+
+def _attribute_index_name(name: str) -> str:
+    return f"ix_{Chef.__tablename__}_attr_{name}"
+
+# Changes whenever the Chef columns change (they only change on restart), so cached JSON shapes expire too
+CHEF_SCHEMA_SIGNATURE = format(zlib.crc32(",".join(c.name for c in Chef.__table__.columns).encode()), "08x")
+
+# --- Deleted Chef Records ---
+class ChefTombstone(Base):
+    """Remembers deleted chefs so incremental sync clients can drop them. One row per chef ID: deleting
+    an ID again moves its tombstone to the new revision, and re-inserting the ID (SQLite reuses the
+    highest rowid) removes it, so a sync never reports one ID as both changed and deleted."""
+    __tablename__ = "chef_tombstones"
+
+    chef_id = Column(Integer, primary_key=True)
+    revision = Column(BigInteger, index=True, nullable=False)
+    deleted_at = Column(Text, nullable=True)
+
+# --- Per-Season Summary ---
+class SeasonSummary(Base):
+    """One row per season: candidate count, winner and missing-field tallies.
+    Kept current by every chef write (see _refresh_season_summaries), so season integrity
+    checks read a few rows instead of the roster."""
+    __tablename__ = "season_summary"
+
+    season = Column(Integer, primary_key=True)
+    candidates = Column(Integer, nullable=False, default=0)
+    winner_id = Column(Integer, nullable=True)
+    winner_name = Column(Text, nullable=True)
+    # One tally per GAP_FIELDS entry: chefs of the season missing that field
+    missing_bio = Column(Integer, nullable=False, default=0)
+    missing_image_url = Column(Integer, nullable=False, default=0)
+    missing_restaurant_address = Column(Integer, nullable=False, default=0)
+    missing_latitude = Column(Integer, nullable=False, default=0)
+    missing_longitude = Column(Integer, nullable=False, default=0)
+    missing_current_restaurant = Column(Integer, nullable=False, default=0)
+    missing_signature_dish = Column(Integer, nullable=False, default=0)
+    updated_at = Column(Text, nullable=True)
+
+    def to_dict(self):
+        return {
+            "season": self.season,
+            "candidates": self.candidates,
+            "winner_id": self.winner_id,
+            "winner_name": self.winner_name,
+            "missing": {name: getattr(self, f"missing_{name}") for name in GAP_FIELDS},
+            "updated_at": self.updated_at,
+        }
+
+# Chef columns the summary is computed from; writes touching none of them leave it alone
+SEASON_SUMMARY_SOURCE_FIELDS = frozenset(("season", "name", "status") + GAP_FIELDS)
+# First key of the Postgres advisory locks serialising summary refreshes per season
+SEASON_SUMMARY_LOCK_KEY = 0x5EA5
+
+def _winner_condition():
+    status = func.lower(Chef.status)
+    return or_(status.like("%winner%"), status.like("%gagnant%"))
+
+def _refresh_season_summaries(db, seasons):
+    """Recomputes the summary rows of the given seasons inside the caller's transaction.
+    Each refresh aggregates just that season's chefs (via ix_chefs_season), so the cost of a
+    write does not grow with the roster."""
+    seasons = sorted({season for season in seasons if season is not None})
+    if not seasons:
+        return
+    db.flush() # Make pending ORM changes visible to the aggregate
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        # Concurrent writers to one season would otherwise each aggregate without the other's change
+        for season in seasons:
+            db.execute(select(func.pg_advisory_xact_lock(SEASON_SUMMARY_LOCK_KEY, season)))
+    summary = SeasonSummary.__table__
+    aggregate = (select(Chef.season,
+                        func.count().label("candidates"),
+                        func.min(case((_winner_condition(), Chef.id))).label("winner_id"),
+                        *(func.sum(case((_missing_condition(Chef.__table__.c[name]), 1), else_=0)).label(f"missing_{name}")
+                          for name in GAP_FIELDS),
+                        literal(_utc_now_iso()).label("updated_at"))
+                 .where(Chef.season.in_(seasons))
+                 .group_by(Chef.season))
+    columns = ["season", "candidates", "winner_id"] + [f"missing_{name}" for name in GAP_FIELDS] + ["updated_at"]
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        statement = dialect_insert(summary).from_select(columns, aggregate)
+        statement = statement.on_conflict_do_update(index_elements=[summary.c.season],
+                                                    set_={name: statement.excluded[name] for name in columns if name != "season"})
+        db.execute(statement)
+    else:
+        db.execute(delete(summary).where(summary.c.season.in_(seasons)))
+        db.execute(summary.insert().from_select(columns, aggregate))
+    # Seasons left without chefs lose their row; winners get their current name
+    db.execute(delete(summary).where(summary.c.season.in_(seasons),
+                                     ~exists().where(Chef.season == summary.c.season)))
+    db.execute(update(summary).where(summary.c.season.in_(seasons))
+               .values(winner_name=select(Chef.name).where(Chef.id == summary.c.winner_id).scalar_subquery()))
+
+# --- Normalized Name Keys ---
+class ChefNameKey(Base):
+    """One row per chef: its name folded to a spelling-insensitive key and a sound-alike key
+    (see text_utils.name_key / phonetic_key), indexed with the season. Kept current by every
+    chef write, so duplicate checks are a couple of index lookups instead of a roster read."""
+    __tablename__ = "chef_name_keys"
+
+    chef_id = Column(Integer, primary_key=True)
+    season = Column(Integer, nullable=True)
+    name_key = Column(Text, nullable=False)
+    name_phonetic = Column(Text, nullable=False)
+
+    __table_args__ = (Index("ix_chef_name_keys_season_key", "season", "name_key"),
+                      Index("ix_chef_name_keys_season_phonetic", "season", "name_phonetic"))
+
+# First key of the Postgres advisory locks serialising duplicate-checked inserts per season
+NAME_KEY_LOCK_KEY = 0x4E4B
+# name_key similarity (difflib ratio) from which another chef of the season counts as a near miss
+NAME_SIMILARITY_THRESHOLD = 0.85
+NAME_MATCH_MAX_CANDIDATES = 5
+
+class DuplicateChefError(ValueError):
+    """add_chef refused a chef whose season already has the same or a very similar name."""
+
+    def __init__(self, message, existing_id=None, similar=None):
+        super().__init__(message)
+        self.existing_id = existing_id
+        self.similar = similar or []
+
+def _store_name_keys(db, chefs):
+    """Writes the name keys of (chef_id, name, season) entries inside the caller's transaction."""
+    chefs = {chef_id: (name, season) for chef_id, name, season in chefs if chef_id is not None}
+    if not chefs:
+        return
+    keys = ChefNameKey.__table__
+    db.execute(delete(keys).where(keys.c.chef_id.in_(chefs)))
+    db.execute(keys.insert(), [{"chef_id": chef_id, "season": season, "name_key": name_key(name or ""),
+                                "name_phonetic": phonetic_key(name or "")}
+                               for chef_id, (name, season) in chefs.items()])
+
+def _name_matches(db, name: str, season: int) -> dict:
+    """Chefs of the season sharing the name's key (duplicates) or resembling it (near misses).
+    One read of that season's keys through the (season, name_key) index: a cast is a dozen or two
+    names, so the cost does not grow with the roster."""
+    key, phonetic = name_key(name), phonetic_key(name)
+    keys = ChefNameKey.__table__
+    rows = db.execute(select(keys.c.chef_id, keys.c.name_key, keys.c.name_phonetic, Chef.name)
+                      .join(Chef, Chef.id == keys.c.chef_id)
+                      .where(keys.c.season == season)).all()
+    exact, similar = [], []
+    for row in rows:
+        if row.name_key == key:
+            exact.append(row.chef_id)
+            continue
+        score = difflib.SequenceMatcher(None, key.replace(" ", ""), row.name_key.replace(" ", "")).ratio()
+        if row.name_phonetic == phonetic or score >= NAME_SIMILARITY_THRESHOLD:
+            similar.append({"id": row.chef_id, "name": row.name, "season": season, "similarity": round(score, 2),
+                            "sounds_alike": row.name_phonetic == phonetic})
+    similar.sort(key=lambda match: (-match["sounds_alike"], -match["similarity"], match["id"]))
+    return {"name_key": key, "existing_ids": sorted(exact), "similar": similar[:NAME_MATCH_MAX_CANDIDATES]}
+
+def _next_revision_value():
+    """SQL expression yielding the next revision number, evaluated inside the writing statement."""
+    if engine.dialect.name == "postgresql":
+        return chef_revision_seq.next_value()
+    # Dialects without sequences (e.g. SQLite in local runs): one past the highest revision in use
+    revisions = union_all(select(Chef.revision), select(ChefTombstone.revision)).subquery()
+    return select(func.coalesce(func.max(revisions.c.revision), 0) + 1).scalar_subquery()
+
+def _lock_revisions(db):
+    """Serialises revision-stamping transactions on Postgres (see REVISION_LOCK_KEY); released on
+    commit or rollback. SQLite computes MAX+1 inside the write and already serialises writers."""
+    if engine.dialect.name == "postgresql":
+        db.execute(select(func.pg_advisory_xact_lock(REVISION_LOCK_KEY)))
+
+def _clear_tombstones(db, chef_ids):
+    """Drops the tombstones of chef IDs that are (again) in use, inside the caller's transaction."""
+    chef_ids = [chef_id for chef_id in chef_ids if chef_id is not None]
+    if chef_ids:
+        db.execute(delete(ChefTombstone.__table__).where(ChefTombstone.chef_id.in_(chef_ids)))
+
+def _utc_now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
 # --- Database Session Context Manager ---
 @contextmanager
 def get_db():
@@ -72,104 +342,173 @@ def get_db():
         db.close()
 
 # --- Database Operations ---
-# Helper to check if a column exists
-def column_exists(engine, table_name, column_name):
-    from sqlalchemy import inspect
-    inspector = inspect(engine)
-    columns = [col['name'] for col in inspector.get_columns(table_name)]
-    return column_name in columns
-
 def create_table_if_not_exists(drop_first=False):
-    """Creates the 'chefs' table. Optionally drops it first."""
+    """Brings the schema up to date through the versioned migrations (see migrations.py).
+    With drop_first every chef table is dropped and rebuilt from scratch."""
+    from topchef_agent.migrations import migrate, reset_schema
     try:
-        print("Checking if 'chefs' table exists and creating/updating if necessary...")
         if drop_first:
-            print(f"Dropping table '{Chef.__tablename__}' before creation...")
-            try:
-                Base.metadata.drop_all(bind=engine, tables=[Chef.__table__])
-                print(f"Table '{Chef.__tablename__}' dropped successfully.")
-            except Exception as drop_err:
-                print(f"Warning: Could not drop table '{Chef.__tablename__}' (might not exist): {drop_err}")
-
-        # Create table based on the model
-        Base.metadata.create_all(bind=engine)
-        print(f"Table '{Chef.__tablename__}' created/ensured.")
-
-        # Manually check and add columns if they don't exist (SQLAlchemy create_all might not add columns to existing tables)
-        # This is a simple migration strategy; Alembic is recommended for complex changes.
-        columns_to_ensure = [
-            ("restaurant_address", "TEXT"),
-            ("latitude", "FLOAT"),
-            ("longitude", "FLOAT"),
-            ("season", "INTEGER"),  # Ensure season column exists
-            ("current_restaurant", "TEXT"),  # NEW column
-            ("season_number", "INTEGER"),  # NEW column
-            ("signature_dish", "TEXT"),  # NEW column
-            ("cool_anecdote", "TEXT")  # NEW column
-        ]
-        with engine.connect() as connection:
-            for col_name, col_type in columns_to_ensure:
-                 if not column_exists(engine, Chef.__tablename__, col_name):
-                     print(f"Column '{col_name}' missing, attempting to add...")
-                     try:
-                         # Use ALTER TABLE to add the column
-                         # Making address nullable initially to avoid breaking existing data
-                         null_constraint = "NULL" if col_name == "restaurant_address" else "NULL"
-                         sql_command = text(f"ALTER TABLE {Chef.__tablename__} ADD COLUMN {col_name} {col_type} {null_constraint}")
-                         with connection.begin():
-                             connection.execute(sql_command)
-                         print(f"Successfully added column '{col_name}'.")
-                     except SQLAlchemyError as alter_err:
-                         # Check if the error is because it *now* exists (race condition?) or other issue
-                         if "already exists" in str(alter_err).lower():
-                             print(f"Column '{col_name}' already exists (detected after check).")
-                         else:
-                             print(f"Error adding column '{col_name}': {alter_err}")
-                             # Decide if this is critical; maybe raise error or just warn
-                             # raise # Uncomment to make failure critical
-
-
-        # Add sample data if the table is empty
-        with get_db() as db:
-            if db.query(Chef).count() == 0:
-                print("Table is empty. Adding initial sample data...")
-                sample_data = [
-                    Chef(name="Marie Dubois", bio="Winner of Top Chef Season 2", image_url="", status="Winner", restaurant_address="1 Rue de Rivoli, 75001 Paris, France", latitude=48.8566, longitude=2.3522, season=2, current_restaurant="Le Rivoli", season_number=2, signature_dish="Duck L'Orange"), # Example coords, season
-                    Chef(name="Pierre Martin", bio="Known for modern techniques", image_url="", status="Finalist", restaurant_address="10 Avenue des Champs-Élysées, 75008 Paris, France", latitude=48.8698, longitude=2.3070, season=1, current_restaurant="Le Champs", season_number=1, signature_dish="Foie Gras Torchon") # Example coords, season
-                ]
-                db.add_all(sample_data)
-                db.commit()
-                print("Sample data added.")
+            reset_schema()
+        migrate()
     except Exception as e:
-        print(f"CRITICAL: Failed during table creation/update: {e}")
+        print(f"CRITICAL: Failed during schema migration: {e}")
         import traceback
         traceback.print_exc() # Print full traceback for debugging
-        # Decide whether to raise or allow the app to continue potentially broken
-        # raise # Uncomment to make failure critical
 
-def load_database():
-    """Loads all chef records from the database."""
-    chefs_list = []
-    try:
-        with get_db() as db:
-            chefs = db.query(Chef).order_by(Chef.name).all()
-            chefs_list = [chef.to_dict() for chef in chefs]
-    except Exception as e:
-        print(f"Error loading database: {e}")
-        # Return empty list on error, allows UI to potentially still load
-    return chefs_list
+# --- Field Projections ---
+# Long free-text columns, left out of list views unless asked for explicitly
+LARGE_TEXT_FIELDS = ("bio", "cool_anecdote")
+# What a map marker needs: position, label, picture and season filter
+MAP_VIEW_FIELDS = ("id", "name", "season", "latitude", "longitude", "image_url", "status", "current_restaurant")
+CHEF_VIEWS = {
+    "full": None, # Every column
+    "list": tuple(c.name for c in Chef.__table__.columns if c.name not in LARGE_TEXT_FIELDS),
+    "map": MAP_VIEW_FIELDS,
+}
+
+def resolve_chef_fields(fields=None, view=None):
+    """Turns a fields= list (or comma-separated string) and/or a named view into a projection:
+    a tuple of column names in table order, always including 'id', or None for every column.
+    Raises ValueError for unknown views or fields."""
+    if view is not None and view not in CHEF_VIEWS:
+        raise ValueError(f"Unknown view '{view}'. Available: {sorted(CHEF_VIEWS)}")
+    if fields is None:
+        return CHEF_VIEWS[view] if view is not None else None
+    if isinstance(fields, str):
+        fields = [name.strip() for name in fields.split(",") if name.strip()]
+    columns = [c.name for c in Chef.__table__.columns]
+    unknown = [name for name in fields if name not in columns]
+    if unknown:
+        raise ValueError(f"Unknown fields: {unknown}. Available: {columns}")
+    view_fields = () if view is None else (CHEF_VIEWS[view] or columns) # fields= extends a view
+    requested = set(fields) | {"id"} | set(view_fields)
+    return tuple(name for name in columns if name in requested)
+
+# --- Roster Cache ---
+class RosterCache:
+    """Read-through cache of the roster (ordered by name), keyed by the data version.
+    One snapshot is kept per field projection, all tied to the same version.
+    Within check_interval of the last version check readers are served without touching the database;
+    local writes invalidate the snapshots at once, writes from other processes show up after at most
+    check_interval. Snapshots are shared, so callers must copy before handing them out."""
+
+    def __init__(self, check_interval: float = ROSTER_CACHE_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshots = {} # projection (None = every column) -> chefs
+        self._by_season = {} # (projection, season) -> chefs
+        self._version = None
+        self._checked_at = 0.0
+        self._generation = 0 # Bumped by invalidate() so a load racing a write is not cached
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.version_checks = 0
+        self.invalidations = 0
+
+    def invalidate(self):
+        """Drops every snapshot; the next read reloads."""
+        with self._lock:
+            self._snapshots, self._by_season = {}, {}
+            self._version = None
+            self._generation += 1
+            self.invalidations += 1
+
+    def _fresh(self) -> bool:
+        """True while the last version check is recent enough to trust. Caller holds the lock."""
+        return self._version is not None and time.monotonic() - self._checked_at < self.check_interval
+
+    def _check_version(self, read_version):
+        """Reads the data version and drops the snapshots if it moved. Returns (version, generation)."""
+        with self._lock:
+            generation = self._generation
+        version = read_version()
+        with self._lock:
+            self.version_checks += 1
+            if generation == self._generation:
+                if version != self._version:
+                    self._snapshots, self._by_season = {}, {}
+                    self._version = version
+                self._checked_at = time.monotonic()
+        return version, generation
+
+    def get(self, read_version, load, projection=None) -> list:
+        """Returns the snapshot for a projection, calling load() only when it is missing or stale."""
+        with self._lock:
+            chefs = self._snapshots.get(projection)
+            if chefs is not None and self._fresh():
+                self.hits += 1
+                return chefs
+        version, generation = self._check_version(read_version)
+        with self._lock:
+            chefs = self._snapshots.get(projection)
+            if chefs is not None and version == self._version:
+                self.hits += 1
+                return chefs
+        chefs = load()
+        with self._lock:
+            self.misses += 1
+            if generation == self._generation and version == self._version:
+                self._snapshots[projection] = chefs
+        return chefs
+
+    def version(self, read_version):
+        """Returns the data version, reusing the cached one while it is still within check_interval."""
+        with self._lock:
+            if self._fresh():
+                return self._version
+        return self._check_version(read_version)[0]
+
+    def get_season(self, season_number, read_version, load, projection=None) -> list:
+        """Returns the chefs of one season, derived from (and cached alongside) a projection's snapshot."""
+        chefs = self.get(read_version, load, projection)
+        with self._lock:
+            if chefs is not self._snapshots.get(projection):
+                return [chef for chef in chefs if chef.get("season") == season_number]
+            season_chefs = self._by_season.get((projection, season_number))
+            if season_chefs is None:
+                season_chefs = [chef for chef in chefs if chef.get("season") == season_number]
+                self._by_season[(projection, season_number)] = season_chefs
+            return season_chefs
+
+    def stats(self) -> dict:
+        """Returns a snapshot of cache counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached": bool(self._snapshots),
+                "version": self._version,
+                "size": max((len(chefs) for chefs in self._snapshots.values()), default=0),
+                "projections_cached": sorted(",".join(projection) if projection else "*" for projection in self._snapshots),
+                "seasons_cached": len(self._by_season),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "version_checks": self.version_checks,
+                "invalidations": self.invalidations,
+                "check_interval": self.check_interval,
+            }
 
-def load_database(max_retries=2, delay=1):
-    """Loads all chef records from the database with retry logic for connection errors."""
-    chefs_list = []
+roster_cache = RosterCache()
+
+def get_cached_data_version(max_retries=2, delay=1):
+    """Data version as seen by the roster cache; cheap enough to compute on every request (e.g. for ETags)."""
+    return roster_cache.version(lambda: get_data_version(max_retries, delay))
+
+def _query_all_chefs(max_retries=2, delay=1, projection=None):
+    """Loads all chef records straight from the database with retry logic for connection errors.
+    With a projection only those columns are selected, as plain rows rather than ORM objects."""
     attempts = 0
     while attempts <= max_retries:
         attempts += 1
         try:
             with get_db() as db:
+                if projection is not None:
+                    columns = Chef.__table__.columns
+                    rows = db.execute(select(*(columns[name] for name in projection)).order_by(Chef.name)).mappings()
+                    return [dict(row) for row in rows]
                 chefs = db.query(Chef).order_by(Chef.name).all()
-                chefs_list = [chef.to_dict() for chef in chefs]
-                return chefs_list # Success, exit loop and return
+                return [chef.to_dict() for chef in chefs]
         except OperationalError as e: # Catch specific connection errors
             print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1}: {e}", flush=True)
             if attempts > max_retries:
@@ -177,40 +516,276 @@ def load_database(max_retries=2, delay=1):
                 raise # Re-raise the exception after max retries
             print(f"Retrying in {delay} second(s)...", flush=True)
             time.sleep(delay)
-        except Exception as e:
-            print(f"Error loading database (non-retryable): {e}", flush=True)
-            # Return empty list on other errors, allows UI to potentially still load
-            return [] # Return empty list for non-connection errors
-
-    # Should not be reached if successful, but return empty list as fallback
     return []
 
-def get_chefs_by_season(season_number, max_retries=2, delay=1):
-    """Loads all chef records for a given season from the database with retry logic for connection errors."""
-    chefs_list = []
+def load_database(max_retries=2, delay=1, fields=None):
+    """Loads all chef records, served from the roster cache while the data version is unchanged.
+    fields (a list, a comma-separated string or a resolve_chef_fields() projection) limits the columns returned."""
+    projection = resolve_chef_fields(fields) # ValueError for unknown fields reaches the caller
+    try:
+        chefs = roster_cache.get(lambda: get_data_version(max_retries, delay),
+                                 lambda: _query_all_chefs(max_retries, delay, projection),
+                                 projection)
+        return [dict(chef) for chef in chefs] # Copies, so callers can't mutate the shared snapshot
+    except OperationalError:
+        raise
+    except Exception as e:
+        print(f"Error loading database (non-retryable): {e}", flush=True)
+        # Return empty list on other errors, allows UI to potentially still load
+        return []
+
+def get_chefs_by_season(season_number, max_retries=2, delay=1, fields=None):
+    """Loads all chef records for a given season, derived from the cached roster snapshot.
+    fields limits the columns returned, as for load_database."""
+    projection = resolve_chef_fields(fields)
+    if projection is not None and "season" not in projection:
+        projection = resolve_chef_fields(projection + ("season",)) # Needed to filter; dropped again below
+        drop_season = True
+    else:
+        drop_season = False
+    try:
+        chefs = roster_cache.get_season(season_number,
+                                        lambda: get_data_version(max_retries, delay),
+                                        lambda: _query_all_chefs(max_retries, delay, projection),
+                                        projection)
+        if drop_season:
+            return [{key: value for key, value in chef.items() if key != "season"} for chef in chefs]
+        return [dict(chef) for chef in chefs]
+    except OperationalError:
+        raise
+    except Exception as e:
+        print(f"Error loading chefs by season (non-retryable): {e}", flush=True)
+        return []
+
+# --- Keyset Pagination ---
+CHEF_PAGE_MAX_LIMIT = 1000
+
+def encode_cursor(*values) -> str:
+    """Packs the sort key of the last row on a page into an opaque, URL-safe cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, types: tuple) -> list:
+    """Unpacks a cursor made by encode_cursor whose values have the given types, e.g. (str, int).
+    Raises ValueError if it is malformed, so callers never compare the sort key against a value of
+    the wrong type."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Malformed cursor.") from e
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Malformed cursor.")
+    # bool is an int subclass but never a valid key
+    if any(isinstance(value, bool) or not isinstance(value, expected) for value, expected in zip(values, types)):
+        raise ValueError("Malformed cursor.")
+    return values
+
+def get_chefs_page(limit: int, after: str = None, season: int = None, fields=None, max_retries=2, delay=1):
+    """Returns one page of chefs in (name, id) order, starting after the given cursor.
+
+    Uses a keyset condition on the (name, id) index rather than OFFSET, so every page costs the
+    same however deep it is, and streams rows from a server-side cursor.
+
+    Returns:
+        tuple: (list of chef dicts, next cursor or None when this is the last page)
+    Raises:
+        ValueError: for a malformed cursor, unknown fields or a limit outside 1..CHEF_PAGE_MAX_LIMIT.
+    """
+    if not isinstance(limit, int) or not 1 <= limit <= CHEF_PAGE_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {CHEF_PAGE_MAX_LIMIT}.")
+    projection = resolve_chef_fields(fields)
+    selected = resolve_chef_fields(projection + ("name",)) if projection is not None else None # name is part of the cursor
+    columns = Chef.__table__.columns
+    query = select(*(columns[name] for name in selected)) if selected is not None else select(Chef.__table__)
+    if after is not None:
+        after_name, after_id = decode_cursor(after, (str, int))
+        query = query.where(tuple_(Chef.name, Chef.id) > tuple_(after_name, after_id))
+    if season is not None:
+        query = query.where(Chef.season == season)
+    # One extra row tells whether another page follows
+    query = query.order_by(Chef.name, Chef.id).limit(limit + 1).execution_options(stream_results=True, yield_per=200)
+
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        try:
+            with get_db() as db:
+                rows = [dict(row) for row in db.execute(query).mappings()]
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1]["name"], rows[-1]["id"])
+            if projection is not None and "name" not in projection:
+                rows = [{key: value for key, value in row.items() if key != "name"} for row in rows]
+            return rows, next_cursor
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1}: {e}", flush=True)
+            if attempts > max_retries:
+                print("Error: Max retries reached for loading a page of chefs.", flush=True)
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+    return [], None
+
+def get_chefs_by_ids(chef_ids, max_retries=2, delay=1, fields=None):
+    """Loads the chef records with the given IDs (used to patch clients after an update signal).
+    fields limits the columns returned, as for load_database."""
+    chef_ids = list(chef_ids)
+    if not chef_ids:
+        return []
+    projection = resolve_chef_fields(fields)
     attempts = 0
     while attempts <= max_retries:
         attempts += 1
         try:
             with get_db() as db:
-                chefs = db.query(Chef).filter(Chef.season == season_number).order_by(Chef.name).all()
-                chefs_list = [chef.to_dict() for chef in chefs]
-                return chefs_list  # Success, exit loop and return
+                if projection is not None:
+                    columns = Chef.__table__.columns
+                    query = select(*(columns[name] for name in projection)).where(Chef.id.in_(chef_ids)).order_by(Chef.name)
+                    return [dict(row) for row in db.execute(query).mappings()]
+                chefs = db.query(Chef).filter(Chef.id.in_(chef_ids)).order_by(Chef.name).all()
+                return [chef.to_dict() for chef in chefs]
         except OperationalError as e:
             print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1}: {e}", flush=True)
             if attempts > max_retries:
-                print("Error: Max retries reached for loading chefs by season.", flush=True)
+                print("Error: Max retries reached for loading chefs by ID.", flush=True)
                 raise
             print(f"Retrying in {delay} second(s)...", flush=True)
             time.sleep(delay)
         except Exception as e:
-            print(f"Error loading chefs by season (non-retryable): {e}", flush=True)
+            print(f"Error loading chefs by ID (non-retryable): {e}", flush=True)
             return []
     return []
 
+# --- Data Gaps ---
+DATA_GAPS_MAX_LIMIT = 1000
+
+def find_data_gaps(fields=None, season: int = None, limit: int = 100, max_retries=2, delay=1):
+    """Finds chefs missing a value (NULL or empty text) in any of the given fields.
+
+    Only IDs and the names of the missing fields come back, in id order; the WHERE clause matches
+    the partial GAP_INDEXES predicates, so the common fields are answered from those indexes.
+
+    Args:
+        fields: list or comma-separated string of columns or custom_* fields to check (default: GAP_FIELDS).
+        season: only look at this season.
+        limit: maximum number of chefs to return (1..DATA_GAPS_MAX_LIMIT).
+
+    Returns:
+        dict: {"fields": [...], "season": int|None, "gaps": [{"id": int, "missing": [...]}], "has_more": bool}
+    Raises:
+        ValueError: for unknown or protected fields, or a limit out of range.
+    """
+    if fields is None:
+        fields = GAP_FIELDS
+    elif isinstance(fields, str):
+        fields = [name.strip() for name in fields.split(",") if name.strip()]
+    fields = list(dict.fromkeys(fields)) # Keep order, drop duplicates
+    columns = Chef.__table__.columns
+    unknown = [name for name in fields if not (_CUSTOM_FIELD_RE.match(name) or (name in columns and name not in PROTECTED_CHEF_COLUMNS))]
+    if unknown or not fields:
+        raise ValueError(f"Unknown or unsupported fields: {unknown}. Available: {[c.name for c in columns if c.name not in PROTECTED_CHEF_COLUMNS]} or custom_*")
+    if not isinstance(limit, int) or not 1 <= limit <= DATA_GAPS_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {DATA_GAPS_MAX_LIMIT}.")
+
+    conditions = {}
+    for name in fields:
+        if is_custom_field(name): # Absent key, JSON null or empty string
+            value = _attribute_value(name)
+            conditions[name] = or_(value.is_(None), value == "")
+        else:
+            conditions[name] = _missing_condition(columns[name])
+    query = select(Chef.id, *(condition.label(name) for name, condition in conditions.items())).where(or_(*conditions.values()))
+    if season is not None:
+        query = query.where(Chef.season == season)
+    query = query.order_by(Chef.id).limit(limit + 1) # One extra row tells whether more gaps remain
+
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        try:
+            with get_db() as db:
+                rows = db.execute(query).all()
+            gaps = [{"id": row[0], "missing": [name for name, flag in zip(fields, row[1:]) if flag]} for row in rows[:limit]]
+            return {"fields": fields, "season": season, "gaps": gaps, "has_more": len(rows) > limit}
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1}: {e}", flush=True)
+            if attempts > max_retries:
+                print("Error: Max retries reached for finding data gaps.", flush=True)
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+    return {"fields": fields, "season": season, "gaps": [], "has_more": False}
+
+# --- Custom Field Management ---
+def _run_index_ddl(statement: str):
+    """Runs CREATE/DROP INDEX outside a transaction so Postgres can build it CONCURRENTLY,
+    without blocking writes to the chefs table."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(statement))
+
+def add_custom_field(name: str) -> bool:
+    """Declares a custom_* field by indexing its key in the attributes document, so lookups and
+    gap searches on it use an index. No ALTER TABLE: values can be written with or without this."""
+    _check_custom_field(name)
+    # Same expression as _attribute_value, with the column unqualified as index definitions require
+    if engine.dialect.name == "postgresql":
+        concurrently, expression = "CONCURRENTLY ", f"attributes ->> '{name}'"
+    else:
+        concurrently, expression = "", f"json_extract(attributes, '$.{name}')"
+    try:
+        _run_index_ddl(f"CREATE INDEX {concurrently}IF NOT EXISTS {_attribute_index_name(name)} ON {Chef.__tablename__} (({expression}))")
+        print(f"Indexed custom field '{name}'.", flush=True)
+        return True
+    except SQLAlchemyError as e:
+        print(f"Error indexing custom field '{name}': {e}", flush=True)
+        return False
+
+def remove_custom_field(name: str, max_retries=2, delay=1) -> bool:
+    """Drops a custom_* field: its index, and the key from every chef that has it (those chefs get a
+    new revision, so sync clients see the change)."""
+    _check_custom_field(name)
+    concurrently = "CONCURRENTLY " if engine.dialect.name == "postgresql" else ""
+    try:
+        _run_index_ddl(f"DROP INDEX {concurrently}IF EXISTS {_attribute_index_name(name)}")
+    except SQLAlchemyError as e:
+        print(f"Error dropping the index of custom field '{name}': {e}", flush=True)
+        return False
+    if engine.dialect.name == "postgresql":
+        stripped = Chef.attributes.op("-")(literal_column(f"'{name}'"))
+    else:
+        stripped = func.json_remove(Chef.attributes, literal_column(f"'$.{name}'"))
+    statement = (update(Chef).where(_attribute_value(name).is_not(None))
+                 .values(attributes=stripped, revision=_next_revision_value(), last_updated=_utc_now_iso()))
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        try:
+            with get_db() as db:
+                _lock_revisions(db)
+                removed = db.execute(statement).rowcount
+                db.commit()
+            roster_cache.invalidate()
+            print(f"Removed custom field '{name}' from {removed} chef(s).", flush=True)
+            return True
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1} while removing custom field '{name}': {e}", flush=True)
+            if attempts > max_retries:
+                print(f"Error: Max retries reached for removing custom field '{name}'.", flush=True)
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+    return False
+
 # --- NEW FUNCTION TO ADD COLUMN ---
 def add_column(table_name: str, column_name: str, column_type: str):
-    """Adds a new column to the specified table."""
+    """Adds a new column to the specified table.
+    custom_* fields of the chefs table are not columns: they only get an attribute index (see add_custom_field)."""
+    if table_name == Chef.__tablename__ and is_custom_field(column_name):
+        try:
+            return add_custom_field(column_name) # column_type is moot: JSON keeps each value's type
+        except ValueError as e:
+            print(f"Error: {e}")
+            return False
     # Basic validation to prevent obvious SQL injection issues (though limited)
     # A more robust solution might involve checking against known table/column name patterns
     # or using a library specifically for schema migrations.
@@ -233,6 +808,7 @@ def add_column(table_name: str, column_name: str, column_type: str):
             with connection.begin(): # Use a transaction
                 connection.execute(sql_command)
         print(f"Successfully added column '{column_name}' to table '{table_name}'.")
+        roster_cache.invalidate() # Cached rows no longer match the table shape
         return True
     except SQLAlchemyError as e:
         print(f"Error adding column '{column_name}' to table '{table_name}': {e}")
@@ -248,7 +824,14 @@ def add_column(table_name: str, column_name: str, column_type: str):
 
 # --- NEW FUNCTION TO REMOVE COLUMN ---
 def remove_column(table_name: str, column_name: str):
-    """Removes a column from the specified table."""
+    """Removes a column from the specified table.
+    custom_* fields of the chefs table are removed from the attributes documents (see remove_custom_field)."""
+    if table_name == Chef.__tablename__ and is_custom_field(column_name):
+        try:
+            return remove_custom_field(column_name)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return False
     # Basic validation
     allowed_chars = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
     if not all(c in allowed_chars for c in table_name) or \
@@ -268,6 +851,7 @@ def remove_column(table_name: str, column_name: str):
             with connection.begin(): # Use a transaction
                 connection.execute(sql_command)
         print(f"Successfully removed column '{column_name}' from table '{table_name}'.")
+        roster_cache.invalidate() # Cached rows no longer match the table shape
         return True
     except SQLAlchemyError as e:
         print(f"Error removing column '{column_name}' from table '{table_name}': {e}")
@@ -282,9 +866,12 @@ def remove_column(table_name: str, column_name: str):
         return False
 
 # --- NEW FUNCTION TO ADD CHEF ---
-def add_chef(name: str, season: int, bio: str = None, image_url: str = None, status: str = None, restaurant_address: str = None, latitude: float = None, longitude: float = None, max_retries=2, delay=1):
+def add_chef(name: str, season: int, bio: str = None, image_url: str = None, status: str = None, restaurant_address: str = None, latitude: float = None, longitude: float = None, on_duplicate: str = "reject", allow_similar: bool = False, max_retries=2, delay=1):
     """Adds a new chef record to the database with retry logic for connection errors.
 
+    The season is first checked for the same name (ignoring case, accents and word order) and for
+    near misses (sound-alike or closely spelled names), using the chef_name_keys index.
+
     Args:
         name (str): The name of the chef (required).
         season (int): The season the chef participated in (required).
@@ -294,18 +881,42 @@ def add_chef(name: str, season: int, bio: str = None, image_url: str = None, sta
         restaurant_address (str, optional): Address of the chef's restaurant. Defaults to None.
         latitude (float, optional): Latitude coordinate. Defaults to None.
         longitude (float, optional): Longitude coordinate. Defaults to None.
+        on_duplicate (str): For a name already in the season: "reject" (raise DuplicateChefError),
+            "return_existing" (return that chef's ID, writing nothing) or "allow". Defaults to "reject".
+        allow_similar (bool): Insert even if the season has near misses. Defaults to False.
         max_retries (int): Maximum number of retries for connection errors. Defaults to 2.
         delay (int): Delay in seconds between retries. Defaults to 1.
 
     Returns:
-        int or None: The ID of the newly created chef, or None if creation failed.
+        int or None: The ID of the newly created (or, with "return_existing", the existing) chef,
+            or None if creation failed.
+    Raises:
+        DuplicateChefError: the name is taken ("reject") or has near misses (allow_similar=False);
+            it carries existing_id and the similar candidates.
     """
+    if on_duplicate not in ("reject", "return_existing", "allow"):
+        raise ValueError(f"on_duplicate must be 'reject', 'return_existing' or 'allow', not {on_duplicate!r}.")
     attempts = 0
     last_exception = None
     while attempts <= max_retries:
         attempts += 1
         try:
             with get_db() as db:
+                if engine.dialect.name == "postgresql" and season is not None:
+                    # Two concurrent adds of the same chef would otherwise both pass the check
+                    db.execute(select(func.pg_advisory_xact_lock(NAME_KEY_LOCK_KEY, season)))
+                _lock_revisions(db)
+                matches = _name_matches(db, name, season)
+                if matches["existing_ids"] and on_duplicate != "allow":
+                    existing_id = matches["existing_ids"][0]
+                    if on_duplicate == "return_existing":
+                        print(f"Chef '{name}' already exists in season {season} with ID {existing_id}; nothing added.", flush=True)
+                        return existing_id
+                    raise DuplicateChefError(f"Chef '{name}' already exists in season {season} (ID {existing_id}).",
+                                             existing_id=existing_id, similar=matches["similar"])
+                if matches["similar"] and not matches["existing_ids"] and not allow_similar:
+                    names = ", ".join(f"{match['name']} (ID {match['id']})" for match in matches["similar"])
+                    raise DuplicateChefError(f"Season {season} already has similar names: {names}.", similar=matches["similar"])
                 new_chef = Chef(
                     name=name,
                     season=season,
@@ -315,10 +926,16 @@ def add_chef(name: str, season: int, bio: str = None, image_url: str = None, sta
                     restaurant_address=restaurant_address,
                     latitude=latitude,
                     longitude=longitude,
-                    last_updated=datetime.datetime.now(datetime.timezone.utc).isoformat() # Use UTC time
+                    last_updated=_utc_now_iso(), # Use UTC time
+                    revision=_next_revision_value()
                 )
                 db.add(new_chef)
+                db.flush() # Assigns the ID the name keys point to
+                _clear_tombstones(db, [new_chef.id])
+                _store_name_keys(db, [(new_chef.id, name, season)])
+                _refresh_season_summaries(db, [season])
                 db.commit()
+                roster_cache.invalidate()
                 db.refresh(new_chef) # To get the generated ID
                 print(f"Successfully added chef '{name}' with ID {new_chef.id} to season {season}.", flush=True)
                 return new_chef.id # Return the ID of the new chef
@@ -330,6 +947,9 @@ def add_chef(name: str, season: int, bio: str = None, image_url: str = None, sta
                 break # Exit loop after max retries
             print(f"Retrying in {delay} second(s)...", flush=True)
             time.sleep(delay)
+        except DuplicateChefError as e:
+            print(f"Not adding chef '{name}': {e}", flush=True)
+            raise
         except Exception as e:
             last_exception = e
             print(f"Error adding chef '{name}' (non-retryable): {e}", flush=True)
@@ -342,59 +962,501 @@ def add_chef(name: str, season: int, bio: str = None, image_url: str = None, sta
     print(f"Failed to add chef '{name}'. Last error: {last_exception}", flush=True)
     return None
 
-def update_chef(chef_id, update_data, max_retries=2, delay=1):
-    """Updates an existing chef record with retry logic."""
-    updated = False
+# Columns a caller may not write through update_chef_fields: id and revision are maintained by the
+# database layer, attributes is written one custom_* field at a time
+PROTECTED_CHEF_COLUMNS = ("id", "revision", "attributes")
+
+def update_chef_fields(chef_id, fields: dict, expected_revision: int = None, max_retries=2, delay=1):
+    """Updates a chef in a single UPDATE ... RETURNING round trip, optionally as a compare-and-set.
+
+    Only fields whose stored value actually differs are written; if none differ the row (and its
+    revision) is left alone. With expected_revision, the write only happens if the row is still at
+    that revision, so concurrent writers cannot silently overwrite each other. custom_* fields are
+    merged into the chef's attributes document (a None value removes the key).
+
+    Returns:
+        dict: {"status": "updated" | "unchanged" | "not_found" | "conflict", "chef_id": int,
+               "revision": current/new revision, "changed": {field: {"old": ..., "new": ...}}}
+    Raises:
+        ValueError: if fields is empty or names an unknown or protected column, an invalid custom
+            field name or a value that cannot be stored as JSON.
+    """
+    columns = Chef.__table__.columns
+    custom = {name: value for name, value in fields.items() if is_custom_field(name)}
+    invalid = [name for name in fields if name not in custom and (name not in columns or name in PROTECTED_CHEF_COLUMNS)]
+    invalid += [name for name in custom if not _CUSTOM_FIELD_RE.match(name)]
+    if invalid or not fields:
+        raise ValueError(f"Invalid fields for chef update: {invalid or 'none given'}")
+    try:
+        json.dumps(custom)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Custom field values must be JSON values: {e}")
+    field_names = [name for name in fields if name not in custom]
+
+    def build_statement(changed_custom):
+        """The UPDATE for the column fields plus, if custom fields changed, the attributes merged in SQL."""
+        # Only rows where some requested field differs (NULL-safe) and, for compare-and-set, the revision matches
+        changed_condition = or_(*(columns[name].is_distinct_from(fields[name]) for name in field_names),
+                                *((true(),) if changed_custom else ()))
+        values = {name: fields[name] for name in field_names}
+        if changed_custom:
+            values["attributes"] = _merged_attributes(
+                {name: literal(json.dumps(custom[name]), Text) for name in changed_custom if custom[name] is not None},
+                [name for name in changed_custom if custom[name] is None])
+        values.setdefault("last_updated", _utc_now_iso())
+        values["revision"] = _next_revision_value()
+
+        if engine.dialect.name == "postgresql":
+            # The FROM subquery exposes the pre-update row, so RETURNING yields old and new values together
+            old = select(*(columns[name] for name in ["id"] + field_names)).where(Chef.id == chef_id).subquery("old")
+            statement = (update(Chef).where(Chef.id == old.c.id)
+                         .returning(Chef.revision, Chef.season, *(old.c[name] for name in field_names), *(columns[name] for name in field_names)))
+        else:
+            # SQLite cannot RETURNING from an UPDATE ... FROM table, so the old values come from a
+            # preceding SELECT in the same transaction
+            old = None
+            statement = update(Chef).where(Chef.id == chef_id).returning(Chef.revision, Chef.season, *(columns[name] for name in field_names))
+        statement = statement.where(changed_condition).values(**values)
+        if expected_revision is not None:
+            statement = statement.where(Chef.revision == expected_revision)
+        return statement, old
+
     attempts = 0
     while attempts <= max_retries:
         attempts += 1
         try:
             with get_db() as db:
-                chef = db.query(Chef).filter(Chef.id == chef_id).first()
-                if chef:
-                    for key, value in update_data.items():
-                        # Only update if the key is a valid column and value is different
-                        if hasattr(chef, key) and getattr(chef, key) != value:
-                            setattr(chef, key, value)
-                            updated = True
-                    if updated:
-                        db.commit()
-                        print(f"Updated chef record ID: {chef_id}")
+                _lock_revisions(db) # Before the row lock below, in the same order as every other writer
+                changed_custom = {}
+                if custom:
+                    # Only to report old values and skip no-op writes (exact on Postgres, which honours the
+                    # row lock); the UPDATE merges in SQL, so a concurrent write to another key is never lost
+                    current_attributes = db.execute(select(Chef.attributes).where(Chef.id == chef_id).with_for_update()).scalar_one_or_none() or {}
+                    changed_custom = {name: {"old": current_attributes.get(name), "new": value}
+                                      for name, value in custom.items() if current_attributes.get(name) != value}
+                row = None
+                if field_names or changed_custom:
+                    statement, old = build_statement(changed_custom)
+                    previous = None
+                    if old is None and field_names:
+                        previous = db.execute(select(*(columns[name] for name in field_names)).where(Chef.id == chef_id)).first()
+                    row = db.execute(statement).first()
+                if row is not None:
+                    if previous is None:
+                        old_values = row[2:2 + len(field_names)]
+                        new_values = row[2 + len(field_names):]
                     else:
-                        print(f"No changes detected for chef record ID: {chef_id}")
-                else:
-                    print(f"Error: Chef with ID {chef_id} not found for update.")
-                    return False # Indicate chef not found
+                        old_values, new_values = tuple(previous), row[2:]
+                    changed = {name: {"old": before, "new": after}
+                               for name, before, after in zip(field_names, old_values, new_values) if before != after}
+                    changed.update(changed_custom)
+                    if "name" in changed or "season" in changed:
+                        current = db.execute(select(Chef.name).where(Chef.id == chef_id)).scalar_one()
+                        _store_name_keys(db, [(chef_id, current, row[1])])
+                    if SEASON_SUMMARY_SOURCE_FIELDS.intersection(changed):
+                        _refresh_season_summaries(db, [row[1], changed.get("season", {}).get("old")])
+                    db.commit()
+                    roster_cache.invalidate()
+                    print(f"Updated chef record ID: {chef_id} ({', '.join(changed) or 'no visible change'})", flush=True)
+                    return {"status": "updated", "chef_id": chef_id, "revision": row[0], "changed": changed}
+
+                # Nothing matched: one follow-up read tells apart missing row, stale revision and no-op
+                current = db.execute(select(Chef.revision).where(Chef.id == chef_id)).first()
+                if current is None:
+                    print(f"Error: Chef with ID {chef_id} not found for update.", flush=True)
+                    return {"status": "not_found", "chef_id": chef_id, "revision": None, "changed": {}}
+                if expected_revision is not None and current.revision != expected_revision:
+                    print(f"Conflict: Chef ID {chef_id} is at revision {current.revision}, expected {expected_revision}.", flush=True)
+                    return {"status": "conflict", "chef_id": chef_id, "revision": current.revision, "changed": {}}
+                print(f"No changes detected for chef record ID: {chef_id}", flush=True)
+                return {"status": "unchanged", "chef_id": chef_id, "revision": current.revision, "changed": {}}
         except OperationalError as e:
             print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1} while updating chef ID {chef_id}: {e}", flush=True)
             if attempts > max_retries:
                 print(f"Error: Max retries reached for updating chef ID {chef_id}.", flush=True)
-                break # Exit loop after max retries
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+
+def update_chef(chef_id, update_data, max_retries=2, delay=1):
+    """Updates an existing chef record with retry logic. Keys that are neither chef columns nor custom_* fields are ignored.
+    Returns True if the chef exists (whether or not anything changed), False otherwise."""
+    fields = {key: value for key, value in update_data.items()
+              if (key in Chef.__table__.columns and key not in PROTECTED_CHEF_COLUMNS) or is_custom_field(key)}
+    try:
+        if not fields:
+            print(f"No changes detected for chef record ID: {chef_id}")
+            return get_chefs_by_ids([chef_id]) != []
+        result = update_chef_fields(chef_id, fields, max_retries=max_retries, delay=delay)
+        return result["status"] in ("updated", "unchanged")
+    except Exception as e:
+        print(f"Error updating chef ID {chef_id}: {e}", flush=True)
+        print(f"Failed to update chef ID {chef_id}.", flush=True)
+        return False
+
+# --- Bulk Writes ---
+def _upsert_match_key(row: dict):
+    """Identity of an upsert row: its id if given, otherwise its name key (see text_utils.name_key) within a season."""
+    if row.get("id") is not None:
+        return ("id", row["id"])
+    return ("name", name_key(row["name"]), row["season"])
+
+def _validate_upsert_row(row) -> str:
+    """Returns an error message for a malformed upsert row, or None if it is usable."""
+    if not isinstance(row, dict) or not row:
+        return "Row must be a non-empty object."
+    columns = Chef.__table__.columns
+    unknown = [key for key in row if not (_CUSTOM_FIELD_RE.match(key) if is_custom_field(key) else key in columns)
+               or key in ("revision", "attributes")]
+    if unknown:
+        return f"Unknown or protected fields: {unknown}"
+    try:
+        json.dumps({key: value for key, value in row.items() if is_custom_field(key)})
+    except (TypeError, ValueError) as e:
+        return f"Custom field values must be JSON values: {e}"
+    if row.get("id") is not None:
+        return None if isinstance(row["id"], int) else "'id' must be an integer."
+    if not isinstance(row.get("name"), str) or not row["name"].strip():
+        return "'name' is required when no 'id' is given."
+    if not isinstance(row.get("season"), int):
+        return "'season' (integer) is required when no 'id' is given."
+    return None
+
+def upsert_chefs(rows: list, update_existing: bool = True, max_retries=2, delay=1):
+    """Inserts or updates many chefs in a single transaction.
+
+    Rows are matched to existing chefs by 'id' when given, otherwise by name (ignoring case, accents
+    and word order) within 'season'. Matched rows are updated with one executemany per distinct set of changed
+    fields (only differing fields are written); new rows go in one multi-row INSERT ... RETURNING.
+    custom_* fields are merged into the attributes document as in update_chef_fields (None removes the key).
+    With update_existing=False, matched rows are reported as "exists" and left untouched.
+
+    Returns:
+        dict: counts per status plus "results", one entry per input row in order:
+              {"index", "status": "inserted" | "updated" | "unchanged" | "exists" | "not_found" | "invalid",
+               "chef_id", "changed": [field names] (updates only), "error" (invalid rows only)}
+    Raises:
+        SQLAlchemyError: if the transaction fails; nothing is written in that case.
+    """
+    table = Chef.__table__
+    required_on_insert = [c.name for c in table.columns if not c.nullable and not c.primary_key]
+
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        results = [None] * len(rows)
+        candidates = [] # (index, row, key)
+        seen = {}
+        for index, row in enumerate(rows):
+            error = _validate_upsert_row(row)
+            if error is None:
+                key = _upsert_match_key(row)
+                if key in seen:
+                    error = f"Duplicate of row {seen[key]}."
+                else:
+                    seen[key] = index
+                    candidates.append((index, row, key))
+            if error is not None:
+                results[index] = {"index": index, "status": "invalid", "error": error}
+
+        try:
+            with get_db() as db:
+                if engine.dialect.name == "postgresql":
+                    # Same per-season locks as add_chef, so a concurrent add of the same chef waits for
+                    # this batch (and vice versa) instead of both passing the name check. Sorted, so two
+                    # batches never take them in opposite orders.
+                    for season in sorted({row["season"] for _, row, _ in candidates if isinstance(row.get("season"), int)}):
+                        db.execute(select(func.pg_advisory_xact_lock(NAME_KEY_LOCK_KEY, season)))
+                _lock_revisions(db)
+                # One read fetches every chef the batch could match: by id, or any chef of a season it names
+                ids = [key[1] for _, _, key in candidates if key[0] == "id"]
+                seasons = {key[2] for _, _, key in candidates if key[0] == "name"}
+                existing_by_key = {}
+                if ids or seasons:
+                    existing = db.execute(select(table).where(or_(table.c.id.in_(ids), table.c.season.in_(seasons)))).mappings().all()
+                    for chef in existing:
+                        existing_by_key[("id", chef["id"])] = chef
+                        if chef["name"] and chef["season"] is not None:
+                            existing_by_key.setdefault(("name", name_key(chef["name"]), chef["season"]), chef)
+
+                now = _utc_now_iso()
+                update_groups = {} # (sorted field names, removed custom fields) -> [params]
+                inserts = [] # (index, row)
+                touched_seasons = set() # Seasons whose summary must be refreshed
+                renamed = [] # (chef_id, name, season) whose name keys must be rewritten
+                for index, row, key in candidates:
+                    chef = existing_by_key.get(key)
+                    if chef is None:
+                        if key[0] == "id":
+                            results[index] = {"index": index, "status": "not_found", "chef_id": key[1]}
+                            continue
+                        missing = [name for name in required_on_insert if row.get(name) is None]
+                        if missing:
+                            results[index] = {"index": index, "status": "invalid", "error": f"Required for new chefs: {missing}"}
+                            continue
+                        inserts.append((index, row))
+                        continue
+                    if not update_existing:
+                        results[index] = {"index": index, "status": "exists", "chef_id": chef["id"]}
+                        continue
+                    # Fields used for matching identify the chef; they are not changes (e.g. different casing)
+                    key_fields = ("id",) if key[0] == "id" else ("id", "name", "season")
+                    current_attributes = chef["attributes"] or {}
+                    changed = sorted(name for name, value in row.items() if name not in key_fields
+                                     and (current_attributes.get(name) if is_custom_field(name) else chef[name]) != value)
+                    if not changed:
+                        results[index] = {"index": index, "status": "unchanged", "chef_id": chef["id"]}
+                        continue
+                    if SEASON_SUMMARY_SOURCE_FIELDS.intersection(changed):
+                        touched_seasons.update((chef["season"], row.get("season", chef["season"])))
+                    if "name" in changed or "season" in changed:
+                        renamed.append((chef["id"], row.get("name", chef["name"]), row.get("season", chef["season"])))
+                    removed = tuple(name for name in changed if is_custom_field(name) and row[name] is None)
+                    params = {f"new_{name}": json.dumps(row[name]) if is_custom_field(name) else row[name]
+                              for name in changed if name not in removed}
+                    params["match_id"] = chef["id"]
+                    update_groups.setdefault((tuple(changed), removed), []).append(params)
+                    results[index] = {"index": index, "status": "updated", "chef_id": chef["id"], "changed": changed}
+
+                for (changed, removed), params in update_groups.items():
+                    values = {name: bindparam(f"new_{name}") for name in changed if not is_custom_field(name)}
+                    custom = [name for name in changed if is_custom_field(name)]
+                    if custom:
+                        values["attributes"] = _merged_attributes({name: bindparam(f"new_{name}", type_=Text) for name in custom if name not in removed}, removed)
+                    values.setdefault("last_updated", now)
+                    values["revision"] = _next_revision_value()
+                    db.execute(table.update().where(table.c.id == bindparam("match_id")).values(values), params)
+
+                if inserts:
+                    # Every parameter set of an executemany must carry the same keys
+                    insert_columns = sorted({name for _, row in inserts for name in row if name != "id" and not is_custom_field(name)})
+                    params = [{name: row.get(name) for name in insert_columns} for _, row in inserts]
+                    for row_params, (_, row) in zip(params, inserts):
+                        row_params.setdefault("last_updated", now)
+                        row_params["attributes"] = {name: value for name, value in row.items() if is_custom_field(name) and value is not None} or None
+                    statement = (table.insert().values(revision=_next_revision_value())
+                                 .returning(table.c.id, sort_by_parameter_order=True))
+                    new_ids = db.execute(statement, params).scalars().all()
+                    _clear_tombstones(db, new_ids)
+                    for (index, row), new_id in zip(inserts, new_ids):
+                        results[index] = {"index": index, "status": "inserted", "chef_id": new_id}
+                        touched_seasons.add(row.get("season"))
+                        renamed.append((new_id, row.get("name"), row.get("season")))
+
+                _store_name_keys(db, renamed)
+                _refresh_season_summaries(db, touched_seasons)
+                db.commit()
+            roster_cache.invalidate()
+            summary = {status: 0 for status in ("inserted", "updated", "unchanged", "exists", "not_found", "invalid")}
+            for result in results:
+                summary[result["status"]] += 1
+            print(f"Upserted {len(rows)} chef row(s): {summary}", flush=True)
+            summary["results"] = results
+            return summary
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1} during bulk upsert: {e}", flush=True)
+            if attempts > max_retries:
+                print("Error: Max retries reached for bulk upsert.", flush=True)
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+
+def add_chefs_bulk(rows: list, max_retries=2, delay=1):
+    """Adds many new chefs in one transaction; rows matching an existing chef are reported as "exists"."""
+    return upsert_chefs(rows, update_existing=False, max_retries=max_retries, delay=delay)
+
+def delete_chef(chef_id, max_retries=2, delay=1):
+    """Deletes a chef record and leaves a tombstone so incremental sync clients see the deletion."""
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        try:
+            with get_db() as db:
+                _lock_revisions(db)
+                chef = db.query(Chef).filter(Chef.id == chef_id).first()
+                if not chef:
+                    print(f"Error: Chef with ID {chef_id} not found for deletion.")
+                    return False
+                db.delete(chef)
+                _clear_tombstones(db, [chef_id]) # A stale tombstone from an earlier use of this ID
+                db.add(ChefTombstone(chef_id=chef_id, revision=_next_revision_value(), deleted_at=_utc_now_iso()))
+                db.execute(delete(ChefNameKey.__table__).where(ChefNameKey.chef_id == chef_id))
+                _refresh_season_summaries(db, [chef.season])
+                db.commit()
+                roster_cache.invalidate()
+                print(f"Deleted chef record ID: {chef_id}", flush=True)
+                return True
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1} while deleting chef ID {chef_id}: {e}", flush=True)
+            if attempts > max_retries:
+                print(f"Error: Max retries reached for deleting chef ID {chef_id}.", flush=True)
+                break
             print(f"Retrying in {delay} second(s)...", flush=True)
             time.sleep(delay)
         except Exception as e:
-            print(f"Error updating chef ID {chef_id} (non-retryable): {e}", flush=True)
-            # Optional: Log traceback
-            # import traceback
-            # traceback.print_exc()
-            break # Exit loop on non-retryable error
+            print(f"Error deleting chef ID {chef_id} (non-retryable): {e}", flush=True)
+            break
+    return False
 
-    # If loop finished without returning, it failed.
-    print(f"Failed to update chef ID {chef_id}.", flush=True)
+# --- Name Keys ---
+def _sync_chef_name_keys(db) -> int:
+    """Rewrites missing or stale name keys inside the caller's transaction. Returns how many were written."""
+    keys = ChefNameKey.__table__
+    stored = {row.chef_id: (row.season, row.name_key, row.name_phonetic) for row in db.execute(select(keys)).all()}
+    chefs = db.execute(select(Chef.id, Chef.name, Chef.season)).all()
+    stale = [(chef.id, chef.name, chef.season) for chef in chefs
+             if stored.get(chef.id) != (chef.season, name_key(chef.name or ""), phonetic_key(chef.name or ""))]
+    orphans = set(stored) - {chef.id for chef in chefs}
+    _store_name_keys(db, stale)
+    if orphans:
+        db.execute(delete(keys).where(keys.c.chef_id.in_(orphans)))
+    if stale or orphans:
+        print(f"Synced name keys: {len(stale)} written, {len(orphans)} orphaned removed.", flush=True)
+    return len(stale)
+
+def sync_chef_name_keys(max_retries=2, delay=1):
+    """Recomputes every chef's name keys and writes the ones that are missing or stale
+    (rows written by code that did not maintain them, or keys from an older normalization).
+    Returns the number of chefs whose keys were written, or None if the sync failed."""
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        try:
+            with get_db() as db:
+                written = _sync_chef_name_keys(db)
+                db.commit()
+                return written
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1} while syncing name keys: {e}", flush=True)
+            if attempts > max_retries:
+                print("Error: Max retries reached for syncing name keys.", flush=True)
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+        except SQLAlchemyError as e:
+            # e.g. two processes syncing at startup at once; the other one writes the same keys
+            print(f"Warning: Could not sync name keys: {e}", flush=True)
+            return None
+    return None
+
+# --- Season Summaries ---
+def refresh_season_summaries(seasons=None, max_retries=2, delay=1):
+    """Recomputes the summary rows of the given seasons (default: every season) in one transaction."""
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        try:
+            with get_db() as db:
+                if seasons is None:
+                    known = db.execute(select(Chef.season).distinct()).scalars().all()
+                    summarised = db.execute(select(SeasonSummary.season)).scalars().all()
+                    seasons = set(known) | set(summarised)
+                _refresh_season_summaries(db, seasons)
+                db.commit()
+                return True
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1} while refreshing season summaries: {e}", flush=True)
+            if attempts > max_retries:
+                print("Error: Max retries reached for refreshing season summaries.", flush=True)
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+        except SQLAlchemyError as e:
+            # e.g. two processes rebuilding at startup at once; the other one's rows are just as current
+            print(f"Warning: Could not refresh season summaries: {e}", flush=True)
+            return False
     return False
 
+def get_season_summaries(season: int = None, max_retries=2, delay=1):
+    """Returns the per-season summary rows in season order (one row per season, never the roster)."""
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        try:
+            with get_db() as db:
+                query = db.query(SeasonSummary).order_by(SeasonSummary.season)
+                if season is not None:
+                    query = query.filter(SeasonSummary.season == season)
+                return [row.to_dict() for row in query.all()]
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1}: {e}", flush=True)
+            if attempts > max_retries:
+                print("Error: Max retries reached for loading season summaries.", flush=True)
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+    return []
+
+# --- Incremental Sync ---
+def get_data_version(max_retries=2, delay=1):
+    """Returns the current revision high-water mark (0 for an empty database). Every revision at or
+    below it is committed: writers hold REVISION_LOCK_KEY until commit, so none still in flight can
+    land underneath it."""
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        try:
+            with get_db() as db:
+                latest_chef = select(func.max(Chef.revision)).scalar_subquery()
+                latest_tombstone = select(func.max(ChefTombstone.revision)).scalar_subquery()
+                row = db.execute(select(latest_chef, latest_tombstone)).one()
+                return max(row[0] or 0, row[1] or 0)
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1} while reading data version: {e}", flush=True)
+            if attempts > max_retries:
+                print("Error: Max retries reached for reading data version.", flush=True)
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+    return 0
+
+def get_chef_changes_since(since_revision: int, max_retries=2, delay=1):
+    """Returns the chefs changed and the chef IDs deleted after since_revision, plus the new high-water mark.
+
+    Returns:
+        dict: {"revision": int, "since": int, "chefs": [chef dicts], "deleted": [chef IDs]}
+    """
+    attempts = 0
+    while attempts <= max_retries:
+        attempts += 1
+        try:
+            # Read the high-water mark first: anything committed after it is picked up by the next sync
+            revision = get_data_version()
+            with get_db() as db:
+                chefs = (db.query(Chef)
+                         .filter(Chef.revision > since_revision, Chef.revision <= revision)
+                         .order_by(Chef.revision).all())
+                deleted = (db.query(ChefTombstone.chef_id)
+                           .filter(ChefTombstone.revision > since_revision, ChefTombstone.revision <= revision)
+                           .order_by(ChefTombstone.revision).all())
+                return {
+                    "revision": revision,
+                    "since": since_revision,
+                    "chefs": [chef.to_dict() for chef in chefs],
+                    "deleted": [row.chef_id for row in deleted],
+                }
+        except OperationalError as e:
+            print(f"Warning: Database operational error on attempt {attempts}/{max_retries+1}: {e}", flush=True)
+            if attempts > max_retries:
+                print("Error: Max retries reached for loading chef changes.", flush=True)
+                raise
+            print(f"Retrying in {delay} second(s)...", flush=True)
+            time.sleep(delay)
+    return {"revision": since_revision, "since": since_revision, "chefs": [], "deleted": []}
+
 # --- Initial Setup ---
-# Call this once when the application starts to ensure the table exists and has necessary columns.
-# This might run multiple times if multiple processes import it (e.g., Flask dev server, scheduler)
-# The function `create_table_if_not_exists` is designed to be mostly idempotent.
+# Every process importing this module (Flask workers, the scheduler, scripts) checks the schema
+# version once: a single query when it is current. Pending migrations are applied by whichever
+# process gets the migration lock first (see migrations.py).
 if __name__ == '__main__':
     print("Running database setup directly (dropping table first)...")
-    create_table_if_not_exists(drop_first=True) # Drop the table on direct run
+    # Use the package module migrations.py imports, not this __main__ copy with its own engine and caches
+    from topchef_agent import database
+    database.create_table_if_not_exists(drop_first=True) # Drop the table on direct run
     print("\nLoading initial data:")
-    initial_data = load_database()
+    initial_data = database.load_database()
     print(f"Loaded {len(initial_data)} records.")
     # print(initial_data) # Optionally print the data
 else:
-    # Ensure table exists and columns are checked when module is imported
     # Set drop_first=False (or omit) for regular imports to avoid data loss on every import
     create_table_if_not_exists(drop_first=False)
@@ -0,0 +1,134 @@
+"""
+Bulk Export for the TopChef data.
+Streams chef records as NDJSON or CSV straight from a server-side database
+cursor, and the agent journal as NDJSON, so memory use does not grow with the
+number of rows. Used by the /export/* routes and as a command line tool:
+
+  python -m topchef_agent.export chefs --format csv -o chefs.csv [--season 3] [--fields id,name]
+  python -m topchef_agent.export journal -o journal.ndjson
+"""
+import io
+import csv
+import sys
+import json
+import argparse
+import contextlib
+
+from sqlalchemy import select
+
+# The database module is imported lazily: importing it connects and ensures the schema,
+# which the CLI wants to happen with stdout redirected (see main).
+
+# Rows fetched per round trip from the server-side cursor, and rows per yielded chunk
+EXPORT_BATCH_SIZE = 500
+
+
+def export_columns(fields=None) -> tuple:
+    """Column names an export will contain (validates fields; raises ValueError for unknown ones)."""
+    from topchef_agent.database import Chef, resolve_chef_fields
+    return resolve_chef_fields(fields) or tuple(c.name for c in Chef.__table__.columns)
+
+
+def iter_chef_rows(season: int = None, fields=None, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yields chef rows as dicts in id order, streamed from a server-side cursor."""
+    from topchef_agent.database import get_db, Chef
+    columns = Chef.__table__.columns
+    query = select(*(columns[name] for name in export_columns(fields))).order_by(Chef.id)
+    if season is not None:
+        query = query.where(Chef.season == season)
+    with get_db() as db:
+        result = db.execute(query.execution_options(stream_results=True, yield_per=batch_size))
+        for row in result.mappings():
+            yield dict(row)
+
+
+def _chunked(lines, batch_size: int):
+    """Joins lines into chunks of batch_size so streamed responses are not one write per row."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= batch_size:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def chefs_ndjson(season: int = None, fields=None, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yields the chef export as NDJSON text chunks (one JSON object per line)."""
+    lines = (json.dumps(row, ensure_ascii=False) + "\n" for row in iter_chef_rows(season, fields, batch_size))
+    return _chunked(lines, batch_size)
+
+
+def chefs_csv(season: int = None, fields=None, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yields the chef export as CSV text chunks, header first."""
+    columns = export_columns(fields)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+
+    def lines():
+        writer.writeheader()
+        for row in iter_chef_rows(season, fields, batch_size):
+            if row.get("attributes") is not None: # custom_* fields, kept as one JSON cell
+                row["attributes"] = json.dumps(row["attributes"], ensure_ascii=False)
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    return _chunked(lines(), batch_size)
+
+
+def journal_ndjson(batch_size: int = EXPORT_BATCH_SIZE):
+    """Yields the agent journal as NDJSON text chunks, oldest entry first.
+    The journal is a single JSON document on disk, so it is parsed once; only the output is streamed."""
+    from topchef_agent.agent import read_journal_file # Deferred: the agent module sets up LLM clients on import
+
+    entries = read_journal_file()
+    if entries is None:
+        raise IOError("Failed to read journal file.")
+    if not isinstance(entries, list):
+        entries = [entries]
+    lines = (json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in entries)
+    return _chunked(lines, batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m topchef_agent.export", description="Dump chefs or the agent journal.")
+    parser.add_argument("dataset", choices=["chefs", "journal"], help="What to export.")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson", help="Output format (csv is chefs only).")
+    parser.add_argument("--season", type=int, default=None, help="Only export chefs from this season.")
+    parser.add_argument("--fields", default=None, help="Comma-separated chef columns to export (default: all).")
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout).")
+    args = parser.parse_args(argv)
+
+    # The database and agent modules report their setup on stdout; keep that out of the dump
+    with contextlib.redirect_stdout(sys.stderr):
+        import topchef_agent.database # noqa: F401
+
+    if args.dataset == "journal":
+        if args.format != "ndjson":
+            parser.error("the journal can only be exported as ndjson")
+        with contextlib.redirect_stdout(sys.stderr):
+            chunks = journal_ndjson()
+    else:
+        try:
+            export_columns(args.fields)
+        except ValueError as e:
+            parser.error(str(e))
+        export = chefs_csv if args.format == "csv" else chefs_ndjson
+        chunks = export(season=args.season, fields=args.fields)
+
+    # newline="" keeps the csv module's \r\n line endings intact
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+            print(f"Export written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
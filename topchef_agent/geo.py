@@ -0,0 +1,241 @@
+"""
+Spatial Index for the TopChef map.
+Buckets every chef with coordinates into a fixed-size latitude/longitude grid
+built from the roster cache, so viewport (bbox) and "near me" queries only look
+at the cells they overlap. At low zoom levels the visible chefs are aggregated
+into server-side clusters, so the browser downloads and draws one marker per
+cluster instead of one per chef. After writes the index is patched with just
+the changed chefs rather than rebuilt.
+"""
+import math
+import threading
+
+from topchef_agent.database import load_database, get_cached_data_version, get_chef_changes_since
+from topchef_agent.config import GEO_GRID_CELL_DEGREES, GEO_CLUSTER_MAX_ZOOM, GEO_CLUSTER_CELLS_PER_TILE
+
+MAX_ZOOM = 19 # Highest zoom of the map's tile layer
+EARTH_RADIUS_KM = 6371.0088 # Mean Earth radius
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180.0
+NEARBY_DEFAULT_RADIUS_KM = 25.0
+NEARBY_MAX_RADIUS_KM = 2000.0
+NEARBY_MAX_LIMIT = 100
+# Above this share of changed chefs a full rebuild is cheaper than patching the index
+INCREMENTAL_UPDATE_MAX_RATIO = 0.5
+
+
+def parse_bbox(bbox: str) -> tuple:
+    """Parses 'minLon,minLat,maxLon,maxLat'. Raises ValueError if malformed."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+    except (AttributeError, ValueError):
+        raise ValueError("bbox must be 'minLon,minLat,maxLon,maxLat'.")
+    if not (-90.0 <= min_lat <= max_lat <= 90.0) or not (-180.0 <= min_lon <= 180.0 and -180.0 <= max_lon <= 180.0):
+        raise ValueError("bbox is out of range or inverted (minLat must not exceed maxLat).")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def _coordinates(chef: dict):
+    """(lat, lon) as floats, or None if the chef cannot be placed on the map."""
+    try:
+        lat, lon = float(chef.get("latitude")), float(chef.get("longitude"))
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(lat) or math.isnan(lon) or not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    return lat, lon
+
+
+class GridIndex:
+    """Chefs bucketed by (lon, lat) grid cell. Not thread-safe for writes: build it, then share it read-only."""
+
+    def __init__(self, chefs=(), cell_degrees: float = GEO_GRID_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self.cells = {} # (x, y) -> {chef_id: chef}
+        self.positions = {} # chef_id -> (lat, lon, cell)
+        self.radians = {} # chef_id -> (lat, lon, cos(lat)) in radians, precomputed for haversine
+        for chef in chefs:
+            self.insert(chef)
+
+    def copy(self):
+        """A new index sharing the chef records; patching the copy leaves readers of this one undisturbed."""
+        clone = GridIndex(cell_degrees=self.cell_degrees)
+        clone.cells = {cell: dict(bucket) for cell, bucket in self.cells.items()}
+        clone.positions = dict(self.positions)
+        clone.radians = dict(self.radians)
+        return clone
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _cell(self, lat: float, lon: float) -> tuple:
+        return (math.floor(lon / self.cell_degrees), math.floor(lat / self.cell_degrees))
+
+    def insert(self, chef: dict) -> bool:
+        """Adds (or moves) a chef. Returns False, after dropping any old entry, if it has no usable coordinates."""
+        self.remove(chef.get("id"))
+        coordinates = _coordinates(chef)
+        if coordinates is None:
+            return False
+        lat, lon = coordinates
+        cell = self._cell(lat, lon)
+        self.cells.setdefault(cell, {})[chef["id"]] = chef
+        self.positions[chef["id"]] = (lat, lon, cell)
+        phi = math.radians(lat)
+        self.radians[chef["id"]] = (phi, math.radians(lon), math.cos(phi))
+        return True
+
+    def remove(self, chef_id) -> bool:
+        position = self.positions.pop(chef_id, None)
+        if position is None:
+            return False
+        del self.radians[chef_id]
+        bucket = self.cells[position[2]]
+        del bucket[chef_id]
+        if not bucket:
+            del self.cells[position[2]]
+        return True
+
+    def _cells_in(self, min_lon, min_lat, max_lon, max_lat):
+        """Yields the non-empty cells overlapping the box, scanning whichever is smaller:
+        the box's cell range or the set of occupied cells."""
+        x0, y0 = self._cell(min_lat, min_lon)
+        x1, y1 = self._cell(max_lat, max_lon)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(self.cells):
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1):
+                    bucket = self.cells.get((x, y))
+                    if bucket:
+                        yield bucket
+        else:
+            for (x, y), bucket in self.cells.items():
+                if x0 <= x <= x1 and y0 <= y <= y1:
+                    yield bucket
+
+    def query_bbox(self, min_lon, min_lat, max_lon, max_lat, season: int = None) -> list:
+        """Chefs inside the box (inclusive), optionally from one season only.
+        A box with min_lon > max_lon crosses the antimeridian."""
+        if min_lon > max_lon:
+            return (self.query_bbox(min_lon, min_lat, 180.0, max_lat, season)
+                    + self.query_bbox(-180.0, min_lat, max_lon, max_lat, season))
+        found = []
+        for bucket in self._cells_in(min_lon, min_lat, max_lon, max_lat):
+            for chef_id, chef in bucket.items():
+                lat, lon, _ = self.positions[chef_id]
+                if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon and (season is None or chef.get("season") == season):
+                    found.append(chef)
+        return found
+
+    def viewport(self, min_lon, min_lat, max_lon, max_lat, zoom: int, season: int = None, within: tuple = None) -> dict:
+        """What the map needs for one viewport: individual chefs, and below GEO_CLUSTER_MAX_ZOOM
+        clusters of chefs sharing a screen-sized cell (single-chef cells are sent as chefs).
+        within=(min_lat, max_lat, min_lon, max_lon) keeps only chefs strictly inside those bounds,
+        e.g. FRANCE_BOUNDS to leave misgeocoded chefs off the map.
+
+        Returns:
+            dict: {"zoom", "clustered": bool, "total": int, "chefs": [chef dicts],
+                   "clusters": [{"count", "latitude", "longitude", "bounds": [minLon, minLat, maxLon, maxLat]}]}
+        """
+        visible = self.query_bbox(min_lon, min_lat, max_lon, max_lat, season)
+        if within is not None:
+            lat_low, lat_high, lon_low, lon_high = within
+            visible = [chef for chef in visible
+                       if lat_low < self.positions[chef["id"]][0] < lat_high and lon_low < self.positions[chef["id"]][1] < lon_high]
+        result = {"zoom": zoom, "clustered": zoom < GEO_CLUSTER_MAX_ZOOM, "total": len(visible), "chefs": [], "clusters": []}
+        if not result["clustered"]:
+            result["chefs"] = visible
+            return result
+        # One 256px tile spans 360 / 2**zoom degrees of longitude
+        cluster_degrees = 360.0 / (2 ** zoom) / GEO_CLUSTER_CELLS_PER_TILE
+        groups = {}
+        for chef in visible:
+            lat, lon, _ = self.positions[chef["id"]]
+            groups.setdefault((math.floor(lon / cluster_degrees), math.floor(lat / cluster_degrees)), []).append(chef)
+        for members in groups.values():
+            if len(members) == 1:
+                result["chefs"].append(members[0])
+                continue
+            points = [self.positions[chef["id"]][:2] for chef in members]
+            lats = [lat for lat, _ in points]
+            lons = [lon for _, lon in points]
+            result["clusters"].append({
+                "count": len(members),
+                "latitude": sum(lats) / len(lats),
+                "longitude": sum(lons) / len(lons),
+                "bounds": [min(lons), min(lats), max(lons), max(lats)],
+            })
+        return result
+
+
+    def nearby(self, lat: float, lon: float, radius_km: float = NEARBY_DEFAULT_RADIUS_KM,
+               limit: int = 10, season: int = None) -> list:
+        """Chefs within radius_km of (lat, lon), nearest first, as (distance_km, chef) pairs.
+        Only the grid cells covering the circle's bounding box are scanned; distances are great-circle
+        (haversine) using the per-chef radians and cosines precomputed at insert time."""
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        min_lat, max_lat = max(-90.0, lat - lat_span), min(90.0, lat + lat_span)
+        # Longitude degrees shrink with cos(latitude); near the poles the circle covers every meridian
+        cos_edge = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+        lon_span = 180.0 if cos_edge <= 1e-9 else radius_km / (KM_PER_DEGREE_LAT * cos_edge)
+        if lon_span >= 180.0:
+            min_lon, max_lon = -180.0, 180.0
+        else:
+            min_lon, max_lon = lon - lon_span, lon + lon_span
+            if min_lon < -180.0:
+                min_lon += 360.0 # Wraps: query_bbox treats min_lon > max_lon as crossing the antimeridian
+            if max_lon > 180.0:
+                max_lon -= 360.0
+        candidates = self.query_bbox(min_lon, min_lat, max_lon, max_lat, season)
+
+        phi0, lambda0, cos_phi0 = math.radians(lat), math.radians(lon), math.cos(math.radians(lat))
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        radians = self.radians
+        ranked = []
+        for chef in candidates:
+            phi, lam, cos_phi = radians[chef["id"]]
+            a = sin((phi - phi0) / 2) ** 2 + cos_phi0 * cos_phi * sin((lam - lambda0) / 2) ** 2
+            distance = 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(a)))
+            if distance <= radius_km:
+                ranked.append((distance, chef))
+        ranked.sort(key=lambda pair: pair[0])
+        return ranked[:limit]
+
+
+def project(chefs: list, projection) -> list:
+    """Copies chef records keeping only the projection's fields (None keeps every field)."""
+    if projection is None:
+        return [dict(chef) for chef in chefs]
+    return [{name: chef.get(name) for name in projection} for chef in chefs]
+
+
+_lock = threading.Lock()
+_cached = (None, None) # (data version, GridIndex)
+
+def get_geo_index() -> GridIndex:
+    """Grid index of the current roster, kept in step with the data version.
+    After a write only the chefs changed or deleted since the indexed revision are read and
+    patched into a copy; a full rebuild happens on first use or when most chefs changed.
+    Holds full chef records; callers project them (see project()) before sending them out."""
+    global _cached
+    version = get_cached_data_version()
+    with _lock:
+        cached_version, index = _cached
+        if index is not None and cached_version >= version:
+            return index
+    if index is None:
+        index, indexed_version = GridIndex(load_database()), version
+    else:
+        changes = get_chef_changes_since(cached_version)
+        indexed_version = changes["revision"]
+        changed = len(changes["chefs"]) + len(changes["deleted"])
+        if changed > INCREMENTAL_UPDATE_MAX_RATIO * max(len(index), 1) and changed > 10:
+            index = GridIndex(load_database())
+        else:
+            index = index.copy()
+            for chef_id in changes["deleted"]:
+                index.remove(chef_id)
+            for chef in changes["chefs"]:
+                index.insert(chef) # Moves, adds, or drops the chef if its coordinates were cleared
+    with _lock:
+        if _cached[0] is None or indexed_version >= _cached[0]:
+            _cached = (indexed_version, index)
+    return index
@@ -1,73 +1,75 @@
 import threading
 import time
-import queue
 import json
 import inspect
 from typing import List, Dict, Any
 from openai import OpenAI, APIError
 from topchef_agent.agent import available_functions, log_to_ui, AGENT_NAME, openrouter_client
 from topchef_agent.config import LLM_MODELS_TO_TRY
+from topchef_agent.shared_state import EventChannel, get_shared_backend
 
-# Conversation context memory per session (simple in-memory dict for demo; replace with Redis/DB for production)
-_conversation_contexts = {}
-_context_lock = threading.Lock()
+# Conversation context, busy flags and rate-limit windows live in the shared backend
+# (see SHARED_STATE_URL) so every gunicorn worker sees the same chat session state.
+CONTEXT_TTL = 24 * 3600 # Forget idle conversations after a day
+BUSY_TTL = 600 # Safety net: a busy flag left by a crashed worker expires after 10 minutes
 
 # Rate limiting data
-_message_timestamps = {}
-_timestamps_lock = threading.Lock()
 RATE_LIMIT_COUNT = 10
 RATE_LIMIT_WINDOW = 3600 # 1 hour in seconds
 
 class InteractiveStephAI:
-    def __init__(self, session_id: str, log_queue: queue.Queue = None, db_update_queue: queue.Queue = None):
+    def __init__(self, session_id: str, log_channel: EventChannel = None, db_update_channel: EventChannel = None):
         self.session_id = session_id
-        self.log_queue = log_queue  # Main queue for SSE
-        self.db_update_queue = db_update_queue # Keep this if agent needs to signal DB updates
-        self.context = self._get_context()
+        self.log_channel = log_channel  # Main channel for SSE; session events reach only this session's stream
+        self.db_update_channel = db_update_channel # Keep this if agent needs to signal DB updates
+        self.state = get_shared_backend()
         self.thread = None
-        self.busy = False
 
-    def _get_context(self) -> List[Dict[str, Any]]:
-        with _context_lock:
-            return _conversation_contexts.setdefault(self.session_id, [])
+    def _key(self, kind: str) -> str:
+        return f"chat:{kind}:{self.session_id}"
 
     def append_to_context(self, role: str, content: str):
-        with _context_lock:
-            self.context.append({"role": role, "content": content})
+        message = {"role": role, "content": content}
+        self.state.update(self._key("context"), lambda context: (context or []) + [message], ttl=CONTEXT_TTL)
 
     def get_context(self) -> List[Dict[str, Any]]:
-        with _context_lock:
-            return list(self.context)
+        return self.state.get(self._key("context")) or []
 
     def clear_context(self):
-        with _context_lock:
-            _conversation_contexts[self.session_id] = []
-            self.context = _conversation_contexts[self.session_id]
+        self.state.delete(self._key("context"))
 
     def is_busy(self):
-        return self.busy
+        return self.state.get(self._key("busy")) is not None
+
+    def _check_rate_limit(self, current_time: float):
+        """Atomically records this message in the session's window. Returns the window size if the limit is exceeded."""
+        exceeded = {}
+        def record(session_timestamps):
+            # Filter timestamps older than the window
+            valid_timestamps = [ts for ts in (session_timestamps or []) if current_time - ts < RATE_LIMIT_WINDOW]
+            exceeded["count"] = len(valid_timestamps) if len(valid_timestamps) >= RATE_LIMIT_COUNT else None
+            if exceeded["count"] is None:
+                # Add current timestamp and update the stored list
+                valid_timestamps.append(current_time)
+            return valid_timestamps
+        self.state.update(self._key("ratelimit"), record, ttl=RATE_LIMIT_WINDOW)
+        return exceeded["count"]
 
     def ask(self, user_message: str):
-        if self.busy:
+        # Claim the session atomically so two workers never run the same conversation at once
+        if not self.state.set_if_absent(self._key("busy"), True, ttl=BUSY_TTL):
             return {"status": "busy", "message": "StephAI Botenberg est actuellement en train de traiter une autre requête. Veuillez patienter."}
 
         # --- RATE LIMITING START ---
-        current_time = time.time()
-        with _timestamps_lock:
-            session_timestamps = _message_timestamps.get(self.session_id, [])
-            # Filter timestamps older than the window
-            valid_timestamps = [ts for ts in session_timestamps if current_time - ts < RATE_LIMIT_WINDOW]
-            if len(valid_timestamps) >= RATE_LIMIT_COUNT:
-                log_to_ui("rate_limit_exceeded", {"session_id": self.session_id, "count": len(valid_timestamps)}, role="system")
-                rate_limit_message = f"Limite de {RATE_LIMIT_COUNT} messages par heure atteinte. Veuillez réessayer dans environ une heure."
-                # Return the error immediately for the ask() caller
-                return {"status": "error", "message": rate_limit_message}
-            # Add current timestamp and update the stored list
-            valid_timestamps.append(current_time)
-            _message_timestamps[self.session_id] = valid_timestamps
+        exceeded_count = self._check_rate_limit(time.time())
+        if exceeded_count is not None:
+            self.state.delete(self._key("busy"))
+            log_to_ui("rate_limit_exceeded", {"session_id": self.session_id, "count": exceeded_count}, role="system")
+            rate_limit_message = f"Limite de {RATE_LIMIT_COUNT} messages par heure atteinte. Veuillez réessayer dans environ une heure."
+            # Return the error immediately for the ask() caller
+            return {"status": "error", "message": rate_limit_message}
         # --- RATE LIMITING END ---
 
-        self.busy = True
         self.append_to_context("user", user_message)
         self.thread = threading.Thread(target=self._run_agent, args=(user_message,))
         self.thread.start()
@@ -80,34 +82,34 @@ class InteractiveStephAI:
             # Use the same LLM logic as the background agent, but in a separate thread/context
             response = self._call_llm(prompt)
             self.append_to_context("assistant", response)
-            # Put the final response onto the main log_queue for SSE stream
-            if self.log_queue:
+            # Publish the final response on the main log channel for this session's SSE stream
+            if self.log_channel:
                 response_data = {
                     "type": "interactive_response", 
                     "session_id": self.session_id, 
                     "data": {"response": response, "context": self.get_context()}
                 }
-                self.log_queue.put(response_data)
+                self.log_channel.publish(response_data)
             else:
-                print(f"Warning: log_queue not available for session {self.session_id} to send final response.")
+                print(f"Warning: log_channel not available for session {self.session_id} to send final response.")
 
         except Exception as e:
             print(f"Error during interactive agent run for session {self.session_id}: {e}", flush=True)
             import traceback
             traceback.print_exc()
-            # Put error onto the main log_queue
-            if self.log_queue:
+            # Publish error on the main log channel
+            if self.log_channel:
                 error_data = {
                     "type": "interactive_error", # Use a specific error type
                     "session_id": self.session_id,
                     "data": {"error": str(e)}
                 }
-                self.log_queue.put(error_data)
+                self.log_channel.publish(error_data)
             else:
-                print(f"Warning: log_queue not available for session {self.session_id} to send error message.")
+                print(f"Warning: log_channel not available for session {self.session_id} to send error message.")
 
         finally:
-            self.busy = False
+            self.state.delete(self._key("busy"))
 
     def _build_prompt(self) -> str:
         # Simple concatenation for now; can be improved to match LLM expectations
@@ -135,9 +137,15 @@ class InteractiveStephAI:
                     ptype = "number"
                 elif ann == bool:
                     ptype = "boolean"
+                elif ann == list:
+                    ptype = "array"
+                elif ann == dict:
+                    ptype = "object"
                 else:
                     ptype = "string"
                 params[pname] = {"type": ptype}
+                if ptype == "array":
+                    params[pname]["items"] = {"type": "object"}
                 if param.default == inspect.Parameter.empty:
                     required.append(pname)
             description = fn.__doc__.strip() if fn.__doc__ else f"Tool: {fn_name}"
@@ -250,22 +258,24 @@ class InteractiveStephAI:
 
 
 # Session management for interactive agents
+# Per-process cache of agent objects; all session state they use lives in the shared backend,
+# so any worker can rebuild an agent for a session that started elsewhere.
 _interactive_agents = {}
 _agent_lock = threading.Lock()
 
-def get_interactive_agent(session_id: str, log_queue: queue.Queue = None, db_update_queue: queue.Queue = None) -> InteractiveStephAI:
+def get_interactive_agent(session_id: str, log_channel: EventChannel = None, db_update_channel: EventChannel = None) -> InteractiveStephAI:
     """Retrieves or creates an interactive agent instance for a given session ID."""
     with _agent_lock:
         if session_id not in _interactive_agents:
             print(f"Creating new interactive agent for session: {session_id}")
-            # Pass the queues to the constructor
-            _interactive_agents[session_id] = InteractiveStephAI(session_id, log_queue, db_update_queue)
+            # Pass the channels to the constructor
+            _interactive_agents[session_id] = InteractiveStephAI(session_id, log_channel, db_update_channel)
         else:
-             # Ensure existing agent has queues if they were not passed initially (e.g. server restart)
+             # Ensure existing agent has channels if they were not passed initially (e.g. server restart)
              agent = _interactive_agents[session_id]
-             if not agent.log_queue and log_queue:
-                 agent.log_queue = log_queue
-             if not agent.db_update_queue and db_update_queue:
-                 agent.db_update_queue = db_update_queue
+             if not agent.log_channel and log_channel:
+                 agent.log_channel = log_channel
+             if not agent.db_update_channel and db_update_channel:
+                 agent.db_update_channel = db_update_channel
 
         return _interactive_agents[session_id]
@@ -0,0 +1,123 @@
+"""
+Background Log Shipper for the TopChef agents.
+Buffers UI log events in memory and POSTs them in batches to the Flask bulk
+log endpoint from a daemon thread, so the agent loop never blocks on HTTP.
+"""
+import atexit
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+
+class LogShipper:
+    """Bounded, batching, non-blocking shipper for UI log events."""
+
+    def __init__(self, endpoint: str, flush_interval: float = 0.5, max_buffer: int = 1000,
+                 batch_size: int = 100, overflow_policy: str = "drop_oldest", timeout: float = 5):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid overflow_policy '{overflow_policy}'. Must be one of {OVERFLOW_POLICIES}.")
+        self.endpoint = endpoint
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.overflow_policy = overflow_policy
+        self.timeout = timeout
+        self._buffer = deque()
+        self._max_buffer = max_buffer
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        # Pooled keep-alive connections to the Flask app
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        # Counters
+        self.enqueued = 0
+        self.sent = 0
+        self.dropped = 0 # Events discarded because the buffer was full
+        self.failed = 0 # Events lost because their batch could not be delivered
+        self.batches = 0
+
+    def enqueue(self, payload: dict) -> bool:
+        """Adds an event to the buffer without blocking. Returns False if the event was dropped."""
+        with self._condition:
+            if len(self._buffer) >= self._max_buffer:
+                self.dropped += 1
+                if self.overflow_policy == "drop_newest":
+                    return False
+                self._buffer.popleft()
+            self._buffer.append(payload)
+            self.enqueued += 1
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify()
+        self._ensure_started()
+        return True
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="log-shipper", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> list:
+        batch = []
+        while self._buffer and len(batch) < self.batch_size:
+            batch.append(self._buffer.popleft())
+        return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._buffer and not self._stopping:
+                    self._condition.wait(self.flush_interval)
+                if self._stopping and not self._buffer:
+                    return
+                batch = self._take_batch()
+            if batch:
+                self._send(batch)
+
+    def _send(self, batch: list):
+        try:
+            response = self.session.post(self.endpoint, json=batch, timeout=self.timeout)
+            response.raise_for_status()
+            self.sent += len(batch)
+            self.batches += 1
+        except requests.exceptions.RequestException as e:
+            self.failed += len(batch)
+            print(f"Warning: Failed to ship {len(batch)} log event(s) to {self.endpoint}: {e}", flush=True)
+
+    def flush(self, timeout: float = 5):
+        """Stops the background thread after it has drained the buffer (used at interpreter exit)."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        """Returns the shipper's counters for monitoring."""
+        with self._condition:
+            buffered = len(self._buffer)
+        return {
+            "endpoint": self.endpoint,
+            "buffered": buffered,
+            "enqueued": self.enqueued,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+
+def create_log_shipper(endpoint: str, **kwargs) -> LogShipper:
+    """Creates a LogShipper that drains its buffer when the interpreter exits."""
+    shipper = LogShipper(endpoint, **kwargs)
+    atexit.register(shipper.flush)
+    return shipper
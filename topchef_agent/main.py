@@ -1,15 +1,24 @@
 import os
 import json
 import time
-import queue # For handling log messages between agent and SSE stream
-import threading # To manage the queue safely
+import queue # For queue.Empty raised by broker subscriptions on timeout
+import heapq
 from flask import Flask, render_template, request, Response, jsonify
 from markupsafe import escape # Import escape from markupsafe
-from topchef_agent.database import load_database, get_chefs_by_season # No need for save_database here anymore
+from topchef_agent.database import load_database, get_chefs_by_season, get_chefs_by_ids, get_chef_changes_since, get_data_version, get_cached_data_version, roster_cache, resolve_chef_fields, get_chefs_page, encode_cursor, decode_cursor, find_data_gaps, Chef, CHEF_SCHEMA_SIGNATURE # No need for save_database here anymore
 from topchef_agent.config import DATABASE_URL # Use database URL for validation maybe
+from topchef_agent.config import DB_UPDATE_DEBOUNCE_SECONDS, COMPRESS_SSE
 import datetime
 from topchef_agent.interactive_agent import get_interactive_agent
 from topchef_agent.agent import read_journal_file, execute_read_journal # For retrieving agent activity
+from topchef_agent.agent import InProcessEventTransport, set_event_transport
+from topchef_agent.broker import EventBroker, UpdateCoalescer, SlowConsumerError, format_sse, parse_last_event_id
+from topchef_agent.shared_state import get_shared_backend
+from topchef_agent.compression import init_compression, negotiate_encoding, compress_stream, etag_matches
+from topchef_agent.analytics import completeness_report, season_summary_report, FRANCE_BOUNDS
+from topchef_agent.search import search_chefs
+from topchef_agent.geo import get_geo_index, parse_bbox, project, MAX_ZOOM, NEARBY_DEFAULT_RADIUS_KM, NEARBY_MAX_RADIUS_KM, NEARBY_MAX_LIMIT
+from topchef_agent.export import chefs_ndjson, chefs_csv, journal_ndjson, export_columns
 from dotenv import load_dotenv
 import uuid # Import uuid for session IDs
 
@@ -19,18 +28,74 @@ load_dotenv()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv("FLASK_SECRET_KEY", "default_secret_key") # Needed for session management
 app.json.compact = False # Pretty print JSON responses
+init_compression(app) # gzip/br for JSON and HTML bodies; SSE routes compress their own streams
 
-# --- Logging Queue Setup ---
-log_queue = queue.Queue()
-# Optional: Add a lock if queue access becomes complex, but Queue is thread-safe
-# log_lock = threading.Lock()
+# --- Shared Backend Setup ---
+# Events are published through the shared backend so that, with several gunicorn workers,
+# every worker's brokers receive them (see SHARED_STATE_URL in config.py).
+shared_backend = get_shared_backend()
 
-# --- Database Update Queue Setup ---
-db_update_queue = queue.Queue()
+# --- Event Broker Setup ---
+# Every SSE client gets its own bounded buffer; session-scoped events are routed by session ID.
+log_broker = EventBroker("logs")
+log_channel = shared_backend.attach("logs", log_broker)
 
-# --- Active SSE Client Queues (Example using simple dict, consider scalability) ---
-# This approach is basic. For production, Redis Pub/Sub or Flask-SocketIO might be better.
-# However, let's try filtering within the generator first based on log_queue directly.
+# --- Database Update Broker Setup ---
+db_update_broker = EventBroker("db_updates")
+db_update_channel = shared_backend.attach("db_updates", db_update_broker)
+
+def _flush_db_updates(chef_ids, full):
+    """Publishes one coalesced update event carrying the changed chef IDs and the database revision.
+    Clients that missed events can catch up with /api/chefs?since=<revision>."""
+    try:
+        revision = get_data_version()
+    except Exception as e:
+        print(f"Warning: Could not read database revision for update event: {e}", flush=True)
+        revision = None
+    db_update_channel.publish({"event": "update", "revision": revision, "chef_ids": chef_ids, "full": full})
+
+# Bursts of signals (e.g. several tool calls in one agent cycle) become a single event per window
+db_update_coalescer = UpdateCoalescer(DB_UPDATE_DEBOUNCE_SECONDS, _flush_db_updates)
+
+def publish_db_update(chef_ids=None):
+    """Notifies every DB update stream subscriber, in every worker, that the database changed.
+    Without chef_ids, clients are told to do a full refresh."""
+    db_update_coalescer.add(chef_ids)
+
+# Agents running inside this process (interactive chat) publish straight onto the brokers
+# instead of POSTing back to /log_message and /signal_db_update over loopback HTTP.
+set_event_transport(InProcessEventTransport(log_channel.publish, publish_db_update))
+
+# --- Conditional GET Helpers ---
+def data_etag(kind: str) -> str:
+    """Strong ETag for a view of the chef data: changes whenever the data version or the schema changes."""
+    return f"{kind}-{get_cached_data_version()}-{CHEF_SCHEMA_SIGNATURE}"
+
+def not_modified(etag: str):
+    """Returns a 304 response when the client's cached copy (If-None-Match) is still current, else None."""
+    if etag_matches(request.if_none_match, etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+def with_etag(response, etag: str):
+    """Tags a 200 response so the browser revalidates it with If-None-Match on the next refresh."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache' # Cache, but always revalidate
+    return response
+
+def event_stream_response(frames):
+    """Wraps an SSE generator in a streaming response, compressed when the client accepts it."""
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding')) if COMPRESS_SSE else None
+    if encoding is None:
+        return Response(frames, mimetype='text/event-stream')
+    response = Response(compress_stream(frames, encoding), mimetype='text/event-stream')
+    response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no' # Stop reverse proxies from buffering the stream
+    return response
 
 # --- Flask Routes ---
 
@@ -38,48 +103,22 @@ db_update_queue = queue.Queue()
 def index():
     """Displays the main page with the map and log viewer."""
     try:
-        chefs_data = load_database()
-        column_names = [] # Initialize empty list for column names
-
-        # Determine column names dynamically from the first chef entry if data exists
-        if chefs_data:
-            column_names = list(chefs_data[0].keys())
-
-        # Filter out chefs without valid coordinates for the map display itself,
-        # but we'll pass all data for potential popups or future use.
-        # Ensure latitude and longitude are floats if they exist
-        valid_chefs_for_map = []
-        for chef in chefs_data:
-            try:
-                lat = float(chef.get('latitude')) if chef.get('latitude') is not None else None
-                lon = float(chef.get('longitude')) if chef.get('longitude') is not None else None
-                if lat is not None and lon is not None:
-                     # Basic validation for France coordinates
-                     if 41.0 < lat < 51.5 and -5.5 < lon < 10.0:
-                         chef['latitude'] = lat
-                         chef['longitude'] = lon
-                         valid_chefs_for_map.append(chef)
-                     else:
-                         print(f"Warning: Chef ID {chef.get('id')} has coordinates outside France: ({lat}, {lon}). Skipping for map marker.")
-                # Keep the original chef data in chefs_data for potential full list display or other features
-            except (ValueError, TypeError) as coord_err:
-                 print(f"Warning: Invalid coordinate format for Chef ID {chef.get('id')}: {coord_err}. Skipping for map marker.")
-
-
-        # Convert the list of chef dictionaries to a JSON string safely
-        # Use json.dumps for proper JSON formatting, pass this to the template
-        chefs_json = json.dumps(chefs_data, default=lambda o: o.isoformat() if isinstance(o, datetime.datetime) else str(o))
-
-        # Pass column names along with chef data to the template
-        return render_template('index.html',
-                               chefs=valid_chefs_for_map,
-                               all_chef_data=json.dumps(chefs_data),
-                               column_names=column_names) # Pass the dynamic column names
+        etag = data_etag("index")
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        # The page carries no chef data: the map fetches its viewport from /api/chefs?bbox=...
+        # and the table fetches the roster when it is first shown
+        column_names = [column.name for column in Chef.__table__.columns]
+
+        # Pass the column names to the template (the table header and popups use them)
+        page = render_template('index.html', column_names=column_names) # Pass the dynamic column names
+        return with_etag(app.make_response(page), etag)
 
     except Exception as e:
         print(f"Error loading index page data: {e}", flush=True)
         # Render template with empty data on error
-        return render_template('index.html', chefs=[], all_chef_data='[]', column_names=[])
+        return render_template('index.html', column_names=[])
 
 @app.route('/log_message', methods=['POST'])
 def receive_log():
@@ -91,123 +130,350 @@ def receive_log():
 
         # Basic validation/sanitization could go here if needed
         # print(f"Received log: {log_entry['type']}") # Debug print
-        log_queue.put(log_entry) # Put the log into the queue
+        log_channel.publish(log_entry) # Fan the log out to every connected client
         return jsonify({"status": "success"}), 200
     except Exception as e:
         print(f"Error receiving log message: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
 
-def generate_log_stream():
-    """Generator function for the SSE stream."""
+@app.route('/log_messages', methods=['POST'])
+def receive_logs_bulk():
+    """Receives a batch of log messages from the agent log shipper."""
+    try:
+        log_entries = request.get_json()
+        if not isinstance(log_entries, list):
+             return jsonify({"status": "error", "message": "Expected a JSON list of log entries"}), 400
+
+        accepted = 0
+        for log_entry in log_entries:
+            if isinstance(log_entry, dict) and 'type' in log_entry and 'data' in log_entry:
+                log_channel.publish(log_entry)
+                accepted += 1
+        return jsonify({"status": "success", "accepted": accepted, "rejected": len(log_entries) - accepted}), 200
+    except Exception as e:
+        print(f"Error receiving bulk log messages: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+def resolve_log_session(last_event_id: int = None, resume_session_id: str = None) -> str:
+    """Returns the session ID for a log stream connection, resuming the previous one on reconnect."""
+    if last_event_id is not None and resume_session_id:
+        print(f"SSE client reconnected. Resuming session {resume_session_id} after event {last_event_id}")
+        return resume_session_id
     # Generate a unique session ID for this client connection
     session_id = str(uuid.uuid4())
     print(f"SSE client connected. Assigning session ID: {session_id}")
-    
+    return session_id
+
+def generate_log_stream(last_event_id: int = None, resume_session_id: str = None):
+    """Generator function for the SSE stream. Resumes a previous session when the client reconnects with Last-Event-ID."""
+    session_id = resolve_log_session(last_event_id, resume_session_id)
+    # Events missed since last_event_id are replayed from the broker's recent-events ring
+    subscription = log_broker.subscribe(session_id=session_id, last_event_id=last_event_id)
+
     # Send the session ID to the client immediately
     session_init_data = {"type": "session_init", "session_id": session_id}
-    yield f"data: {json.dumps(session_init_data)}\n\n"
+    yield format_sse(session_init_data)
 
     try:
         while True:
-            # Wait for a message from the central log queue
+            # Wait for a message on this client's own subscription buffer
             try:
-                log_entry = log_queue.get(timeout=60) # Wait up to 60 seconds
-                
-                # Check if the message is targeted or general
-                is_interactive_response = log_entry.get('type') == 'interactive_response'
-                target_session_id = log_entry.get('session_id')
-
-                # Yield the message if:
-                # 1. It's not an interactive response (general log)
-                # 2. It IS an interactive response AND its session_id matches this client's session_id
-                if not is_interactive_response or (is_interactive_response and target_session_id == session_id):
-                    print(f"[SSE {session_id}] Yielding log type: {log_entry.get('type')}") # Debug
-                    sse_data = f"data: {json.dumps(log_entry)}\n\n"
-                    yield sse_data
-                else:
-                    # Log is for a different session, put it back for others (potential issue if many clients)
-                    # A better approach would be dedicated client queues or pub/sub.
-                    # For now, just skip yielding.
-                    print(f"[SSE {session_id}] Skipping log type {log_entry.get('type')} for session {target_session_id}") # Debug
-                
-                log_queue.task_done() # Mark task as done after processing
+                event_id, log_entry = subscription.get(timeout=60) # Wait up to 60 seconds
+                # The broker only delivers general logs and this session's interactive events.
+                # The session ID rides along in the event ID so a reconnecting browser keeps its session.
+                yield format_sse(log_entry, f"{event_id}:{session_id}")
             except queue.Empty:
                 # No message received in timeout period, send a comment to keep connection alive
                 yield ": keepalive\n\n"
+            except SlowConsumerError as e:
+                print(f"[SSE {session_id}] {e}")
+                break # Let the browser reconnect with a fresh buffer
             except SystemExit:
-                print("[SSE {session_id}] SystemExit caught. Breaking loop.".format(session_id=session_id))
+                print(f"[SSE {session_id}] SystemExit caught. Breaking loop.")
                 break # Exit the loop gracefully on shutdown signal
             except Exception as e:
-                print(f"[SSE {session_id}] Error in generator loop: {e}".format(session_id=session_id))
+                print(f"[SSE {session_id}] Error in generator loop: {e}")
                 error_data = {"type": "stream_error", "data": {"error": str(e)}, "session_id": session_id} # Include session ID in error?
-                yield f"data: {json.dumps(error_data)}\n\n"
+                yield format_sse(error_data)
                 time.sleep(5) # Avoid tight loop on persistent error
 
     except GeneratorExit:
         print(f"SSE client disconnected: {session_id}")
     finally:
-         print(f"SSE stream generator finished for session: {session_id}")
+        subscription.close()
+        print(f"SSE stream generator finished for session: {session_id}")
 
 
 @app.route('/stream_logs')
 def stream_logs():
     """Endpoint for Server-Sent Events (SSE) log stream."""
+    # EventSource sends Last-Event-ID automatically when it reconnects
+    last_event_id, resume_session_id = parse_last_event_id(request.headers.get('Last-Event-ID'))
     # 'text/event-stream' mimetype is crucial for SSE
-    return Response(generate_log_stream(), mimetype='text/event-stream')
+    return event_stream_response(generate_log_stream(last_event_id, resume_session_id))
 
 # --- NEW Endpoint for Agent to Signal DB Updates ---
 @app.route('/signal_db_update', methods=['POST'])
 def signal_db_update():
     """Receives a signal from the agent that the database was updated."""
-    # We don't strictly need data, just the signal, but can check for payload
-    print("Received signal: Database updated.")
-    db_update_queue.put({"event": "update"}) # Put a simple message on the queue
+    # The payload is optional: {"chef_ids": [...]} lets clients patch only the changed rows
+    payload = request.get_json(silent=True) or {}
+    chef_ids = payload.get('chef_ids') if isinstance(payload, dict) else None
+    if chef_ids is not None and (not isinstance(chef_ids, list)
+                                 or any(isinstance(chef_id, bool) or not isinstance(chef_id, int) for chef_id in chef_ids)):
+        return jsonify({"status": "error", "message": "'chef_ids' must be a list of integers"}), 400
+    print(f"Received signal: Database updated (chef_ids: {chef_ids}).")
+    publish_db_update(chef_ids)
     return jsonify({"status": "success"}), 200
 
 # --- NEW SSE Stream for Database Updates ---
-def generate_db_update_stream():
-    """Generator function for the database update SSE stream."""
-    print("DB Update SSE client connected.")
+def generate_db_update_stream(last_event_id: int = None):
+    """Generator function for the database update SSE stream, replaying updates missed since last_event_id."""
+    print(f"DB Update SSE client connected (Last-Event-ID: {last_event_id}).")
+    subscription = db_update_broker.subscribe(last_event_id=last_event_id)
     try:
         while True:
-            # Wait for an update signal from the queue
+            # Wait for an update signal on this client's subscription
             try:
-                update_signal = db_update_queue.get(timeout=60) # Wait up to 60 seconds
-                sse_data = f"data: {json.dumps(update_signal)}\n\n"
-                yield sse_data
-                db_update_queue.task_done()
+                event_id, update_signal = subscription.get(timeout=60) # Wait up to 60 seconds
+                yield format_sse(update_signal, event_id)
             except queue.Empty:
                 # Send a comment to keep connection alive if no update signal
                 yield ": keepalive-db\n\n"
+            except SlowConsumerError as e:
+                print(f"DB Update SSE client disconnected as slow consumer: {e}")
+                break
             except SystemExit:
                 print("SystemExit caught in DB Update SSE generator loop. Breaking.")
                 break
             except Exception as e:
                 print(f"Error in DB Update SSE generator loop: {e}")
                 error_data = {"type": "db_stream_error", "data": {"error": str(e)}}
-                yield f"data: {json.dumps(error_data)}\n\n"
+                yield format_sse(error_data)
                 time.sleep(5)
     except GeneratorExit:
         print("DB Update SSE client disconnected.")
     finally:
+        subscription.close()
         print("DB Update SSE stream generator finished.")
 
 @app.route('/stream_db_updates')
 def stream_db_updates():
     """Endpoint for Server-Sent Events (SSE) database update stream."""
-    return Response(generate_db_update_stream(), mimetype='text/event-stream')
+    last_event_id, _ = parse_last_event_id(request.headers.get('Last-Event-ID'))
+    return event_stream_response(generate_db_update_stream(last_event_id))
 
 
 # --- NEW API Endpoint for Chef Data ---
 @app.route('/api/chefs')
 def get_chefs_data():
-    """Returns all chef data from the database as JSON, optionally filtered by season."""
+    """Returns all chef data from the database as JSON, optionally filtered by season or by a list of IDs.
+    With ?since=<revision>, returns only the chefs changed and deleted after that revision
+    plus the current high-water mark: {"revision", "since", "chefs", "deleted"}.
+    ?view=map returns only what map markers need, ?view=list leaves out long text (bio, cool_anecdote),
+    and ?fields=a,b,... picks columns explicitly (id is always included).
+    ?limit=N pages through the roster in (name, id) order; the cursor for the next page is returned in
+    the X-Next-Cursor header (absent on the last page) and passed back as ?after=<cursor>.
+    ?bbox=minLon,minLat,maxLon,maxLat&zoom=z returns only what a map viewport shows, from the in-process
+    grid index: {"zoom", "clustered", "total", "chefs", "clusters"}; below GEO_CLUSTER_MAX_ZOOM nearby
+    chefs are merged into clusters ({"count", "latitude", "longitude", "bounds"}). Chefs placed outside
+    France (FRANCE_BOUNDS) are left out."""
     season = request.args.get('season', default=None, type=int)
-    if season is not None:
-        chefs_data = get_chefs_by_season(season)
+    ids_param = request.args.get('ids', default=None, type=str)
+    since_param = request.args.get('since', default=None, type=str)
+    # ?fields=id,name,... and/or ?view=map|list|full narrow the columns returned
+    try:
+        projection = resolve_chef_fields(request.args.get('fields'), request.args.get('view'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    # Every variant below is a pure function of the data version, so one ETag covers them all (per URL)
+    etag = data_etag("chefs")
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    if since_param is not None:
+        try:
+            since_revision = int(since_param)
+        except ValueError:
+            return jsonify({"status": "error", "message": "'since' must be an integer revision"}), 400
+        return with_etag(jsonify(get_chef_changes_since(since_revision)), etag)
+    bbox_param = request.args.get('bbox', default=None, type=str)
+    if bbox_param is not None:
+        try:
+            min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox_param)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        zoom = min(max(request.args.get('zoom', default=MAX_ZOOM, type=int), 0), MAX_ZOOM)
+        # Only chefs inside France get a map marker, as before the grid index: the others are misgeocoded
+        viewport = get_geo_index().viewport(min_lon, min_lat, max_lon, max_lat, zoom, season=season, within=FRANCE_BOUNDS)
+        viewport["chefs"] = project(viewport["chefs"], projection)
+        return with_etag(jsonify(viewport), etag)
+    limit_param = request.args.get('limit', default=None, type=str)
+    if limit_param is not None:
+        try:
+            chefs_data, next_cursor = get_chefs_page(int(limit_param), after=request.args.get('after'),
+                                                     season=season, fields=projection)
+        except ValueError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+        response = with_etag(jsonify(chefs_data), etag)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    if ids_param:
+        try:
+            chef_ids = [int(chef_id) for chef_id in ids_param.split(',') if chef_id.strip()]
+        except ValueError:
+            return jsonify({"status": "error", "message": "'ids' must be a comma-separated list of integers"}), 400
+        chefs_data = get_chefs_by_ids(chef_ids, fields=projection)
+    elif season is not None:
+        chefs_data = get_chefs_by_season(season, fields=projection)
     else:
-        chefs_data = load_database()
-    return jsonify(chefs_data)
+        chefs_data = load_database(fields=projection)
+    return with_etag(jsonify(chefs_data), etag)
+
+@app.route('/api/chefs/gaps')
+def get_chef_data_gaps():
+    """Returns the IDs of chefs missing data, with the fields each one lacks (an indexed query, no roster read).
+    ?fields=bio,latitude,... picks the fields to check (default: the usual backfill fields),
+    ?season= narrows to one season and ?limit= caps the number of chefs (default 100)."""
+    season = request.args.get('season', default=None, type=int)
+    limit = request.args.get('limit', default=100, type=int)
+    etag = data_etag("gaps")
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    try:
+        gaps = find_data_gaps(request.args.get('fields'), season=season, limit=limit)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return with_etag(jsonify(gaps), etag)
+
+@app.route('/api/chefs/search')
+def search_chefs_api():
+    """Accent-insensitive search over names, bios, restaurants, signature dishes and anecdotes:
+    ?q=words (all required, the last one as a prefix), ?limit= (default 20) and ?season=.
+    Returns {"query", "backend", "results": [{"id", "name", "season", "score", "matched_fields"}]}."""
+    query = request.args.get('q', default='', type=str)
+    limit = request.args.get('limit', default=20, type=int)
+    season = request.args.get('season', default=None, type=int)
+    etag = data_etag("search")
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    try:
+        results = search_chefs(query, limit=limit, season=season)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return with_etag(jsonify(results), etag)
+
+@app.route('/api/chefs/nearby')
+def get_chefs_nearby():
+    """Returns the chefs closest to ?lat=&lon= within ?radius_km= (default 25), nearest first,
+    each with its 'distance_km'. ?limit= caps the result (default 10), ?season= filters,
+    and ?fields=/?view= narrow the columns as for /api/chefs."""
+    lat = request.args.get('lat', default=None, type=float)
+    lon = request.args.get('lon', default=None, type=float)
+    radius_km = request.args.get('radius_km', default=NEARBY_DEFAULT_RADIUS_KM, type=float)
+    limit = request.args.get('limit', default=10, type=int)
+    season = request.args.get('season', default=None, type=int)
+    if lat is None or lon is None or not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return jsonify({"status": "error", "message": "'lat' and 'lon' are required and must be valid coordinates"}), 400
+    if not 0 < radius_km <= NEARBY_MAX_RADIUS_KM:
+        return jsonify({"status": "error", "message": f"'radius_km' must be between 0 and {NEARBY_MAX_RADIUS_KM:g}"}), 400
+    if not 1 <= limit <= NEARBY_MAX_LIMIT:
+        return jsonify({"status": "error", "message": f"'limit' must be between 1 and {NEARBY_MAX_LIMIT}"}), 400
+    try:
+        projection = resolve_chef_fields(request.args.get('fields'), request.args.get('view'))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    etag = data_etag("nearby")
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    ranked = get_geo_index().nearby(lat, lon, radius_km, limit, season=season)
+    chefs = project([chef for _, chef in ranked], projection)
+    for chef, (distance, _) in zip(chefs, ranked):
+        chef["distance_km"] = round(distance, 3)
+    return with_etag(jsonify({"latitude": lat, "longitude": lon, "radius_km": radius_km, "chefs": chefs}), etag)
+
+# --- Bulk Export (streamed, constant memory) ---
+def download_response(chunks, mimetype: str, filename: str):
+    """Streams export chunks as a file download, compressed when the client accepts it."""
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    response = Response(compress_stream(chunks, encoding) if encoding else chunks, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _export_chef_args():
+    """Reads and validates ?season= and ?fields= for the chef exports. Raises ValueError."""
+    season = request.args.get('season', default=None, type=int)
+    fields = request.args.get('fields', default=None, type=str)
+    export_columns(fields) # Validate before the response starts streaming
+    return season, fields
+
+@app.route('/export/chefs.ndjson')
+def export_chefs_ndjson():
+    """Streams every chef (optionally ?season= and ?fields=) as newline-delimited JSON."""
+    try:
+        season, fields = _export_chef_args()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return download_response(chefs_ndjson(season, fields), 'application/x-ndjson', 'chefs.ndjson')
+
+@app.route('/export/chefs.csv')
+def export_chefs_csv():
+    """Streams every chef (optionally ?season= and ?fields=) as CSV with a header row."""
+    try:
+        season, fields = _export_chef_args()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return download_response(chefs_csv(season, fields), 'text/csv', 'chefs.csv')
+
+@app.route('/export/journal.ndjson')
+def export_journal_ndjson():
+    """Streams the agent journal as newline-delimited JSON, oldest entry first."""
+    try:
+        chunks = journal_ndjson()
+    except IOError as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    return download_response(chunks, 'application/x-ndjson', 'journal.ndjson')
+
+# --- Roster Cache Metrics ---
+@app.route('/api/stats/cache')
+def get_cache_stats():
+    """Returns the roster cache's hit/miss counters for this worker process."""
+    return jsonify(roster_cache.stats())
+
+@app.route('/api/stats/completeness')
+def get_completeness_stats():
+    """Returns roster completeness: per field, per season (candidates vs the expected 14),
+    absent seasons and coordinates outside France. ?season= narrows to one season,
+    ?matrix=1 adds the per-chef missing-field bitmasks and ?expected_seasons=N also reports
+    seasons up to N that have no chefs."""
+    season = request.args.get('season', default=None, type=int)
+    expected_seasons = request.args.get('expected_seasons', default=None, type=int)
+    include_matrix = request.args.get('matrix', default='0') in ('1', 'true', 'yes')
+    etag = data_etag("completeness")
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    return with_etag(jsonify(completeness_report(season, include_matrix, expected_seasons)), etag)
+
+@app.route('/api/seasons/summary')
+def get_seasons_summary():
+    """Returns one row per season (candidates, shortfall against 14, winner, missing-field tallies)
+    plus absent and understaffed seasons; ?season= narrows to one season and ?expected_seasons=N
+    also reports seasons up to N that have no chefs."""
+    season = request.args.get('season', default=None, type=int)
+    expected_seasons = request.args.get('expected_seasons', default=None, type=int)
+    etag = data_etag("seasons")
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    return with_etag(jsonify(season_summary_report(season, expected_seasons=expected_seasons)), etag)
 
 @app.route('/interactive_chat', methods=['POST'])
 def interactive_chat():
@@ -228,8 +494,8 @@ def interactive_chat():
              print(f"Error: interactive_chat request missing session_id. Data: {data}")
              return jsonify({"status": "error", "error": "'session_id' field is required"}), 400
 
-        # Pass log_queue and db_update_queue to the agent factory/getter
-        agent = get_interactive_agent(session_id, log_queue, db_update_queue)
+        # Pass the channels to the agent factory/getter so responses reach whichever worker holds the SSE stream
+        agent = get_interactive_agent(session_id, log_channel, db_update_channel)
         
         if agent.is_busy():
             # Return busy status without starting a new request
@@ -238,7 +504,12 @@ def interactive_chat():
         # Call ask, passing the message and session_id implicitly via agent instance
         # The agent instance is retrieved using session_id, so ask just needs the message.
         # We need to ensure agent.ask stores the session_id if needed later in _run_agent
-        agent.ask(user_message) 
+        # ask() claims the session in the shared backend, so a concurrent request on another worker is still refused
+        result = agent.ask(user_message)
+        if result.get("status") == "busy":
+            return jsonify(result), 429
+        if result.get("status") == "error":
+            return jsonify({"status": "error", "error": result.get("message")}), 429
         
         # REMOVED Polling loop
         # The response will be sent via the SSE stream associated with the session_id
@@ -275,6 +546,9 @@ def get_agent_journal():
         chef_id = request.args.get('chef_id', default=None, type=int)
         season = request.args.get('season', default=None, type=int)
         limit = request.args.get('limit', default=100, type=int)  # Default to last 100 entries
+        before = request.args.get('before', default=None, type=str)  # Cursor from a previous page's X-Next-Cursor
+        if limit < 1:
+            return jsonify({"status": "error", "message": "'limit' must be a positive integer"}), 400
         
         # Filter the journal entries based on query parameters
         filtered_entries = journal_entries
@@ -291,16 +565,27 @@ def get_agent_journal():
             filtered_entries = [entry for entry in filtered_entries 
                               if isinstance(entry, dict) and entry.get('related_season') == season]
         
-        # Sort entries by timestamp (newest first) and limit the number
+        # Newest first, paged by (timestamp, entry_id): only the requested page is ever sorted
+        def journal_key(entry):
+            return (str(entry.get('timestamp') or ''), str(entry.get('entry_id') or '')) if isinstance(entry, dict) else ('', '')
+
+        if before:
+            try:
+                before_key = tuple(decode_cursor(before, (str, str)))
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
+            filtered_entries = (entry for entry in filtered_entries if journal_key(entry) < before_key)
+
         try:
-            filtered_entries = sorted(filtered_entries, 
-                                    key=lambda x: x.get('timestamp', '') if isinstance(x, dict) else '', 
-                                    reverse=True)[:limit]
+            page = heapq.nlargest(limit + 1, filtered_entries, key=journal_key)
         except Exception as sort_error:
             print(f"Error sorting journal entries: {sort_error}")
             return jsonify({"status": "error", "message": f"Error sorting entries: {str(sort_error)}"}), 500
-        
-        return jsonify(filtered_entries)
+
+        response = jsonify(page[:limit])
+        if len(page) > limit:
+            response.headers['X-Next-Cursor'] = encode_cursor(*journal_key(page[limit - 1]))
+        return response
     except Exception as e:
         print(f"Error retrieving agent journal: {e}")
         import traceback
@@ -0,0 +1,223 @@
+"""
+Schema Migrations for the TopChef database.
+The schema_version table records which of the ordered MIGRATIONS have been applied.
+Process startup reads the highest applied version in one query and, when it is
+current, touches nothing else: no catalog inspection, no row counts, no DDL.
+Pending migrations are applied once, by whichever process takes the migration
+lock first (a Postgres advisory lock; SQLite serialises writers itself); the
+others wait, re-read the version and find nothing left to do.
+Migrations that build indexes on live tables run outside a transaction, so
+Postgres can build them CONCURRENTLY without blocking chef writes.
+"""
+import time
+import datetime
+from collections import namedtuple
+
+from sqlalchemy import Column, Integer, MetaData, Table, Text, cast, func, inspect, insert, literal_column, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from topchef_agent.database import (engine, Base, Chef, ChefTombstone, SeasonSummary, ChefNameKey, GAP_INDEXES,
+                                    _lock_revisions, _next_revision_value, _refresh_season_summaries, _sync_chef_name_keys,
+                                    is_custom_field, _CUSTOM_FIELD_RE, _attribute_value, _merged_attributes)
+from topchef_agent.search import PG_SEARCH_DOCUMENT, SEARCH_INDEX_NAME
+
+# Key of the Postgres advisory lock held while migrating
+MIGRATION_LOCK_KEY = 0x70C4EF
+# Seconds between attempts to take that lock while another process migrates
+MIGRATION_LOCK_POLL_SECONDS = 0.5
+
+_metadata = MetaData() # Kept apart from Base so dropping the chef tables leaves the history alone
+schema_version = Table(
+    "schema_version", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", Text, nullable=False),
+    Column("applied_at", Text, nullable=False),
+)
+
+# transactional=False runs apply on an autocommit connection (e.g. for CREATE INDEX CONCURRENTLY);
+# such steps must be idempotent, since a failure can leave part of their work behind
+Migration = namedtuple("Migration", "version description apply transactional", defaults=(True,))
+
+
+# --- Migrations ---
+# Each step receives a connection inside the transaction that also records it (or, for
+# non-transactional steps, an autocommit connection). Steps must be safe on databases set up before
+# versioning existed, which already have some of these objects.
+
+def _create_tables(connection):
+    Base.metadata.create_all(bind=connection)
+
+def _add_legacy_columns(connection):
+    # Chef tables created by older releases lack later columns; create_all does not add columns
+    existing = {column["name"] for column in inspect(connection).get_columns(Chef.__tablename__)}
+    json_type = "JSONB" if connection.dialect.name == "postgresql" else "JSON"
+    columns_to_ensure = [
+        ("restaurant_address", "TEXT"),
+        ("latitude", "FLOAT"),
+        ("longitude", "FLOAT"),
+        ("season", "INTEGER"),
+        ("current_restaurant", "TEXT"),
+        ("season_number", "INTEGER"),
+        ("signature_dish", "TEXT"),
+        ("cool_anecdote", "TEXT"),
+        ("revision", "BIGINT"),
+        ("attributes", json_type),
+    ]
+    for name, column_type in columns_to_ensure:
+        if name not in existing:
+            print(f"  Adding missing column '{name}'.", flush=True)
+            connection.execute(text(f"ALTER TABLE {Chef.__tablename__} ADD COLUMN {name} {column_type} NULL"))
+
+def _create_indexes(connection):
+    # create_all only indexes brand-new tables
+    table = Chef.__tablename__
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_revision ON {table} (revision)"))
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_name_id ON {table} (name, id)"))
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_season ON {table} (season)"))
+    for index in GAP_INDEXES:
+        index.create(connection, checkfirst=True)
+
+def _stamp_revisions(connection):
+    _lock_revisions(connection)
+    connection.execute(Chef.__table__.update().where(Chef.revision.is_(None)).values(revision=_next_revision_value()))
+
+def _seed_sample_chefs(connection):
+    if connection.execute(select(Chef.id).limit(1)).first() is not None:
+        return
+    print("  Table is empty. Adding initial sample data...", flush=True)
+    connection.execute(insert(Chef.__table__), [
+        dict(name="Marie Dubois", bio="Winner of Top Chef Season 2", image_url="", status="Winner", restaurant_address="1 Rue de Rivoli, 75001 Paris, France", latitude=48.8566, longitude=2.3522, season=2, current_restaurant="Le Rivoli", season_number=2, signature_dish="Duck L'Orange"),
+        dict(name="Pierre Martin", bio="Known for modern techniques", image_url="", status="Finalist", restaurant_address="10 Avenue des Champs-Élysées, 75008 Paris, France", latitude=48.8698, longitude=2.3070, season=1, current_restaurant="Le Champs", season_number=1, signature_dish="Foie Gras Torchon"),
+    ])
+    _stamp_revisions(connection)
+
+def _build_derived_tables(connection):
+    # Rows written before the season summaries and name keys were maintained
+    with Session(bind=connection) as db:
+        seasons = db.execute(select(Chef.season).distinct()).scalars().all()
+        _refresh_season_summaries(db, seasons)
+        _sync_chef_name_keys(db)
+        db.flush()
+
+def _create_search_index(connection):
+    # Postgres full-text search (see search.py); other databases search with the in-process index
+    if connection.dialect.name != "postgresql":
+        return
+    try:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent"))
+        # unaccent() itself is only STABLE; index expressions need an IMMUTABLE function
+        connection.execute(text(
+            "CREATE OR REPLACE FUNCTION topchef_unaccent(text) RETURNS text AS "
+            "$$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$ "
+            "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"))
+    except SQLAlchemyError as e:
+        print(f"Warning: Could not install the unaccent extension, chef search will use the in-process index: {e}", flush=True)
+        return
+    # An interrupted concurrent build leaves an invalid index that IF NOT EXISTS would keep
+    valid = connection.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                               {"name": SEARCH_INDEX_NAME}).scalar()
+    if valid is False:
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {SEARCH_INDEX_NAME}"))
+    connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {SEARCH_INDEX_NAME} ON {Chef.__tablename__} USING GIN (({PG_SEARCH_DOCUMENT}))"))
+
+def _move_legacy_custom_columns(connection):
+    # Older releases added custom_* fields as columns (ALTER TABLE); the model no longer maps them.
+    # Values move into the attributes document, unless it already holds a newer value for the key.
+    table = Chef.__tablename__
+    legacy = [column["name"] for column in inspect(connection).get_columns(table) if is_custom_field(column["name"])]
+    if not legacy:
+        return
+    _lock_revisions(connection)
+    for name in legacy:
+        if not _CUSTOM_FIELD_RE.match(name):
+            print(f"  Warning: Leaving legacy column '{name}' in place: not a valid custom field name.", flush=True)
+            continue
+        column = literal_column(name)
+        as_json = cast(func.to_jsonb(column), Text) if connection.dialect.name == "postgresql" else func.json_quote(column)
+        moved = connection.execute(Chef.__table__.update()
+                                   .where(column.is_not(None), _attribute_value(name).is_(None))
+                                   .values(attributes=_merged_attributes({name: as_json}), revision=_next_revision_value())).rowcount
+        connection.execute(text(f"ALTER TABLE {table} DROP COLUMN {name}"))
+        print(f"  Moved legacy column '{name}' into attributes ({moved} chef(s)).", flush=True)
+
+MIGRATIONS = [
+    Migration(1, "Create the chef, tombstone, season summary and name key tables", _create_tables),
+    Migration(2, "Add columns missing from chef tables created by older releases", _add_legacy_columns),
+    Migration(3, "Index revision, (name, id), season and the data-gap predicates", _create_indexes),
+    Migration(4, "Stamp chefs written before revisions existed", _stamp_revisions),
+    Migration(5, "Seed sample chefs into an empty table", _seed_sample_chefs),
+    Migration(6, "Build season summaries and name keys for existing chefs", _build_derived_tables),
+    Migration(7, "Build the full-text search index (Postgres)", _create_search_index, transactional=False),
+    Migration(8, "Move legacy custom_* columns into the attributes document", _move_legacy_custom_columns),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# --- Runner ---
+def _applied_version(connection):
+    """Highest applied version (0 if none), or None if the schema_version table does not exist yet."""
+    try:
+        return connection.execute(select(func.coalesce(func.max(schema_version.c.version), 0))).scalar()
+    except (OperationalError, ProgrammingError): # No such table
+        connection.rollback()
+        return None
+
+def migrate() -> int:
+    """Applies pending migrations and returns the schema version. When the schema is current this is
+    a single query. Each migration commits together with its schema_version row, so an interrupted
+    run resumes at the first migration that did not finish."""
+    with engine.connect() as connection:
+        version = _applied_version(connection)
+        connection.commit()
+        if version == LATEST_VERSION:
+            return version
+        if version is not None and version > LATEST_VERSION:
+            print(f"Warning: Database schema is at version {version}, newer than this code ({LATEST_VERSION}).", flush=True)
+            return version
+
+        locked = connection.dialect.name == "postgresql"
+        if locked:
+            # Session-level lock: other processes starting now wait here, then find the work done.
+            # Polled rather than blocking: a backend blocked in pg_advisory_lock() holds a snapshot,
+            # which a CREATE INDEX CONCURRENTLY run by the lock holder would wait for forever.
+            while not connection.execute(select(func.pg_try_advisory_lock(MIGRATION_LOCK_KEY))).scalar():
+                connection.rollback()
+                time.sleep(MIGRATION_LOCK_POLL_SECONDS)
+            connection.commit()
+        try:
+            _metadata.create_all(bind=connection)
+            connection.commit()
+            version = _applied_version(connection) or 0 # Re-read: another process may have migrated meanwhile
+            connection.commit()
+            for migration in MIGRATIONS:
+                if migration.version <= version:
+                    continue
+                print(f"Applying schema migration {migration.version}: {migration.description}...", flush=True)
+                try:
+                    if not migration.transactional:
+                        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as ddl_connection:
+                            migration.apply(ddl_connection)
+                    connection.begin() # Explicit, so ORM sessions opened by a step join this transaction
+                    if migration.transactional:
+                        migration.apply(connection)
+                    connection.execute(schema_version.insert().values(
+                        version=migration.version, description=migration.description,
+                        applied_at=datetime.datetime.now(datetime.timezone.utc).isoformat()))
+                    connection.commit()
+                except Exception:
+                    connection.rollback()
+                    print(f"Error: Schema migration {migration.version} failed; later migrations were not applied.", flush=True)
+                    raise
+                version = migration.version
+            return version
+        finally:
+            if locked:
+                connection.execute(select(func.pg_advisory_unlock(MIGRATION_LOCK_KEY)))
+                connection.commit()
+
+def reset_schema():
+    """Drops every chef table and the migration history, so the next migrate() rebuilds from scratch."""
+    print("Dropping the chef tables and schema history...", flush=True)
+    Base.metadata.drop_all(bind=engine, tables=[Chef.__table__, ChefTombstone.__table__, SeasonSummary.__table__, ChefNameKey.__table__])
+    _metadata.drop_all(bind=engine)
@@ -12,7 +12,7 @@ import threading
 from datetime import datetime
 
 # Import the necessary functions from our agent module
-from topchef_agent.agent import run_llm_driven_agent_cycle, log_to_ui, signal_database_update
+from topchef_agent.agent import run_llm_driven_agent_cycle, log_to_ui
 from topchef_agent.config import OPENROUTER_API_KEY
 
 # --- Global Counter ---
@@ -40,13 +40,13 @@ def job():
         print(f"  [AUTONOMOUS AGENT] Using special 'Fun Fact' prompt this time.", flush=True)
     # Add more specialized prompts here if needed
     elif job_counter % 3 == 0:  # Every 3rd cycle, focus on geocoding
-        initial_prompt = "Bonjour StephAI Botenberg! Time to put chefs on the map! Find chefs with missing latitude/longitude data but who have restaurant addresses. Use geocoding to add their coordinates to make them appear on our beautiful map!"
+        initial_prompt = "Bonjour StephAI Botenberg! Time to put chefs on the map! Call find_data_gaps with fields ['latitude', 'longitude'] to get the chefs missing coordinates (no need to load every chef), then for those with a restaurant address use geocoding to add their coordinates to make them appear on our beautiful map!"
         print(f"  [AUTONOMOUS AGENT] Using special 'Geocoding' prompt this time.", flush=True)
     else:  # Default routine check
         current_year = datetime.now().year
         start_year = 2010 # Assuming Top Chef France started in 2010
         expected_seasons = current_year - start_year + 1 # Calculate expected seasons dynamically
-        initial_prompt = f"Okay StephAI Botenberg, time for your routine check for {current_year}. Verify the database integrity: Ensure all {expected_seasons} expected seasons (from season 1 up to season {expected_seasons}) are present and that each season has at least 14 candidates listed. Also, check a random season for other missing data points (like bios, images, or addresses)."
+        initial_prompt = f"Okay StephAI Botenberg, time for your routine check for {current_year}. Verify the database integrity: Call get_season_summary with expected_seasons={expected_seasons} to ensure all {expected_seasons} expected seasons (from season 1 up to season {expected_seasons}) are present and that each season has at least 14 candidates listed. Then pick a random season and call find_data_gaps for it to list the chefs missing bios, images, addresses or coordinates, instead of reading and scanning every record."
 
     # Define the target function for the background thread
     def run_job_in_background():
@@ -56,8 +56,8 @@ def job():
             # Pass the selected initial prompt to the agent cycle
             run_llm_driven_agent_cycle(initial_prompt)
             
-            # Signal that the database was updated
-            signal_database_update()
+            # No end-of-cycle signal: each write tool already signals the chef IDs it changed,
+            # and a payload-free signal would force every client into a full roster refresh.
             
             log_to_ui("autonomous_job_complete", {
                 "job_id": job_id_for_thread,
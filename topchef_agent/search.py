@@ -0,0 +1,237 @@
+"""
+Text Search over chef records.
+Searches name, bio, current_restaurant, signature_dish and cool_anecdote,
+accent-insensitively ("creme brulee" finds "Crème brûlée"), all query words
+required and the last one matched as a prefix. On Postgres a weighted tsvector
+GIN index (built by a schema migration, see migrations.py) does the work;
+elsewhere, or when the unaccent extension could not be installed, an in-process
+inverted index built from the roster cache is used.
+"""
+import bisect
+import math
+import threading
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from topchef_agent.database import engine, get_db, load_database, get_chefs_by_ids, get_cached_data_version, get_chef_changes_since
+from topchef_agent.config import SEARCH_BACKEND
+from topchef_agent.text_utils import tokenize
+
+# Searchable fields and their weights: a hit in the name counts more than one in a long bio
+SEARCH_FIELDS = {"name": 4.0, "signature_dish": 3.0, "current_restaurant": 2.0, "bio": 1.0, "cool_anecdote": 1.0}
+SEARCH_MAX_LIMIT = 100
+# Above this share of changed chefs a full rebuild is cheaper than patching the index
+INCREMENTAL_UPDATE_MAX_RATIO = 0.5
+
+
+def matched_fields(chef: dict, tokens: list) -> list:
+    """Which searchable fields of a chef contain any of the query tokens (the last one as a prefix)."""
+    matched = []
+    for field in SEARCH_FIELDS:
+        field_tokens = set(tokenize(chef.get(field) or ""))
+        if any(token in field_tokens for token in tokens[:-1]) or any(t.startswith(tokens[-1]) for t in field_tokens):
+            matched.append(field)
+    return matched
+
+
+# --- In-Process Inverted Index ---
+class InvertedIndex:
+    """token -> {chef_id: bitmask of the SEARCH_FIELDS containing it}. Build it, then share it read-only."""
+
+    def __init__(self, chefs=()):
+        self.fields = tuple(SEARCH_FIELDS)
+        self.postings = {}
+        self.chefs = {} # chef_id -> {id, name, season}
+        self._chef_tokens = {} # chef_id -> tokens, so a chef can be removed without re-tokenizing
+        self._vocabulary = None # Sorted tokens for prefix lookups, rebuilt lazily after changes
+        for chef in chefs:
+            self.insert(chef)
+
+    def __len__(self):
+        return len(self.chefs)
+
+    def copy(self):
+        """A new index sharing nothing mutable with this one, for patching while readers use this one."""
+        clone = InvertedIndex()
+        clone.postings = {token: dict(posting) for token, posting in self.postings.items()}
+        clone.chefs = dict(self.chefs)
+        clone._chef_tokens = dict(self._chef_tokens)
+        return clone
+
+    def insert(self, chef: dict):
+        """Adds a chef, replacing any previous entry for the same ID."""
+        chef_id = chef["id"]
+        self.remove(chef_id)
+        masks = {}
+        for bit, field in enumerate(self.fields):
+            for token in tokenize(chef.get(field) or ""):
+                masks[token] = masks.get(token, 0) | (1 << bit)
+        for token, mask in masks.items():
+            self.postings.setdefault(token, {})[chef_id] = mask
+        self.chefs[chef_id] = {"id": chef_id, "name": chef.get("name"), "season": chef.get("season")}
+        self._chef_tokens[chef_id] = tuple(masks)
+        self._vocabulary = None
+
+    def remove(self, chef_id):
+        for token in self._chef_tokens.pop(chef_id, ()):
+            posting = self.postings[token]
+            del posting[chef_id]
+            if not posting:
+                del self.postings[token]
+        if self.chefs.pop(chef_id, None) is not None:
+            self._vocabulary = None
+
+    def _prefix_postings(self, prefix: str) -> dict:
+        """Merged postings of every token starting with prefix."""
+        vocabulary = self._vocabulary
+        if vocabulary is None:
+            vocabulary = self._vocabulary = sorted(self.postings)
+        merged = {}
+        for i in range(bisect.bisect_left(vocabulary, prefix), len(vocabulary)):
+            token = vocabulary[i]
+            if not token.startswith(prefix):
+                break
+            for chef_id, mask in self.postings[token].items():
+                merged[chef_id] = merged.get(chef_id, 0) | mask
+        return merged
+
+    def search(self, tokens: list, limit: int = 20, season: int = None) -> list:
+        """Chefs containing every token (the last one as a prefix), best first, as (score, chef) pairs.
+        Score: per token, the weights of the fields it appears in times its inverse document frequency."""
+        if not tokens:
+            return []
+        postings = [self.postings.get(token, {}) for token in tokens[:-1]] + [self._prefix_postings(tokens[-1])]
+        postings.sort(key=len) # Intersect starting from the rarest token
+        if not postings[0]:
+            return []
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        weights = [SEARCH_FIELDS[field] for field in self.fields]
+        total = max(len(self.chefs), 1)
+        ranked = []
+        for chef_id in candidates:
+            chef = self.chefs[chef_id]
+            if season is not None and chef.get("season") != season:
+                continue
+            score = 0.0
+            for posting in postings:
+                mask = posting[chef_id]
+                idf = math.log(1.0 + total / len(posting))
+                score += idf * sum(weight for bit, weight in enumerate(weights) if mask >> bit & 1)
+            ranked.append((score, chef))
+        ranked.sort(key=lambda pair: (-pair[0], pair[1]["id"]))
+        return ranked[:limit]
+
+
+_lock = threading.Lock()
+_cached = (None, None) # (data version, InvertedIndex)
+
+def get_search_index() -> InvertedIndex:
+    """Inverted index of the current roster; after writes only changed and deleted chefs are re-indexed."""
+    global _cached
+    version = get_cached_data_version()
+    with _lock:
+        cached_version, index = _cached
+        if index is not None and cached_version >= version:
+            return index
+    if index is None:
+        index, indexed_version = InvertedIndex(load_database()), version
+    else:
+        changes = get_chef_changes_since(cached_version)
+        indexed_version = changes["revision"]
+        changed = len(changes["chefs"]) + len(changes["deleted"])
+        if changed > INCREMENTAL_UPDATE_MAX_RATIO * max(len(index), 1) and changed > 10:
+            index = InvertedIndex(load_database())
+        else:
+            index = index.copy()
+            for chef_id in changes["deleted"]:
+                index.remove(chef_id)
+            for chef in changes["chefs"]:
+                index.insert(chef)
+    with _lock:
+        if _cached[0] is None or indexed_version >= _cached[0]:
+            _cached = (indexed_version, index)
+    return index
+
+
+# --- Postgres Full-Text Search ---
+# Weighted document; the index and the query must use this exact expression for the planner to match them.
+# topchef_unaccent and the index are created by migrations.py, never at request time.
+_PG_WEIGHTS = {"name": "A", "signature_dish": "B", "current_restaurant": "B", "bio": "C", "cool_anecdote": "D"}
+PG_SEARCH_DOCUMENT = " || ".join(
+    f"setweight(to_tsvector('french', topchef_unaccent(coalesce({field}, ''))), '{weight}')"
+    for field, weight in _PG_WEIGHTS.items()
+)
+SEARCH_INDEX_NAME = "ix_chefs_search_fts"
+_pg_ready = None # None = not checked yet in this process
+
+def _postgres_search_ready() -> bool:
+    """True if the migrated GIN index exists and is valid (checked once per process). False when the
+    migration could not build it (e.g. no permission to install extensions): search then runs in-process."""
+    global _pg_ready
+    if _pg_ready is not None:
+        return _pg_ready
+    try:
+        with engine.connect() as connection:
+            valid = connection.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+                                       {"name": SEARCH_INDEX_NAME}).scalar()
+        _pg_ready = bool(valid)
+    except SQLAlchemyError as e:
+        print(f"Warning: Could not check for the full-text search index: {e}", flush=True)
+        _pg_ready = False
+    if not _pg_ready:
+        print("Warning: Postgres full-text search index missing, using the in-process index.", flush=True)
+    return _pg_ready
+
+def _postgres_search(tokens: list, limit: int, season: int = None) -> list:
+    """Ranks chefs with ts_rank_cd over the indexed document. Tokens are [a-z0-9]+, so safe in a tsquery."""
+    query = " & ".join(tokens[:-1] + [tokens[-1] + ":*"])
+    season_filter = "AND season = :season" if season is not None else ""
+    statement = text(
+        f"SELECT id, name, season, {', '.join(SEARCH_FIELDS)}, ts_rank_cd({PG_SEARCH_DOCUMENT}, query) AS score "
+        f"FROM chefs, to_tsquery('french', :query) AS query "
+        f"WHERE {PG_SEARCH_DOCUMENT} @@ query {season_filter} "
+        f"ORDER BY score DESC, id LIMIT :limit")
+    params = {"query": query, "limit": limit}
+    if season is not None:
+        params["season"] = season
+    with get_db() as db:
+        rows = db.execute(statement, params).mappings().all()
+    return [(float(row["score"]), dict(row)) for row in rows]
+
+
+def search_chefs(query: str, limit: int = 20, season: int = None) -> dict:
+    """Searches the chefs' names and texts.
+
+    Returns:
+        dict: {"query", "backend": "postgres" | "memory",
+               "results": [{"id", "name", "season", "score", "matched_fields"}]}
+    Raises:
+        ValueError: for an empty query or a limit outside 1..SEARCH_MAX_LIMIT.
+    """
+    if not isinstance(limit, int) or not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {SEARCH_MAX_LIMIT}.")
+    tokens = tokenize(query or "")
+    if not tokens:
+        raise ValueError("The query has no searchable words.")
+    use_postgres = SEARCH_BACKEND != "memory" and engine.dialect.name == "postgresql" and _postgres_search_ready()
+    if use_postgres:
+        # The french text search configuration stems words itself
+        ranked = _postgres_search(tokenize(query, stem=False) or tokens, limit, season)
+        chefs = {chef["id"]: chef for _, chef in ranked}
+    else:
+        index = get_search_index()
+        ranked = index.search(tokens, limit, season)
+        chefs = {}
+        if ranked: # Only the hits' texts are needed, for matched_fields
+            chefs = {chef["id"]: chef for chef in get_chefs_by_ids([chef["id"] for _, chef in ranked], fields=["name", "season", *SEARCH_FIELDS])}
+    results = []
+    for score, hit in ranked:
+        chef = chefs.get(hit["id"], hit)
+        results.append({"id": hit["id"], "name": chef.get("name"), "season": chef.get("season"),
+                        "score": round(score, 4), "matched_fields": matched_fields(chef, tokens)})
+    return {"query": query, "backend": "postgres" if use_postgres else "memory", "results": results}
@@ -0,0 +1,319 @@
+"""
+Shared Event & State Backend for the TopChef web app.
+Lets several gunicorn workers (or other processes) share SSE events and small
+pieces of session state such as chat context, busy flags and rate-limit windows.
+
+Selected with SHARED_STATE_URL:
+  memory://                 single process only (default, previous behaviour)
+  sqlite:////path/state.db  local multi-process stand-in using SQLite in WAL mode
+  redis://host:6379/0       Redis or any Redis-compatible server (needs the 'redis' package)
+
+Events published on a channel are numbered by the backend, so every worker's
+local broker sees the same event IDs and Last-Event-ID replay works whichever
+worker a browser reconnects to.
+"""
+import json
+import time
+import sqlite3
+import threading
+
+from topchef_agent.config import SHARED_STATE_URL, SHARED_STATE_POLL_INTERVAL, SHARED_STATE_EVENT_RETENTION
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+class EventChannel:
+    """Publishing handle for one named channel; drop-in for EventBroker.publish callers."""
+
+    def __init__(self, backend, name: str):
+        self.backend = backend
+        self.name = name
+
+    def publish(self, event: dict):
+        return self.backend.publish(self.name, event)
+
+
+class MemoryBackend:
+    """In-process backend: events go straight to the local brokers, state lives in a dict."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._brokers = {}
+        self._data = {} # key -> (json value, expires_at or None)
+        self._lock = threading.Lock()
+
+    # --- Events ---
+    def attach(self, channel: str, broker) -> EventChannel:
+        """Delivers events published on channel (by any process) to the local broker."""
+        self._brokers[channel] = broker
+        return EventChannel(self, channel)
+
+    def publish(self, channel: str, event: dict):
+        broker = self._brokers.get(channel)
+        return broker.publish(event) if broker else None
+
+    # --- State ---
+    def _live(self, key: str, now: float):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._live(key, time.time())
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value, ttl: float = None):
+        with self._lock:
+            self._data[key] = (_dumps(value), time.time() + ttl if ttl else None)
+
+    def set_if_absent(self, key: str, value, ttl: float = None) -> bool:
+        """Atomically stores value only if key is missing or expired. Returns True if stored."""
+        with self._lock:
+            now = time.time()
+            if self._live(key, now) is not None:
+                return False
+            self._data[key] = (_dumps(value), now + ttl if ttl else None)
+            return True
+
+    def update(self, key: str, fn, ttl: float = None):
+        """Atomically replaces the value with fn(current_value) and returns the new value."""
+        with self._lock:
+            now = time.time()
+            current = self._live(key, now)
+            new_value = fn(json.loads(current) if current is not None else None)
+            self._data[key] = (_dumps(new_value), now + ttl if ttl else None)
+            return new_value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteBackend(MemoryBackend):
+    """Multi-process backend on a shared SQLite file in WAL mode.
+    Each process polls the events table and feeds new rows into its local brokers."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, poll_interval: float = SHARED_STATE_POLL_INTERVAL,
+                 retention: float = SHARED_STATE_EVENT_RETENTION):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        self._poller = None
+        self._last_seen_id = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, payload TEXT NOT NULL, created_at REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_events_created_at ON events (created_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        """One autocommit connection per thread."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    # --- Events ---
+    def attach(self, channel: str, broker) -> EventChannel:
+        self._brokers[channel] = broker
+        if self._poller is None:
+            # Only deliver events published from now on; replay across restarts is not needed
+            row = self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()
+            self._last_seen_id = row[0]
+            self._poller = threading.Thread(target=self._poll_loop, name="shared-state-poller", daemon=True)
+            self._poller.start()
+        return EventChannel(self, channel)
+
+    def publish(self, channel: str, event: dict):
+        cursor = self._conn().execute(
+            "INSERT INTO events (channel, payload, created_at) VALUES (?, ?, ?)",
+            (channel, _dumps(event), time.time()),
+        )
+        return cursor.lastrowid
+
+    def _poll_loop(self):
+        last_prune = time.time()
+        while True:
+            try:
+                rows = self._conn().execute(
+                    "SELECT id, channel, payload FROM events WHERE id > ? ORDER BY id", (self._last_seen_id,)
+                ).fetchall()
+                for event_id, channel, payload in rows:
+                    self._last_seen_id = event_id
+                    broker = self._brokers.get(channel)
+                    if broker:
+                        broker.publish(json.loads(payload), event_id=event_id)
+                if time.time() - last_prune > self.retention:
+                    self._conn().execute("DELETE FROM events WHERE created_at < ?", (time.time() - self.retention,))
+                    last_prune = time.time()
+            except sqlite3.Error as e:
+                print(f"Warning: Shared state poller error: {e}", flush=True)
+            time.sleep(self.poll_interval)
+
+    # --- State ---
+    def _read(self, conn, key: str, now: float):
+        row = conn.execute("SELECT value, expires_at FROM kv WHERE key = ?", (key,)).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            return None
+        return row[0]
+
+    def get(self, key: str):
+        value = self._read(self._conn(), key, time.time())
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value, ttl: float = None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, _dumps(value), time.time() + ttl if ttl else None),
+        )
+
+    def _transaction(self, fn):
+        """Runs fn(conn) inside BEGIN IMMEDIATE so read-modify-write is atomic across processes."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def set_if_absent(self, key: str, value, ttl: float = None) -> bool:
+        def txn(conn):
+            now = time.time()
+            if self._read(conn, key, now) is not None:
+                return False
+            conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, _dumps(value), now + ttl if ttl else None))
+            return True
+        return self._transaction(txn)
+
+    def update(self, key: str, fn, ttl: float = None):
+        def txn(conn):
+            now = time.time()
+            current = self._read(conn, key, now)
+            new_value = fn(json.loads(current) if current is not None else None)
+            conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                         (key, _dumps(new_value), now + ttl if ttl else None))
+            return new_value
+        return self._transaction(txn)
+
+    def delete(self, key: str):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+
+class RedisBackend:
+    """Multi-process backend on Redis (or any server speaking the Redis protocol)."""
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "topchef"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("SHARED_STATE_URL points at Redis but the 'redis' package is not installed (pip install redis).") from e
+        self._redis_module = redis
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._brokers = {}
+        self._listener = None
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    # --- Events ---
+    def attach(self, channel: str, broker) -> EventChannel:
+        self._brokers[channel] = broker
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen_loop, name="shared-state-listener", daemon=True)
+            self._listener.start()
+        return EventChannel(self, channel)
+
+    def publish(self, channel: str, event: dict):
+        event_id = self.client.incr(self._key(f"event_id:{channel}"))
+        self.client.publish(self._key(f"events:{channel}"), _dumps({"id": event_id, "event": event}))
+        return event_id
+
+    def _listen_loop(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self._key("events:*"))
+                for message in pubsub.listen():
+                    channel = message["channel"].rsplit(":", 1)[-1]
+                    broker = self._brokers.get(channel)
+                    if broker:
+                        envelope = json.loads(message["data"])
+                        broker.publish(envelope["event"], event_id=envelope["id"])
+            except self._redis_module.RedisError as e:
+                print(f"Warning: Shared state listener error, reconnecting: {e}", flush=True)
+                time.sleep(1)
+
+    # --- State ---
+    def get(self, key: str):
+        value = self.client.get(self._key(key))
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, value, ttl: float = None):
+        self.client.set(self._key(key), _dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def set_if_absent(self, key: str, value, ttl: float = None) -> bool:
+        return bool(self.client.set(self._key(key), _dumps(value), nx=True, px=int(ttl * 1000) if ttl else None))
+
+    def update(self, key: str, fn, ttl: float = None):
+        full_key = self._key(key)
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(full_key)
+                    current = pipe.get(full_key)
+                    new_value = fn(json.loads(current) if current is not None else None)
+                    pipe.multi()
+                    pipe.set(full_key, _dumps(new_value), px=int(ttl * 1000) if ttl else None)
+                    pipe.execute()
+                    return new_value
+                except self._redis_module.WatchError:
+                    continue # Another process changed the key; retry with the fresh value
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+
+def create_backend(url: str):
+    """Builds the backend described by a SHARED_STATE_URL."""
+    if not url or url.startswith("memory://"):
+        return MemoryBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL scheme: {url}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_shared_backend():
+    """Returns the process-wide shared backend, creating it from SHARED_STATE_URL on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(SHARED_STATE_URL)
+            print(f"Shared state backend: {_backend.name}", flush=True)
+        return _backend
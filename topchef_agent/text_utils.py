@@ -0,0 +1,72 @@
+"""
+Text Normalization helpers for the TopChef data.
+Accent folding and a small French-aware tokenizer, shared by search and
+name matching so "Hélène", "helene" and "HELENE" all compare equal.
+"""
+import re
+import unicodedata
+
+# Ligatures NFKD leaves alone
+_LIGATURES = str.maketrans({"œ": "oe", "Œ": "oe", "æ": "ae", "Æ": "ae", "ß": "ss"})
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Short function words that would otherwise match nearly every bio (French first, then English)
+STOPWORDS = frozenset((
+    "a", "au", "aux", "avec", "c", "ce", "ces", "d", "dans", "de", "des", "du", "elle", "en", "est", "et",
+    "il", "j", "l", "la", "le", "les", "leur", "m", "n", "ne", "ou", "par", "pas", "pour", "qu", "que",
+    "qui", "s", "sa", "se", "ses", "son", "sur", "t", "un", "une", "y",
+    "an", "and", "at", "by", "for", "in", "is", "of", "on", "or", "the", "to", "with",
+))
+
+
+def fold_accents(text: str) -> str:
+    """Lowercases and strips diacritics: 'Crème Brûlée' -> 'creme brulee'."""
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text.translate(_LIGATURES))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def _light_stem(token: str) -> str:
+    """Drops a plural -s/-x so 'canards' matches 'canard' (kept deliberately crude and predictable)."""
+    if len(token) > 3 and token[-1] in "sx" and token[-2] not in "su":
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str, keep_stopwords: bool = False, stem: bool = True) -> list:
+    """Splits text into folded, lightly stemmed tokens. Apostrophes separate words (l'orange -> orange)."""
+    tokens = [token for token in _TOKEN_RE.findall(fold_accents(text)) if keep_stopwords or token not in STOPWORDS]
+    return [_light_stem(token) for token in tokens] if stem else tokens
+
+
+# --- Name Keys ---
+# Ordered spelling rewrites bringing French (and common foreign) spellings of a sound to one form
+_PHONETIC_RULES = tuple((re.compile(pattern), replacement) for pattern, replacement in (
+    (r"ph", "f"), (r"th", "t"), (r"sch|sh|ch", "s"), (r"gn", "n"), (r"qu|q|ck", "k"),
+    (r"c(?=[eiy])", "s"), (r"c", "k"), (r"gu(?=[eiy])", "g"), (r"g(?=[eiy])", "j"),
+    (r"h", ""), (r"w", "v"), (r"y", "i"), (r"z", "s"), (r"x", "ks"),
+    (r"eau|au", "o"), (r"ai|ei", "e"), (r"ou", "u"),
+))
+_SILENT_ENDING_RE = re.compile(r"e?[sdtx]?e?$") # Final letters French usually does not pronounce
+_INNER_VOWELS_RE = re.compile(r"(?<=.)[aeiou]")
+_REPEATS_RE = re.compile(r"(.)\1+")
+
+
+def name_key(name: str) -> str:
+    """Spelling-insensitive identity of a name: folded words in sorted order.
+    'Hélène DARROZE', 'darroze helene' -> 'darroze helene'."""
+    return " ".join(sorted(tokenize(name, keep_stopwords=True, stem=False)))
+
+
+def _phonetic_word(word: str) -> str:
+    word = _SILENT_ENDING_RE.sub("", word) or word
+    for pattern, replacement in _PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    return _REPEATS_RE.sub(r"\1", _INNER_VOWELS_RE.sub("", word))
+
+
+def phonetic_key(name: str) -> str:
+    """Sound-alike key of a name, per word then sorted, so common misspellings collide:
+    'Hélène Darroze', 'Helen Daroz' -> 'drs eln'."""
+    return " ".join(sorted(_phonetic_word(word) for word in tokenize(name, keep_stopwords=True, stem=False)))